@@ -0,0 +1,59 @@
+"""
+Lexer throughput benchmark.
+
+Tokenizes a generated multi-megabyte mini source and reports tokens/sec for
+the previous lexer reading one character at a time (before), and for the current lexer
+reading one character per chunk, reading chunks and taking a whole-source string (after).
+
+Usage: `python3 -m bench.lexer [size in MB]`
+"""
+from io import StringIO
+import sys
+import time
+
+from bench.baseline_lexer import Lexer as BaselineLexer
+from src.lexer import CHUNK_SIZE, Lexer
+
+SNIPPET = """// Generated lexer benchmark input
+fib(n) = if n < 2 n else fib(n - 1) + fib(n - 2)
+values = [1, 2.5, 3, 4, 5, 6, 7, 8, 9, 10]
+table = #{name: 'mini', "version": 1, 3: [4, 5]}
+/* Multi line
+   comment */
+result = list_map(values, (x) => x * x + 1) // squares
+text = "escaped \\"quotes\\" and \\t tabs\\n"
+print(values[1:4], table.name, table['version'], 0..10, result >= 42 && true)
+"""
+
+def generate(size: int) -> str:
+    """
+    Generate a source of at least `size` characters.
+    """
+    return SNIPPET * (size // len(SNIPPET) + 1)
+
+def count_tokens(lexer: Lexer | BaselineLexer) -> int:
+    n = 0
+    while lexer.next_token(True).name != "EOF":
+        n += 1
+    return n
+
+def run(name: str, make_lexer) -> float:
+    start = time.perf_counter()
+    tokens = count_tokens(make_lexer())
+    elapsed = time.perf_counter() - start
+    rate = tokens / elapsed
+    print(f"{name:<24} {tokens:>10} tokens {elapsed:>8.3f} s {rate:>12,.0f} tokens/s")
+    return rate
+
+def main(args: list[str]):
+    megabytes = float(args[0]) if len(args) > 0 else 4
+    source = generate(int(megabytes * 1024 * 1024))
+    print(f"Lexing {len(source) / (1024 * 1024):.1f} MB of source")
+    before = run("before: previous lexer", lambda: BaselineLexer(StringIO(source)))
+    run("after: chunk size 1", lambda: Lexer(StringIO(source), chunk_size=1))
+    chunked = run(f"after: chunks of {CHUNK_SIZE}", lambda: Lexer(StringIO(source)))
+    whole = run("after: whole string", lambda: Lexer(source))
+    print(f"Speedup over the previous lexer: {chunked / before:.2f}x chunked, {whole / before:.2f}x whole string")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,10 @@
+// Calling closures that capture variables of deeply nested scopes
+// ops: 20000
+adder(a) = (b) => (c) => (d) => a + b + c + d
+compose(f, g) = (x) => g(f(x))
+inc = compose(adder(1)(2)(3), adder(4)(5)(6))
+total = 0
+for i in range(20000) {
+    total += inc(i)
+}
+total
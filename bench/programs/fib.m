@@ -0,0 +1,4 @@
+// Recursive function calls
+// ops: 28657
+fib(n) = if n < 2 n else fib(n - 1) + fib(n - 2)
+fib(22)
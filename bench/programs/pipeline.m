@@ -0,0 +1,5 @@
+// list_map, list_filter and list_reduce over a list of numbers
+// ops: 60000
+values = list_map(range(20000), (x) => x * 3 + 1)
+even = list_filter(values, (x) => x % 2 == 0)
+list_reduce(list_map(even, (x) => x / 2), (a, b) => a + b, 0)
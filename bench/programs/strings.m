@@ -0,0 +1,7 @@
+// Building a string by repeated concatenation
+// ops: 20000
+s = ""
+for i in range(20000) {
+    s += str(i % 10)
+}
+s
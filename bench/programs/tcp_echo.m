@@ -0,0 +1,19 @@
+// Echoing messages over a TCP connection on the loopback interface
+// ops: 1000
+// Port 0 binds to any free port on the loopback interface
+server = net_tcp_socket()
+net_tcp_bind(server, 0, "127.0.0.1")
+client = net_tcp_socket()
+net_tcp_connect(client, "127.0.0.1", net_tcp_port(server))
+conn = net_tcp_accept(server)
+received = 0
+for i in range(1000) {
+    net_tcp_send(client, "ping " + str(i))
+    data = net_tcp_recv(conn, 64)
+    net_tcp_send(conn, data)
+    received += list_size(net_tcp_recv_all(client, list_size(data)))
+}
+net_tcp_close(client)
+net_tcp_close(conn)
+net_tcp_close(server)
+received
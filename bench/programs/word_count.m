@@ -0,0 +1,16 @@
+// Counting words by grouping them into a map and looking up each group
+// ops: 40000
+text = "the quick brown fox jumps over the lazy dog and the dog sleeps while the fox runs"
+line = str_split(text, " ")
+words = []
+for i in range(2500) {
+    for w in line {
+        list_append(words, w)
+    }
+}
+groups = list_group_by(words, (w) => w)
+total = 0
+for w in words {
+    total += list_size(groups[w]) / 40000
+}
+list_size(groups["the"])
@@ -0,0 +1,188 @@
+"""
+Benchmark suite and regression runner.
+
+Runs the workloads in `bench/programs` and a generated program of large
+literals, timing lexing, parsing and evaluation separately. Reports the
+operations per second of each workload and the peak traced memory of a
+whole run, writes the results as JSON and compares them with a baseline.
+A workload is a regression if its total time grew by more than the
+threshold since the baseline, in which case the runner exits with 1.
+
+The first two lines of a workload are comments: a description and the
+number of operations it performs, as `// ops: <n>`.
+
+Usage: `python3 -m bench.suite [options] [workload names]`
+
+Options:
+    --engine=<name>     Engine evaluating the workloads (default closure)
+    --repeat=<n>        Runs per workload, the fastest is kept (default 3)
+    --output=<file>     Where to write the results (default bench/results.json)
+    --baseline=<file>   Results to compare with (default bench/baseline.json)
+    --threshold=<p>     Allowed slowdown in percent (default 10)
+    --save-baseline     Store the results as the new baseline
+"""
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+from src.evaluator import evaluate
+from src.interpreter import globalEnvironment
+from src.lexer import Lexer
+from src.optimizer import optimize_program
+from src.parser import Parser
+
+DIRECTORY = os.path.dirname(__file__)
+PROGRAMS = os.path.join(DIRECTORY, "programs")
+
+def literals_program(rows = 5000) -> tuple[str, int]:
+    """
+    Generate a program of one large list literal of maps, lists and strings.
+    """
+    lines = [f'    #{{id: {i}, name: "item {i}", price: {i * 0.25}, tags: ["a", "b", {i % 7}], ok: {str(i % 2 == 0).lower()}}},' for i in range(rows)]
+    return "data = [\n" + "\n".join(lines) + "\n]\nlist_size(data)\n", rows
+
+def load_workloads(names: list[str]) -> dict[str, tuple[str, int]]:
+    """
+    Get the source and number of operations of the workloads with the given names, or all of them.
+    """
+    workloads = {}
+    for filename in sorted(os.listdir(PROGRAMS)):
+        if not filename.endswith(".m"):
+            continue
+        with open(os.path.join(PROGRAMS, filename)) as f:
+            source = f.read()
+        header = source.split("\n")[1]
+        if not header.startswith("// ops:"):
+            raise Exception(f"Workload '{filename}' does not declare its number of operations")
+        workloads[filename[:-2]] = (source, int(header[len("// ops:"):]))
+    workloads["literals"] = literals_program()
+    if len(names) > 0:
+        unknown = [n for n in names if n not in workloads]
+        if len(unknown) > 0:
+            raise Exception(f"Unknown workloads: {', '.join(unknown)}")
+        workloads = {n: workloads[n] for n in names}
+    return workloads
+
+def lex(source: str) -> int:
+    lexer = Lexer(source)
+    tokens = 0
+    while lexer.next_token(True).name != "EOF":
+        tokens += 1
+    return tokens
+
+def run_once(source: str, engine: str) -> tuple[float, float, float]:
+    """
+    Time lexing, parsing and evaluating a program once.
+    The parser lexes as it goes, so the parse time is the time to parse minus the time to lex.
+    Evaluation includes optimizing, resolving and compiling the program.
+    """
+    start = time.perf_counter()
+    lex(source)
+    lexed = time.perf_counter()
+    program = Parser(Lexer(source)).parse()
+    parsed = time.perf_counter()
+    evaluate(optimize_program(program), globalEnvironment(), False, engine)
+    evaluated = time.perf_counter()
+    lex_time = lexed - start
+    return lex_time, max(parsed - lexed - lex_time, 0), evaluated - parsed
+
+def peak_memory(source: str, engine: str) -> int:
+    """
+    Get the peak memory in bytes traced while parsing and evaluating a program.
+    """
+    tracemalloc.start()
+    try:
+        program = Parser(Lexer(source)).parse()
+        evaluate(optimize_program(program), globalEnvironment(), False, engine)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def run(source: str, ops: int, engine: str, repeat: int) -> dict:
+    runs = [run_once(source, engine) for _ in range(repeat)]
+    lex_time, parse_time, eval_time = min(runs, key=sum)
+    return {
+        "tokens": lex(source),
+        "ops": ops,
+        "lex_s": lex_time,
+        "parse_s": parse_time,
+        "eval_s": eval_time,
+        "total_s": lex_time + parse_time + eval_time,
+        "ops_per_s": ops / eval_time,
+        "peak_memory_kb": peak_memory(source, engine) / 1024,
+    }
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Get the names of the workloads whose total time grew by more than the threshold.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline or "error" in result or "error" in baseline[name]:
+            continue
+        change = result["total_s"] / baseline[name]["total_s"] - 1
+        flag = "REGRESSION" if change > threshold else "ok"
+        print(f"{name:<12} {baseline[name]['total_s']:>8.3f} s -> {result['total_s']:>8.3f} s {change:>+8.1%}  {flag}")
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+def option(args: list[str], name: str, default: str) -> str:
+    for arg in [a for a in args if a.startswith(f"--{name}=")]:
+        args.remove(arg)
+        default = arg[len(f"--{name}="):]
+    return default
+
+def main(args: list[str]):
+    args = list(args)
+    engine = option(args, "engine", "closure")
+    repeat = int(option(args, "repeat", "3"))
+    output = option(args, "output", os.path.join(DIRECTORY, "results.json"))
+    baseline_path = option(args, "baseline", os.path.join(DIRECTORY, "baseline.json"))
+    threshold = float(option(args, "threshold", "10")) / 100
+    save_baseline = "--save-baseline" in args
+    if save_baseline:
+        args.remove("--save-baseline")
+
+    print(f"Running workloads on the {engine} engine, fastest of {repeat} runs")
+    print(f"{'workload':<12} {'tokens':>8} {'lex':>9} {'parse':>9} {'eval':>9} {'ops/s':>12} {'peak memory':>14}")
+    results = {}
+    for name, (source, ops) in load_workloads(args).items():
+        try:
+            r = run(source, ops, engine, repeat)
+        except Exception as e:
+            print(f"{name:<12} failed: {e}")
+            results[name] = {"error": str(e)}
+            continue
+        results[name] = r
+        print(f"{name:<12} {r['tokens']:>8} {r['lex_s']:>7.3f} s {r['parse_s']:>7.3f} s {r['eval_s']:>7.3f} s "
+              f"{r['ops_per_s']:>12,.0f} {r['peak_memory_kb']:>11,.0f} KB")
+
+    report = {"engine": engine, "python": platform.python_version(), "results": results}
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+    if save_baseline:
+        with open(baseline_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {baseline_path}")
+        return
+    if not os.path.exists(baseline_path):
+        print(f"No baseline at {baseline_path}, run with --save-baseline to store one")
+        return
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    if baseline["engine"] != engine:
+        print(f"Baseline was run on the {baseline['engine']} engine, not comparing")
+        return
+    print(f"Comparing with {baseline_path}, allowing {threshold:.0%} slowdown")
+    regressions = compare(results, baseline["results"], threshold)
+    if len(regressions) > 0:
+        print(f"Regressions in: {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
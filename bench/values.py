@@ -0,0 +1,55 @@
+"""
+Value representation benchmark.
+
+Evaluates an arithmetic heavy mini program on every engine and reports the
+time, peak traced memory and the memory held per element of a number list.
+
+Usage: `python3 -m bench.values [elements]`
+"""
+from io import StringIO
+import sys
+import time
+import tracemalloc
+
+from src.interpreter import execute, globalEnvironment
+
+PROGRAM = """
+values = 0..{n}
+mixed = list_map(values, (x) => (x * 3 + 1) % 200 - x / 4)
+flags = list_map(values, (x) => x % 2 == 0 && x > 10 || !(x < 5))
+list_reduce(mixed, (a, b) => (a + b) % 1000, 0)
+"""
+
+def run(engine: str, n: int):
+    source = PROGRAM.format(n=n)
+    start = time.perf_counter()
+    execute(StringIO(source), globalEnvironment(), False, engine)
+    elapsed = time.perf_counter() - start
+    # Memory is traced in a separate run, as tracing slows down allocations
+    tracemalloc.start()
+    execute(StringIO(source), globalEnvironment(), False, engine)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{engine:<8} {elapsed:>8.3f} s {peak / (1024 * 1024):>8.1f} MB peak")
+
+def list_element_size(n: int) -> float:
+    """
+    Bytes held per element of a list of numbers that is kept alive by the environment.
+    """
+    env = globalEnvironment()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    execute(StringIO(f"values = list_map(0..{n}, (x) => x * 7)"), env)
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (after - before) / n
+
+def main(args: list[str]):
+    n = int(args[0]) if len(args) > 0 else 50000
+    print(f"Evaluating arithmetic over {n} elements")
+    for engine in ["tree", "closure", "vm"]:
+        run(engine, n)
+    print(f"{list_element_size(n):.1f} bytes per list element")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
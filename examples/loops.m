@@ -0,0 +1,19 @@
+// While loops run their body as long as the condition is true
+i = 0
+while i < 3 {
+	print("i =", i)
+	i += 1
+}
+
+// For loops iterate over lists, tuples, ranges, strings and map keys
+for x in [1, 2, 3] print("x =", x)
+for c in "abc" print("c =", c)
+for n in 0..1000000 {
+	if n % 2 == 0 continue
+	if n > 7 break
+	print("odd", n)
+}
+
+// Map entries can be bound to a key and a value
+m = #{a: 1, 'b': 2, "c": 3}
+for (k, v) in m print(k, v)
@@ -1,15 +1,23 @@
 #!/usr/bin/env python3
+import time
+IMPORT_START = time.perf_counter()
 from io import StringIO
+import json
 import os
 import sys
-import webbrowser
 from src.atoms import ValueAtom
 from src.error import print_error_help
 from src.colors import BOLD, BRIGHT_YELLOW, GREEN, LOGO, RESET
-from src.interpreter import execute, globalEnvironment
+from src.interpreter import execute, execute_file, globalEnvironment
+from src.stdlib import lazy_modules
+from src.optimizer import DEFAULT_LEVEL, NONE
+from src import heatmap, profiler, trace
+IMPORT_TIME = time.perf_counter() - IMPORT_START
 
 # === Global variables ===
 
+ENGINES = ["closure", "vm", "tree"]
+
 USAGE = f"""{BRIGHT_YELLOW}Welcome to the {LOGO} {BRIGHT_YELLOW}interpreter!{RESET}
 
 {BOLD}Usage:{RESET} mini (command) (options) (<file>)
@@ -23,28 +31,99 @@ USAGE = f"""{BRIGHT_YELLOW}Welcome to the {LOGO} {BRIGHT_YELLOW}interpreter!{RES
 
 {BOLD}Options:{RESET}
     --help, -h      Print this help message and exit
-    --debug, -d     Enable debug mode
+    --debug, -d     Enable debug mode, evaluating the program
+                    as parsed unless an -O option is given
+    --trace=<categories>
+                    Print trace events of a comma separated
+                    list of categories: lex, parse and eval
+                    (evaluation is traced by the tree-walker)
+    -O0, -O1, -O2   Optimization level: none, shared literals,
+                    or also constant folding and removal of
+                    dead branches (default)
+    --engine=<name> Execution engine: closure (default),
+                    vm (bytecode) or tree (tree-walker)
+    --no-cache      Do not load or store the parsed file
+                    in the __minicache__ directory
+    --profile       Print the calls and time spent in each
+                    function after running the file
+    --profile-stacks=<file>
+                    Profile and write the call stacks in the
+                    collapsed format of flame graph tools
+    --heatmap       Print the file annotated with the time spent
+                    on each line and how often it ran
+    --heatmap-json=<file>
+                    Write the evaluation counts and times of
+                    every expression as JSON
+    --startup-profile
+                    Print the time spent on imports, standard
+                    library initialization and running the file
 
 {BOLD}Examples:{RESET}
     mini r          Enter the REPL
     mini main.m     Interpret the file main.m
+    mini --engine=vm main.m
+                    Interpret the file main.m on the bytecode VM
 """
 
 # === Main ===
 def main(args: list):
     debug = False
+    engine = "closure"
+    cache = True
+    startup_profile = False
+    profile = False
+    stacks_path = None
+    show_heatmap = False
+    heatmap_path = None
+    level = None
     # Options
     if '--debug' in args or '-d' in args:
         debug = True
         args.remove('--debug') if '--debug' in args else args.remove('-d')
+    if '--no-cache' in args:
+        cache = False
+        args.remove('--no-cache')
+    if '--startup-profile' in args:
+        startup_profile = True
+        args.remove('--startup-profile')
+    if '--profile' in args:
+        profile = True
+        args.remove('--profile')
+    for arg in [a for a in args if a.startswith('--profile-stacks=')]:
+        profile = True
+        stacks_path = arg[len('--profile-stacks='):]
+        args.remove(arg)
+    if '--heatmap' in args:
+        show_heatmap = True
+        args.remove('--heatmap')
+    for arg in [a for a in args if a.startswith('--heatmap-json=')]:
+        heatmap_path = arg[len('--heatmap-json='):]
+        args.remove(arg)
+    for arg in [a for a in args if a in ['-O0', '-O1', '-O2']]:
+        level = int(arg[2:])
+        args.remove(arg)
+    if level is None:
+        level = NONE if debug else DEFAULT_LEVEL
+    for arg in [a for a in args if a.startswith('--trace=')]:
+        try:
+            trace.enable(arg[len('--trace='):].split(','))
+        except Exception as e:
+            print_error_help(str(e))
+        args.remove(arg)
+    for arg in [a for a in args if a.startswith('--engine=')]:
+        engine = arg[len('--engine='):]
+        args.remove(arg)
+        if engine not in ENGINES:
+            print_error_help(f"Unknown engine '{engine}', expected one of: {', '.join(ENGINES)}")
     if len(args) == 0 or '--help' in args or '-h' in args :
         print(USAGE)
         sys.exit(0)
     # Commands
     if 'repl' in args or 'r' in args:
-        repl(debug)
+        repl(debug, engine, level)
         sys.exit(0)
     elif 'docs' in args or 'd' in args:
+        import webbrowser
         webbrowser.open('https://www.mini-lang.org/documentation')
         sys.exit(0)
     elif 'compile' in args or 'c' in args:
@@ -53,21 +132,72 @@ def main(args: list):
 
     # Interpret file
     if len(args) == 1:
-        interpret(args[-1], debug)
+        interpret(args[-1], debug, engine, cache, startup_profile, level, profile, stacks_path, show_heatmap, heatmap_path)
     elif len(args) > 1:
         print_error_help("Too many arguments, expected a single file!")
     else:
         print_error_help("Unknown option")
 
 # Interpreter mode
-def interpret(filepath: str, debug = False):
+def interpret(filepath: str, debug = False, engine = "closure", cache = True, startup_profile = False, level = DEFAULT_LEVEL,
+              profile = False, stacks_path: str | None = None, show_heatmap = False, heatmap_path: str | None = None):
     if not os.path.exists(filepath):
         print_error_help(f"File '{filepath}' does not exist!")
-    with open(filepath, mode='r', buffering=-1, encoding=None, errors=None, newline=None, closefd=True) as f:
-        _ = execute(f, globalEnvironment(), debug)
+    start = time.perf_counter()
+    env = globalEnvironment()
+    init_time = time.perf_counter() - start
+    builtins = len(env.values)
+    if profile:
+        profiler.start()
+    if show_heatmap or heatmap_path is not None:
+        heatmap.start()
+    _ = execute_file(filepath, env, debug, engine, cache, level)
+    run_time = time.perf_counter() - start - init_time
+    if profile:
+        print_profile(profiler.stop(), stacks_path)
+    if show_heatmap or heatmap_path is not None:
+        print_heatmap(heatmap.stop(), filepath, show_heatmap, heatmap_path)
+    if startup_profile:
+        deferred = set(lazy_modules.values())
+        print_startup_profile(init_time, builtins, len(deferred), len(deferred - env.loaded), run_time)
+
+def print_profile(profile: profiler.Profiler, stacks_path: str | None):
+    """
+    Print the function profile to stderr and write its call stacks to a file.
+    """
+    print(f"{BOLD}Profile:{RESET}", file=sys.stderr)
+    profile.print_report(sys.stderr)
+    if stacks_path is not None:
+        with open(stacks_path, "w") as f:
+            f.write("\n".join(profile.collapsed_stacks()) + "\n")
+        print(f"Call stacks written to {stacks_path}", file=sys.stderr)
+
+def print_heatmap(counters: heatmap.Heatmap, filepath: str, show: bool, json_path: str | None):
+    """
+    Print the heatmap of a file to stderr and write its counters as JSON.
+    """
+    if show:
+        with open(filepath, mode='r') as f:
+            source = f.read().split("\n")
+        print(f"{BOLD}Heatmap:{RESET}", file=sys.stderr)
+        counters.print_report(source, sys.stderr)
+    if json_path is not None:
+        with open(json_path, "w") as f:
+            json.dump({"file": filepath, **counters.to_json()}, f, indent=2)
+        print(f"Heatmap written to {json_path}", file=sys.stderr)
+
+def print_startup_profile(init_time: float, builtins: int, deferred: int, unloaded: int, run_time: float):
+    """
+    Print where the time to start the interpreter and run a file went, to stderr.
+    """
+    print(f"{BOLD}Startup profile:{RESET}", file=sys.stderr)
+    print(f"    imports         {IMPORT_TIME * 1000:8.2f} ms", file=sys.stderr)
+    print(f"    stdlib init     {init_time * 1000:8.2f} ms ({builtins} builtins, {deferred} groups deferred)", file=sys.stderr)
+    print(f"    run             {run_time * 1000:8.2f} ms ({deferred - unloaded} deferred groups loaded)", file=sys.stderr)
+    print(f"    total           {(IMPORT_TIME + init_time + run_time) * 1000:8.2f} ms", file=sys.stderr)
 
 # Repl mode
-def repl(debug = False):
+def repl(debug = False, engine = "closure", level = DEFAULT_LEVEL):
     print(f"{BRIGHT_YELLOW}Welcome to the {LOGO} {BRIGHT_YELLOW}REPL!{RESET}")
     env = globalEnvironment()
     while True:
@@ -80,7 +210,7 @@ def repl(debug = False):
         if line == "":
             continue
         try:
-            result = execute(StringIO(line), env, debug)
+            result = execute(StringIO(line), env, debug, engine, level)
             if result is None: continue
             value, env = result
             if isinstance(value, ValueAtom) and value.type == "unit": continue
@@ -7,6 +7,7 @@ class Node():
         Initialize a node with a name
         """
         self.name = name
+        self.position: tuple[int, int] | None = None # Line and column in the source, set by the parser
 
     def __str__(self):
         return self.formatted_str()
@@ -47,6 +48,8 @@ class AtomicNode(Node):
         super().__init__("Atomic")
         self.type = type
         self.value = value
+        self.address: tuple[int, int] | None = None # Depth and slot of an identifier, set by the resolver
+        self.atom = None # Shared atom of a literal, set by the optimizer
 
 
     def raw_str(self):
@@ -71,12 +74,17 @@ class BlockNode(Node):
     """
     A block node in the abstract syntax tree.
     """
-    def __init__(self, expressions: list[Node]):
+    def __init__(self, expressions: list[Node], scoped = True):
         """
         Initialize a block node with a list of expressions.
+        A block is evaluated in a scope of its own, unless it is not scoped,
+        like the body of a loop, which is evaluated in the enclosing scope.
         """
         super().__init__("Block")
         self.expressions = expressions
+        self.scoped = scoped
+        self.scope = None # Set by the resolver
+        self.breaks = False # Whether an expression of the block may break or continue a loop, set by the resolver
 
     def formatted_str(self):
         return '{' + '; '.join(map(str, self.expressions)) + '}'
@@ -169,6 +177,7 @@ class BinaryNode(Node):
         self.operator = operator
         self.left = left
         self.right = right
+        self.scope = None # Scope of a function declaration, set by the resolver
 
     def formatted_str(self):
         return f"({self.left} {self.operator} {self.right})"
@@ -184,6 +193,7 @@ class LambdaNode(Node):
         super().__init__("Lambda")
         self.params = params
         self.body = body
+        self.scope = None # Set by the resolver
 
     def formatted_str(self):
         return f"({self.params} => {self.body})"
@@ -202,3 +212,49 @@ class IfNode(Node):
         self.ifBody = ifBody
         self.elseBody = elseBody
         self.elseIfs = elseIfs
+
+class WhileNode(Node):
+    """
+    A while loop node in the abstract syntax tree.
+    """
+    def __init__(self, condition: Node, body: Node):
+        """
+        Initialize a while loop node with a condition and a body.
+        """
+        super().__init__("While")
+        self.condition = condition
+        self.body = body
+
+    def formatted_str(self):
+        return f"while {self.condition} {self.body}"
+
+class ForNode(Node):
+    """
+    A for loop node in the abstract syntax tree.
+    Binds one or more loop variables to each element of an iterable value.
+    """
+    def __init__(self, variables: list[AtomicNode], iterable: Node, body: Node):
+        """
+        Initialize a for loop node with the identifiers of the loop variables, an iterable and a body.
+        """
+        super().__init__("For")
+        self.variables = variables
+        self.iterable = iterable
+        self.body = body
+
+    def formatted_str(self):
+        return f"for ({', '.join(map(str, self.variables))}) in {self.iterable} {self.body}"
+
+class BreakNode(Node):
+    """
+    A break node in the abstract syntax tree, leaving the enclosing loop.
+    """
+    def __init__(self):
+        super().__init__("Break")
+
+class ContinueNode(Node):
+    """
+    A continue node in the abstract syntax tree, skipping to the next iteration of the enclosing loop.
+    """
+    def __init__(self):
+        super().__init__("Continue")
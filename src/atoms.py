@@ -14,15 +14,29 @@ def get_unique_id() -> int:
 class Atom():
     """
     A fundamental value type in the language.
+    Atoms use slots instead of an instance dictionary to keep them small,
+    and are only given a unique id when it is first needed.
     """
-    def __init__(self, name, type):
+    __slots__ = ("_uid", "type")
+    name = "Atom"
+
+    def __init__(self, type):
         """
-        Initialize an atom with a name and a type.
+        Initialize an atom with a type.
         """
-        self.uid = get_unique_id()
-        self.name = name
         self.type = type
 
+    @property
+    def uid(self) -> int:
+        """
+        The unique id of the atom, assigned on first access.
+        """
+        try:
+            return self._uid
+        except AttributeError:
+            self._uid = get_unique_id()
+            return self._uid
+
     def __str__(self):
         return self.memory_repr()
     
@@ -36,6 +50,9 @@ class Atom():
         if isinstance(__value, Atom):
             return self.structural_eq(__value)
         return False
+
+    def __hash__(self) -> int:
+        return id(self) # Atoms compared by identity hash by identity
     
     def raw_str(self):
         """
@@ -57,11 +74,23 @@ class Atom():
         """
         return f"<{self.uid}:{self.type}>"
 
+    def __getstate__(self):
+        """
+        The state pickled to send the atom to another process.
+        The unique id and cached hash are left out, as they only hold in the process that made them.
+        """
+        slots = {name: getattr(self, name) for cls in type(self).__mro__ for name in getattr(cls, "__slots__", ())
+                 if name not in ("_uid", "_hash") and hasattr(self, name)}
+        return getattr(self, "__dict__", None), slots
+
 class IntrinsicAtom(Atom):
     """
     An intrinsic value node in the abstract syntax tree.
     This is not intended to be created by the user.
     """
+    __slots__ = ("value",)
+    name = "Intrinsic"
+
     def __init__(self, type: str, value):
         """
         Initialize an intrinsic value node with a value.
@@ -72,7 +101,7 @@ class IntrinsicAtom(Atom):
                        E.g. "string", "number", "bool", "unit", "tuple", "list".
             value: The value of the node.
         """
-        super().__init__("Intrinsic", type)
+        self.type = type
         self.value = value
 
     def memory_repr(self):
@@ -81,10 +110,24 @@ class IntrinsicAtom(Atom):
     def structural_eq(self, other: "Atom") -> bool:
         return isinstance(other, IntrinsicAtom) and self.type == other.type and self.value == other.value
 
+    def __hash__(self) -> int:
+        return hash((self.type, self.value))
+
 class ValueAtom(Atom):
     """
     An atomic value node in the abstract syntax tree.
+    Use `number_atom`, `bool_atom` and `UNIT` for primitive values,
+    which share the atoms of unit, bools and small integers.
+    Immutable values hash by their structure and cache their hash,
+    lists, maps and sets can not be hashed since they may change.
+    The value of a set is a dictionary of its member atoms, in the order they were added.
+    The value of bytes is either a `bytes` object or a read only `memoryview` of a mapped file,
+    slices of bytes are a `BytesSliceAtom` sharing the buffer of the sliced value.
+    The value of an iterator is a Python iterator of atoms, which can only be iterated once.
     """
+    __slots__ = ("value", "_hash")
+    name = "Value"
+
     def __init__(self, type: str, value):
         """
         Initialize an atomic value node with a value.
@@ -95,9 +138,18 @@ class ValueAtom(Atom):
                        E.g. "string", "number", "bool", "unit", "tuple", "list".
             value: The value of the node.
         """
-        super().__init__("Value", type)
+        self.type = type
         self.value = value
 
+    def mutable_list(self) -> list:
+        """
+        Returns the elements of a list as a Python list that can be mutated,
+        materializing a lazy range first.
+        """
+        if isinstance(self.value, Range):
+            self.value = list(self.value)
+        return self.value
+
     def listValueToStr(self):
         return list(map(lambda a: a.formatted_str(), self.value))
     
@@ -108,9 +160,10 @@ class ValueAtom(Atom):
         return self.format(False)
 
     def format(self, raw: bool) -> str:
-        if self.type == "string":
-            if raw: return self.value
-            escaped = self.value.replace("\n", "\\n").replace("\t", "\\t").replace("\r", "\\r")
+        if self.type == "string" or self.type == "builder":
+            text = self.value if self.type == "string" else str(self.value)
+            if raw: return text
+            escaped = text.replace("\n", "\\n").replace("\t", "\\t").replace("\r", "\\r")
             return f"'{escaped}'"
         elif self.type == "bool":
             return str(self.value).lower()
@@ -120,13 +173,27 @@ class ValueAtom(Atom):
             return '(' + ", ".join(self.listValueToStr()) + ')'
         elif self.type == "list":
             return '[' + ", ".join(self.listValueToStr()) + ']'
+        elif self.type == "set":
+            return 'set([' + ", ".join(self.listValueToStr()) + '])'
+        elif self.type == "bytes":
+            return f"<bytes of {len(self.value)}>" # Not the content, which may be a whole mapped file
+        elif self.type == "iterator":
+            return "<iterator>"
         elif self.type == "map":
             if not isinstance(self.value, dict):
                 raise Exception(f"ValueAtom of type 'map' has value of type '{type(self.value)}'!")
-            value: dict[str, ValueAtom] = self.value
-            return '#{' + ", ".join(map(lambda t: f"{t[0]}: {t[1].formatted_str()}", value.items())) + '}'
+            value: dict[ValueAtom, ValueAtom] = self.value
+            return '#{' + ", ".join(map(lambda t: f"{t[0].key_str()}: {t[1].formatted_str()}", value.items())) + '}'
         return str(self.value)
 
+    def key_str(self) -> str:
+        """
+        Returns the value formatted as a map key, where strings that are valid identifiers are not quoted.
+        """
+        if self.type == "string" and self.value.isidentifier():
+            return self.value
+        return self.formatted_str()
+
 
     def memory_repr(self):
         return f"<{self.uid}:{self.type}:{self.formatted_str()}>"
@@ -141,41 +208,111 @@ class ValueAtom(Atom):
                         if not self.value[key].structural_eq(other.value[key]): return False
                     return True
                 case "tuple" | "list":
+                    if isinstance(self.value, Range) and isinstance(other.value, Range):
+                        return self.value == other.value
                     if len(self.value) != len(other.value): return False
                     return all(map(lambda t: t[0].structural_eq(t[1]), zip(self.value, other.value)))
+                case "set": return self.value.keys() == other.value.keys()
                 case "unit": return True # Unit is always equal
                 case _: return self.value == other.value
         return False
 
+    def __reduce__(self):
+        """
+        Pickle the atom as its type and value, which is much faster than pickling its slots.
+        """
+        if self.type in MUTABLE_TYPES:
+            # The value is set once the atom exists, as it may contain the atom itself
+            return ValueAtom, (self.type, None), (None, {"value": self.value})
+        if type(self.value) is memoryview:
+            return ValueAtom, (self.type, bytes(self.value)) # Views, such as of memory mapped files, are sent as a copy
+        return ValueAtom, (self.type, self.value)
+
+    def __hash__(self) -> int:
+        try:
+            return self._hash
+        except AttributeError:
+            pass
+        if self.type in MUTABLE_TYPES:
+            raise TypeError(f"Unhashable value of type '{self.type}'")
+        if self.type == "tuple":
+            # Hashing the elements fails if any of them is mutable
+            self._hash = hash(("tuple", *self.value))
+        else:
+            self._hash = hash((self.type, self.value))
+        return self._hash
+
+class BytesSliceAtom(ValueAtom):
+    """
+    Bytes sharing the buffer of a larger bytes value or mapped file, and knowing where in it they start,
+    so that they can be searched by searching the buffer itself instead of a copy of the slice.
+    Use `bytes_slice` to create them.
+    """
+    __slots__ = ("base", "offset")
+
+def bytes_buffer(atom: ValueAtom) -> tuple:
+    """
+    Get the `bytes` or `mmap` object holding the data of bytes, and the offset of the data in it.
+    """
+    if isinstance(atom, BytesSliceAtom):
+        return atom.base, atom.offset
+    if isinstance(atom.value, memoryview):
+        if atom.value.nbytes == len(atom.value.obj):
+            return atom.value.obj, 0 # A whole mapped file
+        return bytes(atom.value), 0
+    return atom.value, 0
+
+def bytes_slice(atom: ValueAtom, start: int | None, end: int | None, step: int | None = None) -> ValueAtom:
+    """
+    Slice bytes without copying them.
+    """
+    view = memoryview(atom.value)
+    sliced = view[start:end:step]
+    if step not in (None, 1):
+        return ValueAtom("bytes", sliced) # Not contiguous, searched as a copy
+    base, offset = bytes_buffer(atom)
+    result = BytesSliceAtom("bytes", sliced)
+    result.base = base
+    result.offset = offset + slice(start, end).indices(len(view))[0]
+    return result
+
 class FunctionAtom(Atom):
     """
     A function node in the abstract syntax tree.
     """
-    def __init__(self, argumentNames: list[str], body: Node, environment, name: str = None):
+    def __init__(self, argumentNames: list[str], body: Node, environment, name: str = None, compiled: Callable = None, code = None, scope = None):
         """
         Initialize a function node with a function name, argument names, body and the environment in which it was defined.
+        The body may also be given in its compiled closure form, which is then used when calling the function,
+        and as a bytecode object run directly by the VM.
+        The scope is the slot layout of the environment of a call, if the body has been resolved.
         """
-        super().__init__("Function", "function")
+        super().__init__("function")
         self.argumentNames = argumentNames
         self.body = body
         self.environment = environment
         self.name = name if name is not None else "lambda"
+        self.compiled = compiled
+        self.code = code
+        self.scope = scope
 
     def memory_repr(self):
         return f"<{self.uid}:{self.name}({', '.join(self.argumentNames)})>"
     
     def structural_eq(self, other: "Atom") -> bool:
-        return isinstance(other, FunctionAtom) and self.uid == other.uid # Compare by uid
+        return self is other # Compare by identity
 
 class BuiltinFunctionAtom(Atom):
     """
     A builtin function node in the abstract syntax tree.
     """
+    name = "Built-in function"
+
     def __init__(self, functionName: str, func: Callable):
         """
         Initialize a builtin function node with a function name and a function.
         """
-        super().__init__("Built-in function", "function")
+        super().__init__("function")
         self.functionName = functionName
         self.func = func
 
@@ -183,4 +320,123 @@ class BuiltinFunctionAtom(Atom):
         return f"<built-in: {self.functionName}>"
 
     def structural_eq(self, other: "Atom") -> bool:
-        return isinstance(other, BuiltinFunctionAtom) and self.uid == other.uid # Compare by uid
\ No newline at end of file
+        return self is other # Compare by identity
+
+# Values that may be changed in place, and thus have no hash
+MUTABLE_TYPES = ["list", "map", "set", "builder", "iterator"]
+
+# Shared atoms for primitive values, which are never mutated
+UNIT = ValueAtom("unit", None)
+TRUE = ValueAtom("bool", True)
+FALSE = ValueAtom("bool", False)
+
+# Integers in this range share a cached atom
+SMALL_INT_MIN = -128
+SMALL_INT_MAX = 1024
+small_ints = [ValueAtom("number", i) for i in range(SMALL_INT_MIN, SMALL_INT_MAX)]
+
+def number_atom(value) -> ValueAtom:
+    """
+    Get a number atom, reusing the cached atom of a small integer.
+    """
+    if type(value) is int and SMALL_INT_MIN <= value < SMALL_INT_MAX:
+        return small_ints[value - SMALL_INT_MIN]
+    return ValueAtom("number", value)
+
+def bool_atom(value) -> ValueAtom:
+    """
+    Get the shared atom of a bool.
+    """
+    return TRUE if value else FALSE
+
+class Range():
+    """
+    A lazy sequence of number atoms, used as the value of a list created from a range.
+    Elements are only created when they are accessed, so the size of a range does not
+    affect its memory use. Lists mutate a range into a Python list with `ValueAtom.mutable_list`.
+    """
+    __slots__ = ("range",)
+
+    def __init__(self, range: range):
+        """
+        Initialize a lazy sequence over a Python range of integers.
+        """
+        self.range = range
+
+    def __len__(self) -> int:
+        return len(self.range)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return Range(self.range[index])
+        return number_atom(self.range[index])
+
+    def __iter__(self):
+        return map(number_atom, self.range)
+
+    def __reversed__(self):
+        return map(number_atom, reversed(self.range))
+
+    def __contains__(self, item) -> bool:
+        number = self.number_of(item)
+        return number is not None and number in self.range
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Range):
+            return self.range == other.range
+        if isinstance(other, list):
+            return len(self.range) == len(other) and all(a == b for a, b in zip(self, other))
+        return False
+
+    def __add__(self, other) -> list:
+        return [*self, *other]
+
+    def __radd__(self, other) -> list:
+        return [*other, *self]
+
+    def index(self, item) -> int:
+        if item not in self:
+            raise ValueError(f"{item} is not in range")
+        return self.range.index(self.number_of(item))
+
+    def count(self, item) -> int:
+        return 1 if item in self else 0
+
+    @staticmethod
+    def number_of(item) -> int | None:
+        """
+        The integer value of a number atom, or `None` if the item can not be in a range.
+        """
+        if not isinstance(item, ValueAtom) or item.type != "number":
+            return None
+        value = item.value
+        if isinstance(value, float):
+            return int(value) if value.is_integer() else None
+        return value if isinstance(value, int) else None
+
+class StringBuilder():
+    """
+    A string built from appended parts, used as the value of a string builder.
+    The parts are only joined when the string is read, and then kept joined,
+    so building a string by appending to it takes linear time.
+    """
+    __slots__ = ("parts", "length")
+
+    def __init__(self):
+        self.parts: list[str] = []
+        self.length = 0
+
+    def append(self, text: str):
+        self.parts.append(text)
+        self.length += len(text)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __str__(self) -> str:
+        if len(self.parts) > 1:
+            self.parts = ["".join(self.parts)]
+        return self.parts[0] if len(self.parts) > 0 else ""
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, StringBuilder) and str(self) == str(other)
@@ -0,0 +1,393 @@
+from .atoms import number_atom
+from .ast import AtomicNode, BinaryNode, BlockNode, BreakNode, ContinueNode, ForNode, IfNode, LambdaNode, ListNode, MapNode, Node, ProgramNode, SliceNode, TupleNode, UnaryNode, WhileNode
+from .environment import Scope
+from .evaluator import is_identifier, literal_atom, map_key, member_key
+
+# Opcodes
+# Every instruction is an opcode followed by a single argument,
+# which is an index into the constants or names of the code object,
+# a jump target, a count or unused (0).
+CONST = 0           # Push constant
+UNIT = 1            # Push unit
+LOAD_GLOBAL = 2     # Push the value of a global variable
+STORE_NAME = 3      # Bind a variable by name to the top of the stack, leaving it on the stack
+POP = 4             # Discard the top of the stack
+ADD = 5
+SUB = 6
+MUL = 7
+DIV = 8
+MOD = 9
+POW = 10
+LESS = 11
+GREATER = 12
+LESS_EQUAL = 13
+GREATER_EQUAL = 14
+EQUAL = 15
+NOT_EQUAL = 16
+AND = 17
+OR = 18
+BINARY = 19         # Any other binary operator, named by a constant
+NEGATE = 20
+NOT = 21
+JUMP = 22           # Jump to target
+JUMP_IF_FALSE = 23  # Pop a bool condition and jump to target if it is false
+CALL = 24           # Call a function with a number of arguments
+CALL_SPREAD = 25    # Call a function with a single argument, spreading tuples and unit
+RETURN = 26         # Return the top of the stack from the current code object
+BUILD_LIST = 27
+BUILD_TUPLE = 28
+BUILD_MAP = 29      # Build a map from values and a constant tuple of keys
+INDEX = 30
+SLICE = 31          # Slice a list or tuple with start, end and step
+MEMBER = 32         # Access a member by its constant key
+MAKE_FUNCTION = 33  # Create a function from a constant code object
+ENTER_BLOCK = 34    # Enter a new block scope with a constant slot layout
+EXIT_BLOCK = 35     # Leave the current block scope
+EVAL = 36           # Evaluate a constant node with the tree-walker
+LOAD_LOCAL = 37     # Push the value of a slot in the current scope
+LOAD_OUTER = 38     # Push the value of a slot in an enclosing scope, given a constant depth and slot
+STORE_LOCAL = 39    # Bind a slot in the current scope to the top of the stack, leaving it on the stack
+TAIL_CALL = 40      # Call in tail position, replacing the current frame when calling a function with bytecode
+TAIL_CALL_SPREAD = 41
+GET_ITER = 42       # Replace the top of the stack with an iterator over it, for a number of loop variables
+FOR_ITER = 43       # Push the next value of the iterator on top of the stack, or pop it and jump to target when exhausted
+UNPACK = 44         # Replace a list of values on top of the stack with its elements, the first on top
+
+opnames = {
+    value: name for name, value in globals().items()
+    if name.isupper() and isinstance(value, int)
+}
+
+# Binary operators with a dedicated opcode
+binary_opcodes = {
+    "PLUS": ADD,
+    "MINUS": SUB,
+    "MULTIPLY": MUL,
+    "DIVIDE": DIV,
+    "MODULO": MOD,
+    "POWER": POW,
+    "LESS": LESS,
+    "GREATER": GREATER,
+    "LESSEQUAL": LESS_EQUAL,
+    "GREATEREQUAL": GREATER_EQUAL,
+    "EQUAL": EQUAL,
+    "NOTEQUAL": NOT_EQUAL,
+    "AND": AND,
+    "OR": OR,
+    "INDEX": INDEX,
+}
+
+class CodeObject():
+    """
+    A compiled unit of bytecode, either a whole program or the body of a function.
+    """
+    def __init__(self, name: str, params: list[str], body: Node, scope: Scope = None):
+        """
+        Initialize an empty code object with a name, parameters, the node it is compiled from
+        and the slot layout of the environment it runs in.
+        """
+        self.name = name
+        self.params = params
+        self.body = body
+        self.scope = scope
+        self.instructions: list[int] = []
+        self.consts: list = []
+        self.names: list[str] = []
+        self.entry = None # Callable running the code object, set by the VM
+
+    def emit(self, op: int, arg = 0) -> int:
+        """
+        Append an instruction and return its position.
+        """
+        self.instructions += [op, arg]
+        return len(self.instructions) - 2
+
+    def patch(self, at: int, target: int):
+        """
+        Set the argument of the instruction at the given position.
+        """
+        self.instructions[at + 1] = target
+
+    def here(self) -> int:
+        """
+        The position of the next instruction.
+        """
+        return len(self.instructions)
+
+    def const(self, value) -> int:
+        """
+        Add a constant and return its index.
+        """
+        self.consts.append(value)
+        return len(self.consts) - 1
+
+    def name_index(self, name: str) -> int:
+        """
+        Get the index of a name, adding it if needed.
+        """
+        if name not in self.names:
+            self.names.append(name)
+        return self.names.index(name)
+
+    def disassemble(self) -> list[str]:
+        """
+        Returns a human readable listing of the instructions, including nested code objects.
+        """
+        lines = [f"<code {self.name}({', '.join(self.params)})>"]
+        nested = []
+        for ip in range(0, len(self.instructions), 2):
+            op, arg = self.instructions[ip], self.instructions[ip + 1]
+            detail = ""
+            if op in [CONST, BINARY, BUILD_MAP, MAKE_FUNCTION, EVAL, ENTER_BLOCK, LOAD_OUTER, MEMBER]:
+                c = self.consts[arg]
+                detail = f"({c.name})" if isinstance(c, CodeObject) else f"({c})"
+                if isinstance(c, CodeObject): nested.append(c)
+            elif op in [LOAD_GLOBAL, STORE_NAME]:
+                detail = f"({self.names[arg]})"
+            lines.append(f"{ip:>6} {opnames[op]:<16} {arg} {detail}".rstrip())
+        for code in nested:
+            lines += code.disassemble()
+        return lines
+
+class Loop():
+    """
+    The jump targets of a loop being compiled.
+    """
+    def __init__(self, start: int, blocks: int):
+        """
+        Initialize a loop continuing at the start position,
+        with the number of blocks entered outside of it.
+        """
+        self.start = start
+        self.blocks = blocks
+        self.breaks: list[int] = [] # Jumps to patch with the end of the loop
+
+class BytecodeCompiler():
+    """
+    Compiles the expressions of a node into a code object.
+    """
+    def __init__(self, code: CodeObject):
+        self.code = code
+        self.blocks = 0 # Number of blocks entered
+        self.loops: list[Loop] = [] # Innermost loop last
+
+    def compile(self, expression: Node, tail = False):
+        """
+        Compile an expression, leaving its value on the stack.
+        Calls in tail position of a function body are compiled as tail calls.
+        """
+        code = self.code
+        if isinstance(expression, AtomicNode):
+            if is_identifier(expression):
+                self.compile_load(expression)
+            elif expression.atom is not None:
+                code.emit(CONST, code.const(expression.atom))
+            else:
+                code.emit(CONST, code.const(literal_atom(expression.type, expression.value)))
+        elif isinstance(expression, TupleNode):
+            if len(expression.elements) == 0:
+                code.emit(UNIT)
+            elif len(expression.elements) == 1:
+                self.compile(expression.elements[0], tail)
+            else:
+                self.compile_all(expression.elements)
+                code.emit(BUILD_TUPLE, len(expression.elements))
+        elif isinstance(expression, ListNode):
+            self.compile_all(expression.elements)
+            code.emit(BUILD_LIST, len(expression.elements))
+        elif isinstance(expression, MapNode):
+            keys = tuple(map_key(key) for key in expression.pairs.keys())
+            self.compile_all(expression.pairs.values())
+            code.emit(BUILD_MAP, code.const(keys))
+        elif isinstance(expression, BlockNode) and not expression.scoped:
+            self.compile_sequence(expression.expressions, tail)
+        elif isinstance(expression, BlockNode):
+            code.emit(ENTER_BLOCK, code.const(expression.scope))
+            self.blocks += 1
+            self.compile_sequence(expression.expressions, tail)
+            self.blocks -= 1
+            code.emit(EXIT_BLOCK)
+        elif isinstance(expression, LambdaNode):
+            code.emit(MAKE_FUNCTION, code.const(compile_function("lambda", expression.params, expression.body, expression.scope)))
+        elif isinstance(expression, IfNode):
+            self.compile_if(expression, tail)
+        elif isinstance(expression, WhileNode):
+            self.compile_while(expression)
+        elif isinstance(expression, ForNode):
+            self.compile_for(expression)
+        elif isinstance(expression, (BreakNode, ContinueNode)):
+            self.compile_loop_control(expression)
+        elif isinstance(expression, UnaryNode) and expression.operator in ["MINUS", "NOT"]:
+            self.compile(expression.rhs)
+            code.emit(NEGATE if expression.operator == "MINUS" else NOT)
+        elif isinstance(expression, BinaryNode):
+            self.compile_binary(expression, tail)
+        else:
+            code.emit(EVAL, code.const(expression))
+
+    def compile_load(self, expression: AtomicNode):
+        code = self.code
+        if expression.address is None:
+            code.emit(LOAD_GLOBAL, code.name_index(expression.value))
+        elif expression.address[0] == 0:
+            code.emit(LOAD_LOCAL, expression.address[1])
+        else:
+            code.emit(LOAD_OUTER, code.const(expression.address))
+
+    def compile_store(self, expression: AtomicNode):
+        code = self.code
+        if expression.address is None:
+            code.emit(STORE_NAME, code.name_index(expression.value))
+        else:
+            # Assignments always declare the variable in the current scope
+            code.emit(STORE_LOCAL, expression.address[1])
+
+    def compile_all(self, expressions: list[Node]):
+        for e in expressions:
+            self.compile(e)
+
+    def compile_sequence(self, expressions: list[Node], tail = False):
+        """
+        Compile expressions evaluated in order, leaving only the last result (or unit) on the stack.
+        """
+        if len(expressions) == 0:
+            self.code.emit(UNIT)
+        for i, e in enumerate(expressions):
+            if i > 0: self.code.emit(POP)
+            self.compile(e, tail and i == len(expressions) - 1)
+
+    def compile_if(self, expression: IfNode, tail: bool):
+        code = self.code
+        end_jumps = []
+        for cond, body in [(expression.condition, expression.ifBody)] + expression.elseIfs:
+            self.compile(cond)
+            next_branch = code.emit(JUMP_IF_FALSE)
+            self.compile(body, tail)
+            end_jumps.append(code.emit(JUMP))
+            code.patch(next_branch, code.here())
+        if expression.elseBody is None:
+            code.emit(UNIT)
+        else:
+            self.compile(expression.elseBody, tail)
+        for jump in end_jumps:
+            code.patch(jump, code.here())
+
+    def compile_while(self, expression: WhileNode):
+        code = self.code
+        loop = Loop(code.here(), self.blocks)
+        self.compile(expression.condition)
+        loop.breaks.append(code.emit(JUMP_IF_FALSE))
+        self.compile_loop_body(loop, expression.body)
+        for jump in loop.breaks:
+            code.patch(jump, code.here())
+        code.emit(UNIT)
+
+    def compile_for(self, expression: ForNode):
+        code = self.code
+        count = len(expression.variables)
+        self.compile(expression.iterable)
+        code.emit(GET_ITER, count)
+        loop = Loop(code.here(), self.blocks)
+        exhausted = code.emit(FOR_ITER)
+        if count > 1:
+            code.emit(UNPACK, count)
+        for variable in expression.variables:
+            self.compile_store(variable)
+            code.emit(POP)
+        self.compile_loop_body(loop, expression.body)
+        # A break leaves the iterator on the stack
+        for jump in loop.breaks:
+            code.patch(jump, code.here())
+        code.emit(POP)
+        code.patch(exhausted, code.here())
+        code.emit(UNIT)
+
+    def compile_loop_body(self, loop: Loop, body: Node):
+        """
+        Compile the body of a loop, discarding its value and jumping back to the start of the loop.
+        """
+        self.loops.append(loop)
+        self.compile(body)
+        self.loops.pop()
+        self.code.emit(POP)
+        self.code.emit(JUMP, loop.start)
+
+    def compile_loop_control(self, expression: BreakNode | ContinueNode):
+        """
+        Compile a `break` or `continue`, leaving the blocks entered in the loop body
+        and jumping to the end or start of the innermost loop.
+        """
+        code = self.code
+        loop = self.loops[-1]
+        for _ in range(self.blocks - loop.blocks):
+            code.emit(EXIT_BLOCK)
+        if isinstance(expression, BreakNode):
+            loop.breaks.append(code.emit(JUMP))
+        else:
+            code.emit(JUMP, loop.start)
+
+    def compile_binary(self, expression: BinaryNode, tail: bool):
+        code = self.code
+        op = expression.operator
+        left, right = expression.left, expression.right
+        if op == "ASSIGNMENT":
+            if is_identifier(left):
+                self.compile(right)
+                self.compile_store(left)
+            elif (isinstance(left, BinaryNode) and left.operator == "CALL" and is_identifier(left.left)
+                    and isinstance(left.right, TupleNode) and all(is_identifier(a) for a in left.right.elements)):
+                # Function declaration
+                params = [a.value for a in left.right.elements]
+                code.emit(MAKE_FUNCTION, code.const(compile_function(left.left.value, params, right, expression.scope)))
+                self.compile_store(left.left)
+            else:
+                # Member and index assignments, as well as invalid patterns
+                code.emit(EVAL, code.const(expression))
+        elif op == "CALL":
+            self.compile(left)
+            if isinstance(right, TupleNode) and len(right.elements) != 1:
+                self.compile_all(right.elements)
+                code.emit(TAIL_CALL if tail else CALL, len(right.elements))
+            else:
+                # A single argument may evaluate to a tuple or unit, which is spread into the arguments
+                self.compile(right)
+                code.emit(TAIL_CALL_SPREAD if tail else CALL_SPREAD)
+        elif op == "DOT" and is_identifier(right):
+            self.compile(left)
+            code.emit(MEMBER, code.const(member_key(right.value)))
+        elif op == "INDEX" and isinstance(right, SliceNode):
+            self.compile(left)
+            self.compile(right.start)
+            self.compile(right.end)
+            if right.step is None:
+                code.emit(CONST, code.const(number_atom(1)))
+            else:
+                self.compile(right.step)
+            code.emit(SLICE)
+        elif op in ["DOT", "PLUSEQUAL"]:
+            code.emit(EVAL, code.const(expression))
+        else:
+            self.compile(left)
+            self.compile(right)
+            if op in binary_opcodes:
+                code.emit(binary_opcodes[op])
+            else:
+                code.emit(BINARY, code.const(op))
+
+def compile_function(name: str, params: list[str], body: Node, scope: Scope) -> CodeObject:
+    """
+    Compile the body of a function into a code object.
+    """
+    code = CodeObject(name, params, body, scope)
+    BytecodeCompiler(code).compile(body, True)
+    code.emit(RETURN)
+    return code
+
+def compile_program(program: ProgramNode) -> CodeObject:
+    """
+    Compile a program node into a code object returning the result of the last expression.
+    """
+    code = CodeObject("<program>", [], program)
+    BytecodeCompiler(code).compile_sequence(program.expressions)
+    code.emit(RETURN)
+    return code
@@ -0,0 +1,90 @@
+import hashlib
+import os
+import pickle
+import sys
+
+from .ast import ProgramNode
+from .lexer import Lexer
+from .parser import Parser
+
+# Parsed programs are cached next to their source file in this directory,
+# much like Python caches bytecode in `__pycache__`
+CACHE_DIR = "__minicache__"
+CACHE_EXTENSION = ".mc"
+MAGIC = b"MINI\x01"
+
+# The modules deciding the shape of a parsed program,
+# a change to any of them invalidates all cached programs
+SOURCES = ["ast.py", "lexer.py", "parser.py"]
+
+version = None
+def interpreter_version() -> bytes:
+    """
+    Get a digest identifying the interpreter and Python version that cached programs are valid for.
+    """
+    global version
+    if version is None:
+        digest = hashlib.sha256(MAGIC + sys.version.encode())
+        directory = os.path.dirname(__file__)
+        for source in SOURCES:
+            with open(os.path.join(directory, source), "rb") as f:
+                digest.update(f.read())
+        version = digest.digest()
+    return version
+
+def cache_path(filepath: str) -> str:
+    """
+    Get the path of the cached program for a source file.
+    """
+    directory, name = os.path.split(os.path.abspath(filepath))
+    return os.path.join(directory, CACHE_DIR, os.path.splitext(name)[0] + CACHE_EXTENSION)
+
+def cache_key(source: str) -> bytes:
+    """
+    Get the key of a source, which changes with its content and the interpreter version.
+    """
+    return hashlib.sha256(interpreter_version() + source.encode("utf-8", "surrogatepass")).digest()
+
+def load(path: str, key: bytes) -> ProgramNode | None:
+    """
+    Load a cached program, or `None` if there is none for the key.
+    A cache file that can not be read is treated as missing.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        header = MAGIC + key
+        if not data.startswith(header):
+            return None
+        program = pickle.loads(data[len(header):])
+        return program if isinstance(program, ProgramNode) else None
+    except Exception:
+        return None
+
+def store(path: str, key: bytes, program: ProgramNode):
+    """
+    Write a program to the cache.
+    The file is replaced atomically, so concurrent runs never read a partial file.
+    Failing to write the cache is not an error.
+    """
+    try:
+        data = MAGIC + key + pickle.dumps(program, pickle.HIGHEST_PROTOCOL)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp = f"{path}.{os.getpid()}.tmp"
+        with open(temp, "wb") as f:
+            f.write(data)
+        os.replace(temp, path)
+    except (OSError, pickle.PicklingError, RecursionError):
+        pass
+
+def parse_cached(filepath: str, source: str) -> ProgramNode:
+    """
+    Parse the source of a file, or load its parsed program from the cache if the source is unchanged.
+    """
+    path = cache_path(filepath)
+    key = cache_key(source)
+    program = load(path, key)
+    if program is None:
+        program = Parser(Lexer(source)).parse()
+        store(path, key, program)
+    return program
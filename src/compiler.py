@@ -0,0 +1,476 @@
+import operator
+from typing import Callable
+
+from .atoms import UNIT, Atom, FunctionAtom, ValueAtom, bool_atom, number_atom
+from .ast import AtomicNode, BinaryNode, BlockNode, BreakNode, ContinueNode, ForNode, IfNode, LambdaNode, ListNode, MapNode, Node, ProgramNode, SliceNode, TupleNode, UnaryNode, WhileNode
+from .environment import Environment
+from . import heatmap, profiler
+from .evaluator import BREAK, CONTINUE, TailCall, evaluate_binary_atom_expression, evaluate_call, evaluate_expression, evaluate_function_atom_call, evaluate_member_atom_expression, evaluate_slice_atom_expression, evaluate_unary_atom_expression, is_identifier, iterate, literal_atom, map_key, member_key, spread_arguments
+
+# A compiled expression, evaluated by calling it with the environment to evaluate in
+Compiled = Callable[[Environment], Atom]
+
+# Binary operators with a fast path for two numbers, and the constructor of their result
+# Any other operand types are handed to `evaluate_binary_atom_expression`
+number_operators = {
+    "PLUS": (operator.add, number_atom),
+    "MINUS": (operator.sub, number_atom),
+    "MULTIPLY": (operator.mul, number_atom),
+    "DIVIDE": (operator.truediv, number_atom),
+    "MODULO": (operator.mod, number_atom),
+    "POWER": (operator.pow, number_atom),
+    "LESS": (operator.lt, bool_atom),
+    "GREATER": (operator.gt, bool_atom),
+    "LESSEQUAL": (operator.le, bool_atom),
+    "GREATEREQUAL": (operator.ge, bool_atom),
+}
+
+# Comparison operators with a fast path for two primitive values of the same type
+equality_operators = {
+    "EQUAL": operator.eq,
+    "NOTEQUAL": operator.ne,
+}
+
+# Logical operators with a fast path for two bools
+bool_operators = {
+    "AND": lambda a, b: a and b,
+    "OR": lambda a, b: a or b,
+}
+
+primitive_types = ["number", "string", "bool"]
+
+def compile_fallback(expression: Node) -> Compiled:
+    """
+    Evaluate an expression with the tree-walking evaluator.
+    """
+    def fallback(env: Environment) -> Atom:
+        return evaluate_expression(expression, env)
+    return fallback
+
+def lookup_unassigned(env: Environment, name: str) -> Atom:
+    """
+    Look up a variable by name in the enclosing scopes of an environment,
+    used when its slot has not been assigned yet.
+    """
+    val = env.parent.get(name)
+    if val is None:
+        raise Exception(f"identifier '{name}' is not defined")
+    return val
+
+def compile_identifier(expression: AtomicNode) -> Compiled:
+    name = expression.value
+    if expression.address is None:
+        def global_(env: Environment) -> Atom:
+            val = env.globals.values.get(name)
+            if val is None:
+                val = env.globals.load(name)
+            if val is None:
+                raise Exception(f"identifier '{name}' is not defined")
+            return val
+        return global_
+    depth, slot = expression.address
+    if depth == 0:
+        def local(env: Environment) -> Atom:
+            val = env.slots[slot]
+            if val is None:
+                return lookup_unassigned(env, name)
+            return val
+        return local
+    def outer(env: Environment) -> Atom:
+        for _ in range(depth):
+            env = env.parent
+        val = env.slots[slot]
+        if val is None:
+            return lookup_unassigned(env, name)
+        return val
+    return outer
+
+def compile_atomic(expression: AtomicNode) -> Compiled:
+    if is_identifier(expression):
+        return compile_identifier(expression)
+    # Literals are immutable, so a single atom is shared by all evaluations
+    atom = expression.atom
+    if atom is None:
+        atom = literal_atom(expression.type, expression.value)
+    return lambda env: atom
+
+def compile_tuple(expression: TupleNode, tail: bool) -> Compiled:
+    if len(expression.elements) == 0:
+        return lambda env: UNIT
+    elif len(expression.elements) == 1:
+        return compile_expression(expression.elements[0], tail)
+    elements = compile_expressions(expression.elements)
+    return lambda env: ValueAtom("tuple", [e(env) for e in elements])
+
+def compile_list(expression: ListNode) -> Compiled:
+    elements = compile_expressions(expression.elements)
+    return lambda env: ValueAtom("list", [e(env) for e in elements])
+
+def compile_map(expression: MapNode) -> Compiled:
+    # Keys are constant, so they are validated and turned into atoms once
+    pairs = [(map_key(key), compile_expression(value)) for key, value in expression.pairs.items()]
+    def map(env: Environment) -> Atom:
+        map_values: dict[Atom, Atom] = {}
+        for key, value in pairs:
+            map_values[key] = value(env)
+        return ValueAtom("map", map_values)
+    return map
+
+def compile_block(expression: BlockNode, tail: bool) -> Compiled:
+    expressions = compile_expressions(expression.expressions[:-1])
+    expressions += compile_expressions(expression.expressions[-1:], tail)
+    scope = expression.scope
+    if expression.breaks:
+        # Stop at a `break` or `continue` and return it to the loop
+        def block_breaks(env: Environment) -> Atom:
+            if scope is not None:
+                env = Environment("<block>", env, scope)
+            result = UNIT
+            for e in expressions:
+                result = e(env)
+                if result is BREAK or result is CONTINUE:
+                    return result
+            return result
+        return block_breaks
+    if not expression.scoped:
+        def body(env: Environment) -> Atom:
+            result = UNIT
+            for e in expressions:
+                result = e(env)
+            return result
+        return body
+    def block(env: Environment) -> Atom:
+        env = Environment("<block>", env, scope)
+        result = UNIT
+        for e in expressions:
+            result = e(env)
+        return result
+    return block
+
+def compile_while(expression: WhileNode) -> Compiled:
+    cond = compile_condition(expression.condition)
+    body = compile_expression(expression.body)
+    def while_(env: Environment) -> Atom:
+        while cond(env):
+            if body(env) is BREAK:
+                break
+        return UNIT
+    return while_
+
+def compile_for(expression: ForNode) -> Compiled:
+    iterable = compile_expression(expression.iterable)
+    body = compile_expression(expression.body)
+    stores = [compile_store(v) for v in expression.variables]
+    count = len(stores)
+    if count == 1:
+        store = stores[0]
+        def for_(env: Environment) -> Atom:
+            for value in iterate(iterable(env), 1):
+                store(env, value)
+                if body(env) is BREAK:
+                    break
+            return UNIT
+        return for_
+    def for_unpack(env: Environment) -> Atom:
+        for values in iterate(iterable(env), count):
+            for store, value in zip(stores, values):
+                store(env, value)
+            if body(env) is BREAK:
+                break
+        return UNIT
+    return for_unpack
+
+def compile_lambda(expression: LambdaNode) -> Compiled:
+    params, body, scope = expression.params, expression.body, expression.scope
+    compiled = compile_expression(body, True)
+    return lambda env: FunctionAtom(params, body, env, compiled=compiled, scope=scope)
+
+def compile_condition(expression: Node) -> Callable[[Environment], bool]:
+    cond = compile_expression(expression)
+    def condition(env: Environment) -> bool:
+        value = cond(env)
+        if not isinstance(value, ValueAtom) or not value.type == "bool":
+            raise Exception(f"Condition does not evaluate to a bool")
+        return value.value
+    return condition
+
+def compile_if(expression: IfNode, tail: bool) -> Compiled:
+    branches = [(compile_condition(expression.condition), compile_expression(expression.ifBody, tail))]
+    for cond, body in expression.elseIfs:
+        branches.append((compile_condition(cond), compile_expression(body, tail)))
+    if expression.elseBody is None:
+        elseBody = lambda env: UNIT
+    else:
+        elseBody = compile_expression(expression.elseBody, tail)
+    def if_(env: Environment) -> Atom:
+        for cond, body in branches:
+            if cond(env):
+                return body(env)
+        return elseBody(env)
+    return if_
+
+def compile_unary(expression: UnaryNode) -> Compiled:
+    op = expression.operator
+    rhs = compile_expression(expression.rhs)
+    if op == "MINUS":
+        def minus(env: Environment) -> Atom:
+            value = rhs(env)
+            if value.type == "number":
+                return number_atom(-value.value)
+            return evaluate_unary_atom_expression(op, value)
+        return minus
+    elif op == "NOT":
+        def not_(env: Environment) -> Atom:
+            value = rhs(env)
+            if value.type == "bool":
+                return bool_atom(not value.value)
+            return evaluate_unary_atom_expression(op, value)
+        return not_
+    return lambda env: evaluate_unary_atom_expression(op, rhs(env))
+
+def compile_call(expression: BinaryNode, tail: bool) -> Compiled:
+    """
+    Compile a call, which in tail position returns a `TailCall` when calling a mini function.
+    """
+    if profiler.active is not None:
+        return compile_profiled_call(expression, tail)
+    if tail:
+        return compile_tail_call(expression)
+    function = compile_expression(expression.left)
+    args = expression.right
+    if not isinstance(args, TupleNode) or len(args.elements) == 1:
+        # A single argument may evaluate to a tuple or unit, which is spread into the arguments
+        arg = compile_expression(args)
+        def call_spread(env: Environment) -> Atom:
+            f = function(env)
+            value = arg(env)
+            if isinstance(value, ValueAtom) and value.type == "tuple":
+                return evaluate_call(f, value.value)
+            elif isinstance(value, ValueAtom) and value.type == "unit":
+                return evaluate_call(f, [])
+            return evaluate_call(f, [value])
+        return call_spread
+    elements = compile_expressions(args.elements)
+    def call(env: Environment) -> Atom:
+        f = function(env)
+        values = [e(env) for e in elements]
+        if type(f) is FunctionAtom:
+            return evaluate_function_atom_call(f, values)
+        return evaluate_call(f, values)
+    return call
+
+def compile_profiled_call(expression: BinaryNode, tail: bool) -> Compiled:
+    """
+    Compile a call that tells the profiler where it is made from.
+    Only programs compiled while profiling use it, so other calls pay nothing for profiling.
+    """
+    function = compile_expression(expression.left)
+    arg = compile_expression(expression.right)
+    position = expression.position
+    def profiled_call(env: Environment) -> Atom:
+        f = function(env)
+        values = spread_arguments(arg(env))
+        if profiler.active is not None:
+            profiler.active.site = position
+        if tail and type(f) is FunctionAtom:
+            return TailCall(f, values)
+        return evaluate_call(f, values)
+    return profiled_call
+
+def compile_tail_call(expression: BinaryNode) -> Compiled:
+    function = compile_expression(expression.left)
+    args = expression.right
+    if not isinstance(args, TupleNode) or len(args.elements) == 1:
+        arg = compile_expression(args)
+        def tail_call_spread(env: Environment) -> Atom:
+            f = function(env)
+            values = spread_arguments(arg(env))
+            if type(f) is FunctionAtom:
+                return TailCall(f, values)
+            return evaluate_call(f, values)
+        return tail_call_spread
+    elements = compile_expressions(args.elements)
+    def tail_call(env: Environment) -> Atom:
+        f = function(env)
+        values = [e(env) for e in elements]
+        if type(f) is FunctionAtom:
+            return TailCall(f, values)
+        return evaluate_call(f, values)
+    return tail_call
+
+def compile_store(variable: AtomicNode) -> Callable[[Environment, Atom], None]:
+    """
+    Compile binding a variable in the current scope to a value.
+    """
+    name = variable.value
+    if variable.address is not None:
+        # Assignments always declare the variable in the current scope
+        slot = variable.address[1]
+        def store_local(env: Environment, value: Atom):
+            env.slots[slot] = value
+        return store_local
+    def store(env: Environment, value: Atom):
+        env.set(name, value)
+    return store
+
+def compile_assignment(expression: BinaryNode) -> Compiled:
+    left = expression.left
+    if is_identifier(left):
+        name = left.value
+        rhs = compile_expression(expression.right)
+        if left.address is not None:
+            # Assignments always declare the variable in the current scope
+            slot = left.address[1]
+            def assign_local(env: Environment) -> Atom:
+                value = rhs(env)
+                env.slots[slot] = value
+                return value
+            return assign_local
+        def assign(env: Environment) -> Atom:
+            value = rhs(env)
+            env.set(name, value)
+            return value
+        return assign
+    if isinstance(left, BinaryNode) and left.operator == "CALL" and is_identifier(left.left) and isinstance(left.right, TupleNode):
+        if all(is_identifier(a) for a in left.right.elements):
+            # Function declaration
+            name = left.left.value
+            argNames = [a.value for a in left.right.elements]
+            body = expression.right
+            scope = expression.scope
+            compiled = compile_expression(body, True)
+            def declare(env: Environment) -> Atom:
+                value = FunctionAtom(argNames, body, env, name, compiled, scope=scope)
+                env.set(name, value)
+                return value
+            return declare
+    # Member and index assignments, as well as invalid patterns
+    return compile_fallback(expression)
+
+def compile_member(expression: BinaryNode) -> Compiled:
+    lhs = compile_expression(expression.left)
+    member = member_key(expression.right.value)
+    return lambda env: evaluate_member_atom_expression(lhs(env), member)
+
+def compile_slice(expression: BinaryNode) -> Compiled:
+    lhs = compile_expression(expression.left)
+    slice = expression.right
+    start = compile_expression(slice.start)
+    end = compile_expression(slice.end)
+    if slice.step is None:
+        step = lambda env: number_atom(1)
+    else:
+        step = compile_expression(slice.step)
+    def slice_(env: Environment) -> Atom:
+        value = lhs(env)
+        return evaluate_slice_atom_expression(value, start(env), end(env), step(env))
+    return slice_
+
+def compile_binary(expression: BinaryNode, tail: bool) -> Compiled:
+    op = expression.operator
+    if op == "ASSIGNMENT":
+        return compile_assignment(expression)
+    if op == "CALL":
+        return compile_call(expression, tail)
+    if op == "DOT" and is_identifier(expression.right):
+        return compile_member(expression)
+    if op == "INDEX" and isinstance(expression.right, SliceNode):
+        return compile_slice(expression)
+    if op in ["DOT", "PLUSEQUAL"]:
+        return compile_fallback(expression)
+
+    left = compile_expression(expression.left)
+    right = compile_expression(expression.right)
+    if op in number_operators:
+        fn, result = number_operators[op]
+        def number_op(env: Environment) -> Atom:
+            lhs = left(env)
+            rhs = right(env)
+            if lhs.type == "number" and rhs.type == "number":
+                return result(fn(lhs.value, rhs.value))
+            return binary_atom_expression(op, lhs, rhs, env)
+        return number_op
+    if op in equality_operators:
+        fn = equality_operators[op]
+        def equality_op(env: Environment) -> Atom:
+            lhs = left(env)
+            rhs = right(env)
+            if lhs.type == rhs.type and lhs.type in primitive_types:
+                return bool_atom(fn(lhs.value, rhs.value))
+            return binary_atom_expression(op, lhs, rhs, env)
+        return equality_op
+    if op in bool_operators:
+        fn = bool_operators[op]
+        def bool_op(env: Environment) -> Atom:
+            lhs = left(env)
+            rhs = right(env)
+            if lhs.type == "bool" and rhs.type == "bool":
+                return bool_atom(fn(lhs.value, rhs.value))
+            return binary_atom_expression(op, lhs, rhs, env)
+        return bool_op
+    def binary_op(env: Environment) -> Atom:
+        return binary_atom_expression(op, left(env), right(env), env)
+    return binary_op
+
+def binary_atom_expression(op: str, lhs: Atom, rhs: Atom, env: Environment) -> Atom:
+    result = evaluate_binary_atom_expression(op, lhs, rhs, env)
+    if result is None:
+        raise Exception(f"Unknown binary operator '{op}'")
+    return result
+
+def compile_expression(expression: Node, tail = False) -> Compiled:
+    """
+    Compile an expression into a closure that evaluates it in a given environment.
+    Expressions without a specialized closure are evaluated by the tree-walker.
+    Expressions in tail position of a function body return calls to mini functions as a `TailCall`.
+    While a heatmap is active, the closure of every expression counts its evaluations.
+    """
+    compiled = compile_node(expression, tail)
+    if heatmap.active is not None:
+        return heatmap.active.instrument(expression, compiled)
+    return compiled
+
+def compile_node(expression: Node, tail: bool) -> Compiled:
+    if isinstance(expression, AtomicNode):
+        return compile_atomic(expression)
+    elif isinstance(expression, TupleNode):
+        return compile_tuple(expression, tail)
+    elif isinstance(expression, ListNode):
+        return compile_list(expression)
+    elif isinstance(expression, MapNode):
+        return compile_map(expression)
+    elif isinstance(expression, BlockNode):
+        return compile_block(expression, tail)
+    elif isinstance(expression, LambdaNode):
+        return compile_lambda(expression)
+    elif isinstance(expression, IfNode):
+        return compile_if(expression, tail)
+    elif isinstance(expression, WhileNode):
+        return compile_while(expression)
+    elif isinstance(expression, ForNode):
+        return compile_for(expression)
+    elif isinstance(expression, BreakNode):
+        return lambda env: BREAK
+    elif isinstance(expression, ContinueNode):
+        return lambda env: CONTINUE
+    elif isinstance(expression, UnaryNode):
+        return compile_unary(expression)
+    elif isinstance(expression, BinaryNode):
+        return compile_binary(expression, tail)
+    return compile_fallback(expression)
+
+def compile_expressions(expressions: list[Node], tail = False) -> list[Compiled]:
+    return [compile_expression(e, tail) for e in expressions]
+
+def compile_program(program: ProgramNode) -> Compiled:
+    """
+    Compile a program node into a closure evaluating all of its expressions
+    and returning the last result.
+    """
+    expressions = compile_expressions(program.expressions)
+    def program_(env: Environment) -> Atom:
+        result = UNIT
+        for e in expressions:
+            result = e(env)
+        return result
+    return program_
@@ -1,30 +1,81 @@
-
 from .atoms import Atom
 
 
+class Scope():
+    """
+    The static layout of a function or block scope.
+    Every variable declared in the scope is given a slot by the resolver,
+    which compiled code uses to access the variable by index instead of by name.
+    """
+    def __init__(self, name: str):
+        """
+        Initialize an empty scope with a name.
+        """
+        self.name = name
+        self.names: list[str] = []
+        self.slots: dict[str, int] = {}
+
+    def declare(self, name: str) -> int:
+        """
+        Declare a variable in the scope and return its slot.
+        """
+        if name not in self.slots:
+            self.slots[name] = len(self.names)
+            self.names.append(name)
+        return self.slots[name]
+
+    def __str__(self):
+        return f"Scope<{self.name}> {self.names}"
+
 class Environment():
     """
     The Environment class is used to store the values of
     variables in a scope during the execution of a program.
+    Variables declared in the scope of the environment are stored in slots,
+    while any other variables (such as globals) are stored by name.
+    A slot is `None` until its variable has been assigned.
     """
-    def __init__(self, name: str, parent):
+    def __init__(self, name: str, parent, scope: Scope = None):
         """
-        Initialize an environment with a name and a parent environment.
+        Initialize an environment with a name, a parent environment and an optional scope layout.
         """
         self.name = name
         self.parent: Environment = parent
+        self.globals: Environment = parent.globals if parent else self
+        self.scope = scope
+        self.slots: list[Atom] = [None] * len(scope.names) if scope else []
         self.values: dict[str, Atom] = {}
+        self.loader = None # Loads global variables on first lookup, such as lazily initialized builtins
+        self.loaded = set() # Modules already loaded by the loader
 
     def set(self, name: str, value: Atom) -> None:
-        self.values[name] = value
+        if self.scope is not None and name in self.scope.slots:
+            self.slots[self.scope.slots[name]] = value
+        else:
+            self.values[name] = value
 
     def get(self, name: str):
-        if name in self.values:
-            return self.values[name]
-        elif self.parent:
-            return self.parent.get(name)
-        else:
+        env = self
+        while True:
+            if env.scope is not None and name in env.scope.slots:
+                value = env.slots[env.scope.slots[name]]
+                if value is not None:
+                    return value
+            if name in env.values:
+                return env.values[name]
+            if env.parent is None:
+                return env.load(name)
+            env = env.parent
+
+    def load(self, name: str):
+        """
+        Load a global variable that has not been defined yet using the loader of the environment,
+        or return `None`.
+        """
+        if self.loader is None:
             return None
+        return self.loader(self, name)
 
     def __str__(self):
-        return f"Environment<{self.name}> {self.values}"
+        slots = {name: self.slots[slot] for name, slot in self.scope.slots.items()} if self.scope else {}
+        return f"Environment<{self.name}> {slots | self.values}"
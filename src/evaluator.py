@@ -1,18 +1,43 @@
-from .atoms import Atom, BuiltinFunctionAtom, FunctionAtom, ValueAtom
-from .ast import AtomicNode, BinaryNode, BlockNode, IfNode, LambdaNode, ListNode, MapNode, Node, ProgramNode, SliceNode, TupleNode, UnaryNode
+from typing import Iterator
+
+from .atoms import UNIT, Atom, BuiltinFunctionAtom, FunctionAtom, Range, ValueAtom, bool_atom, bytes_slice, number_atom
+from .ast import AtomicNode, BinaryNode, BlockNode, BreakNode, ContinueNode, ForNode, IfNode, LambdaNode, ListNode, MapNode, Node, ProgramNode, SliceNode, TupleNode, UnaryNode, WhileNode
 from .environment import Environment
+from . import heatmap, profiler
+from .trace import TraceEvent, emit, is_enabled
 
 # Global variables
 debug = False
+tracing = False # Whether evaluation is traced, checked by every trace point before building its event
 
-# Helper functions
-def dprint(*args):
+class TailCall():
     """
-    Print debug messages.
+    A call to a function in tail position of a function body.
+    Instead of calling the function, the body returns the call to the trampoline in
+    `evaluate_function_atom_call`, which makes the call in place of the current one.
+    This lets tail recursive functions loop in constant stack space.
     """
-    if debug:
-        print(*args)
+    __slots__ = ("function", "args")
+
+    def __init__(self, function: FunctionAtom, args: list[Atom]):
+        self.function = function
+        self.args = args
+
+class LoopSignal():
+    """
+    The result of a `break` or `continue` expression.
+    It is returned up through the blocks and ifs of a loop body to the loop,
+    which checks for it after each iteration instead of catching an exception.
+    """
+    __slots__ = ("keyword",)
+
+    def __init__(self, keyword: str):
+        self.keyword = keyword
 
+BREAK = LoopSignal("break")
+CONTINUE = LoopSignal("continue")
+
+# Helper functions
 def compatible_types(lhs: Atom, rhs: Atom, types: list[str]) -> bool:
     """
     Check if the two atoms are compatible with the given types.
@@ -57,71 +82,162 @@ def get_left_most_bin_term(expression: Node, op: str) -> Node:
     else:
         return expression
 
-def flatten_bin_terms(expression: Node, op: str, includeBase: bool) -> list[str]:
+def flatten_bin_terms(expression: Node, op: str, includeBase: bool) -> list[Node]:
     """
-    Get the path of a member expression.
+    Get the path of a member or index expression.
     """
     if isinstance(expression, BinaryNode) and expression.operator == op:
-        return flatten_bin_terms(expression.left, op, includeBase) + [expression.right.value]
+        return flatten_bin_terms(expression.left, op, includeBase) + [expression.right]
     else:
-        return [expression.value] if includeBase else []
+        return [expression] if includeBase else []
 
-def set_nested_value(obj: ValueAtom, path: list[str], rhs: Atom) -> ValueAtom:
+def set_nested_value(obj: ValueAtom, path: list[Atom], rhs: Atom) -> ValueAtom:
     """
-    Set the value of a member expression.
+    Set the value of a member or index expression, given the keys of its path.
     """
     if len(path) == 0: raise Exception("Member path is empty")
-    elif len(path) == 1:
-        obj.value[path[0]] = rhs
+    if obj.type == "map":
+        values, key = obj.value, check_map_key(path[0])
+    elif obj.type == "list":
+        values, key = obj.mutable_list(), path[0].value
+    else:
+        raise Exception(f"Cannot set member of {obj.type}")
+    if len(path) == 1:
+        values[key] = rhs
         return obj
     else:
-        obj.value[path[0]] = set_nested_value(obj.value[path[0]], path[1:], rhs)
+        values[key] = set_nested_value(values[key], path[1:], rhs)
         return obj
 
+# Types of values that can be map keys, all of them are hashed by their structure
+MAP_KEY_TYPES = ["number", "string", "bool", "tuple", "unit"]
+
+def check_map_key(key: Atom) -> Atom:
+    if not isinstance(key, ValueAtom) or key.type not in MAP_KEY_TYPES:
+        raise Exception(f"Map keys must be numbers, strings, bools, tuples or unit, not {key.type}")
+    return key
+
+# The string keys of member names, shared by all member accesses of the same name
+member_keys: dict[str, ValueAtom] = {}
+
+def member_key(name: str) -> ValueAtom:
+    """
+    Get the map key a member name stands for.
+    """
+    key = member_keys.get(name)
+    if key is None:
+        key = member_keys[name] = ValueAtom("string", name)
+    return key
+
+def map_key(key: Node) -> Atom:
+    """
+    Get the key of a map literal entry, where identifiers stand for strings.
+    """
+    if not isinstance(key, AtomicNode):
+        raise Exception(f"Key in map is not an atomic value")
+    if key.type == "identifier":
+        return member_key(key.value)
+    if key.type not in ["string", "number", "bool"]:
+        raise Exception(f"Key in map is not an identifier, string, number or bool")
+    return key.atom if key.atom is not None else literal_atom(key.type, key.value)
+
+def literal_atom(type: str, value) -> ValueAtom:
+    """
+    Get the atom of a literal value.
+    """
+    if type == "number":
+        return number_atom(value)
+    elif type == "bool":
+        return bool_atom(value)
+    return ValueAtom(type, value)
+
+def unpack(value: Atom, count: int) -> list[Atom]:
+    """
+    Get the elements of a tuple or list bound to the given number of loop variables.
+    """
+    if not (isinstance(value, ValueAtom) and value.type in ["tuple", "list"]):
+        raise Exception(f"Cannot unpack {value.type} into {count} variables")
+    if len(value.value) != count:
+        raise Exception(f"Cannot unpack {value.type} of size {len(value.value)} into {count} variables")
+    return value.value
+
+def iterate(value: Atom, count: int) -> Iterator:
+    """
+    Iterate over the elements of a value, bound to a number of loop variables, without copying it.
+    Lists, tuples, sets, ranges and iterators yield their elements, maps their keys,
+    strings their characters and bytes their values as numbers.
+    With more than one variable, maps yield their key and value pairs
+    and all other elements are unpacked into a list of values.
+    """
+    if not isinstance(value, ValueAtom):
+        raise Exception(f"Cannot iterate over {value.type}")
+    if value.type == "map":
+        if count == 1:
+            return iter(value.value)
+        if count != 2:
+            raise Exception(f"Cannot unpack map entries into {count} variables")
+        return iter(value.value.items())
+    if value.type in ["list", "tuple", "set"]:
+        elements = iter(value.value)
+    elif value.type == "string":
+        elements = (ValueAtom("string", c) for c in value.value)
+    elif value.type == "bytes":
+        elements = map(number_atom, value.value)
+    elif value.type == "iterator":
+        elements = value.value
+    else:
+        raise Exception(f"Cannot iterate over {value.type}")
+    if count == 1:
+        return elements
+    return (unpack(e, count) for e in elements)
+
 # Evaluation functions
 
-def evaluate_expression(expression: Node, env: Environment) -> Atom:
+def evaluate_expression(expression: Node, env: Environment, tail = False) -> Atom:
+    """
+    Evaluate an expression in an environment.
+    If the expression is in tail position of a function body,
+    calls to mini functions are returned as a `TailCall` instead of being made.
+    """
     if isinstance(expression, AtomicNode):
         if is_identifier(expression):
-            dprint(f"Evaluating identifier '{expression.raw_str()}'")
+            if tracing: emit(TraceEvent("eval", "identifier", expression))
             val = env.get(expression.value)
             if val is None:
                 raise Exception(f"identifier '{expression.value}' is not defined")
             return val
+        elif expression.atom is not None:
+            return expression.atom
         else:
-            return ValueAtom(expression.type, expression.value)
+            return literal_atom(expression.type, expression.value)
     elif isinstance(expression, TupleNode):
         if len(expression.elements) == 0:
-            return ValueAtom("unit", None)
+            return UNIT
         elif len(expression.elements) == 1:
-            return evaluate_expression(expression.elements[0], env)
+            return evaluate_expression(expression.elements[0], env, tail)
         else:
             return ValueAtom("tuple", list(map(lambda e: evaluate_expression(e, env), expression.elements)))
     elif isinstance(expression, ListNode):
         return ValueAtom("list", list(map(lambda e: evaluate_expression(e, env), expression.elements)))
     elif isinstance(expression, MapNode):
-        map_values: dict[str, Atom] = {}
+        map_values: dict[Atom, Atom] = {}
         for key, value in expression.pairs.items():
-            if not isinstance(key, AtomicNode):
-                raise Exception(f"Key in map is not an atomic value")
-            if key.type == "number" and key.value.is_integer():
-                key.value = int(key.value)
-                key.type = "integer"
-            if key.type not in ["identifier", "string", "integer", "bool"]:
-                raise Exception(f"Key in map is not an identifier, string, integer or bool")
+            key = map_key(key)
             value = evaluate_expression(value, env)
-            map_values[str(key.value)] = value
+            map_values[key] = value
         return ValueAtom("map", map_values)
     elif isinstance(expression, BlockNode):
-        return evaluate_expressions(expression.expressions, Environment(f"<block>", env))
+        if expression.scoped:
+            env = Environment(f"<block>", env, expression.scope)
+        return evaluate_expressions(expression.expressions, env, tail)
     elif isinstance(expression, LambdaNode):
-        return FunctionAtom(expression.params, expression.body, env)
+        return FunctionAtom(expression.params, expression.body, env, scope=expression.scope)
     elif isinstance(expression, IfNode):
         cond = evaluate_expression(expression.condition, env)
         if not isinstance(cond, ValueAtom) or not cond.type == "bool":
             raise Exception(f"Condition does not evaluate to a bool")
         if cond.value:
-            return evaluate_expression(expression.ifBody, env)
+            return evaluate_expression(expression.ifBody, env, tail)
         else:
             # Iterate over the else-ifs
             for cond, body in expression.elseIfs:
@@ -129,23 +245,41 @@ def evaluate_expression(expression: Node, env: Environment) -> Atom:
                 if not isinstance(cond, ValueAtom) or not cond.type == "bool":
                     raise Exception(f"Condition does not evaluate to a bool")
                 if cond.value:
-                    return evaluate_expression(body, env)
+                    return evaluate_expression(body, env, tail)
             # Evaluate the else body
-            return evaluate_expression(expression.elseBody, env)
+            if expression.elseBody is None:
+                return UNIT
+            return evaluate_expression(expression.elseBody, env, tail)
+    elif isinstance(expression, WhileNode):
+        while True:
+            cond = evaluate_expression(expression.condition, env)
+            if not isinstance(cond, ValueAtom) or not cond.type == "bool":
+                raise Exception(f"Condition does not evaluate to a bool")
+            if not cond.value or evaluate_expression(expression.body, env) is BREAK:
+                return UNIT
+    elif isinstance(expression, ForNode):
+        names = [v.value for v in expression.variables]
+        for value in iterate(evaluate_expression(expression.iterable, env), len(names)):
+            if len(names) == 1:
+                env.set(names[0], value)
+            else:
+                for name, v in zip(names, value):
+                    env.set(name, v)
+            if evaluate_expression(expression.body, env) is BREAK:
+                break
+        return UNIT
+    elif isinstance(expression, BreakNode):
+        return BREAK
+    elif isinstance(expression, ContinueNode):
+        return CONTINUE
     elif isinstance(expression, UnaryNode):
-        op = expression.operator
         rhs = evaluate_expression(expression.rhs, env)
-        if op == "MINUS" and compatible_type(rhs, ["number"]):
-            return ValueAtom("number", -rhs.value)
-        elif op == "NOT" and compatible_type(rhs, ["bool"]):
-            return ValueAtom("bool", not rhs.value)
-        else:
-            raise Exception(f"Unkown unary operator '{op}'")
+        return evaluate_unary_atom_expression(expression.operator, rhs)
     elif isinstance(expression, BinaryNode):
         op = expression.operator
 
         if op == "ASSIGNMENT":
-            dprint(f"Evaluating assignment {expression.left.formatted_str()} = {expression.right.formatted_str()}")
+            if tracing: emit(TraceEvent("eval", "assignment", expression))
             if is_identifier(expression.left):
                 rhs = evaluate_expression(expression.right, env)
                 env.set(expression.left.value, rhs)
@@ -158,6 +292,10 @@ def evaluate_expression(expression: Node, env: Environment) -> Atom:
                     obj = env.get(base.value)
                     if obj is None: raise Exception(f"Object '{base.value}' is not defined")
                     path = flatten_bin_terms(expression.left, op, False)
+                    if op == "DOT":
+                        path = [member_key(member.value) for member in path]
+                    else:
+                        path = [evaluate_expression(index, env) for index in path]
                     obj = set_nested_value(obj, path, rhs)
                     env.set(base.value, obj)
                     return rhs
@@ -179,7 +317,7 @@ def evaluate_expression(expression: Node, env: Environment) -> Atom:
                     argNames.append(a.value)
                 # Assign the right hand side as body of the function
                 body = expression.right
-                value = FunctionAtom(argNames, body, env, functionName.value)
+                value = FunctionAtom(argNames, body, env, functionName.value, scope=expression.scope)
                 # Update the environment
                 env.set(functionName.value, value)
                 return value
@@ -189,49 +327,42 @@ def evaluate_expression(expression: Node, env: Environment) -> Atom:
         lhs = evaluate_expression(expression.left, env)
         if op == "DOT":
             # Member access, last identifier is the member name and the rest is the object
-            dprint(f"Evaluating member access {lhs.formatted_str()}.{expression.right.formatted_str()} ({expression.right.__class__})")
+            if tracing: emit(TraceEvent("eval", "member", expression.right, "DOT", (lhs,)))
             if not is_identifier(expression.right):
                 raise Exception(f"Cannot access member of {lhs.type} with non-identifier key")
-            if not (isinstance(lhs, ValueAtom) and lhs.type in ["map", "tuple", "list"]):
-                raise Exception(f"Cannot access member of {lhs.type}")
-            if lhs.type == "map":
-                if expression.right.value not in lhs.value:
-                    raise Exception(f"Map does not contain key '{expression.right.value}'")
-                return lhs.value[expression.right.value]
-            raise Exception(f"Cannot access member of {lhs.type}, not implemented yet")
+            return evaluate_member_atom_expression(lhs, member_key(expression.right.value))
         elif op == "INDEX" and isinstance(expression.right, SliceNode): # Slice indexing
             # Evaluate the slice indices
             start = evaluate_expression(expression.right.start, env)
             end = evaluate_expression(expression.right.end, env)
-            step = ValueAtom("number", 1)
+            step = number_atom(1)
             if expression.right.step is not None:
                 step = evaluate_expression(expression.right.step, env)
-            # Check that the slice indices are integers
-            if not compatible_types(start, end, ["number"]) or not compatible_type(step, ["number"]):
-                raise Exception(f"Slice indices must be integers")
-            start, end, step = int(start.value), int(end.value), int(step.value)
-            if compatible_type(lhs, ["list", "tuple"]):
-                lhs_slice = lhs.value[start:end:step]
-                element = None
-                if lhs.type == "list": element = ValueAtom("list", lhs_slice)
-                elif lhs.type == "tuple": element = ValueAtom("tuple", lhs_slice)
-                else: raise Exception(f"Cannot slice index {lhs.type}")
-                dprint(f"Indexing {lhs.type}: {lhs.formatted_str()} with slice {start}:{end}:{step} -> {element.formatted_str()}")
-                return element
+            return evaluate_slice_atom_expression(lhs, start, end, step)
 
         rhs = evaluate_expression(expression.right, env)
+        if op == "CALL" and profiler.active is not None:
+            profiler.active.site = expression.position
+        if tail and op == "CALL" and type(lhs) is FunctionAtom:
+            return TailCall(lhs, spread_arguments(rhs))
         # The rest of the operators rely on the right hand side being evaluated first
         # Try to evaluate binary operators first
         binOpResult = evaluate_binary_atom_expression(op, lhs, rhs, env)
         if binOpResult is not None:
             return binOpResult
-        if op == "PLUSEQUAL" and compatible_types(lhs, rhs, ["string", "number"]):
+        if op == "PLUSEQUAL" and isinstance(lhs, ValueAtom) and lhs.type == "builder":
+            if rhs.type == "bytes":
+                raise Exception("Cannot add builder and bytes, decode the bytes with bytes_to_str")
+            # Append to the builder in place instead of copying the string built so far
+            lhs.value.append(rhs.raw_str())
+            return lhs
+        if op == "PLUSEQUAL" and compatible_types(lhs, rhs, ["string", "builder", "number"]):
             if not is_identifier(expression.left):
                 raise Exception(f"Left hand side of mutating assignment operator '{op}' must be an identifier")
-            if lhs.type == "string" or rhs.type == "string":
+            if lhs.type == "string" or rhs.type in ["string", "builder"]:
                 new_value = ValueAtom("string", lhs.raw_str() + rhs.raw_str())
             else:
-                new_value = ValueAtom("number", lhs.value + rhs.value)
+                new_value = number_atom(lhs.value + rhs.value)
             env.set(expression.left.value, new_value)
             return new_value
 
@@ -239,15 +370,49 @@ def evaluate_expression(expression: Node, env: Environment) -> Atom:
     else:
         raise Exception(f"Unknown expression type '{type(expression)}'")
 
+def evaluate_unary_atom_expression(op: str, rhs: Atom) -> Atom:
+    if op == "MINUS" and compatible_type(rhs, ["number"]):
+        return number_atom(-rhs.value)
+    elif op == "NOT" and compatible_type(rhs, ["bool"]):
+        return bool_atom(not rhs.value)
+    else:
+        raise Exception(f"Unkown unary operator '{op}'")
+
+def evaluate_member_atom_expression(lhs: Atom, member: ValueAtom) -> Atom:
+    if not (isinstance(lhs, ValueAtom) and lhs.type in ["map", "tuple", "list"]):
+        raise Exception(f"Cannot access member of {lhs.type}")
+    if lhs.type == "map":
+        element = lhs.value.get(member)
+        if element is None:
+            raise Exception(f"Map does not contain key '{member.value}'")
+        return element
+    raise Exception(f"Cannot access member of {lhs.type}, not implemented yet")
+
+def evaluate_slice_atom_expression(lhs: Atom, start: Atom, end: Atom, step: Atom) -> Atom:
+    # Check that the slice indices are integers
+    if not compatible_types(start, end, ["number"]) or not compatible_type(step, ["number"]):
+        raise Exception(f"Slice indices must be integers")
+    start, end, step = int(start.value), int(end.value), int(step.value)
+    if compatible_type(lhs, ["list", "tuple", "bytes"]):
+        element = None
+        if lhs.type == "list": element = ValueAtom("list", lhs.value[start:end:step])
+        elif lhs.type == "tuple": element = ValueAtom("tuple", lhs.value[start:end:step])
+        elif lhs.type == "bytes": element = bytes_slice(lhs, start, end, step) # Shares the buffer
+        else: raise Exception(f"Cannot slice index {lhs.type}")
+        if tracing: emit(TraceEvent("eval", "slice", None, "INDEX", (lhs, start, end, step, element)))
+        return element
+
 def evaluate_binary_atom_expression(op: str, lhs: Atom, rhs: Atom, env: Environment) -> Atom:
-    dprint(f"Evaluating binary expression {lhs.formatted_str()} {op} {rhs.formatted_str()}")
-    if op == "PLUS" and compatible_types(lhs, rhs, ["string", "number", "bool", "list", "tuple", "map"]):
-        if lhs.type == "string" or rhs.type == "string":
+    if tracing: emit(TraceEvent("eval", "binary", None, op, (lhs, rhs)))
+    if op == "PLUS" and compatible_types(lhs, rhs, ["string", "builder", "number", "bool", "list", "tuple", "map", "bytes"]):
+        if (lhs.type == "bytes") != (rhs.type == "bytes"):
+            raise Exception(f"Cannot add {lhs.type} and {rhs.type}, decode bytes with bytes_to_str")
+        if lhs.type in ["string", "builder"] or rhs.type in ["string", "builder"]:
             return ValueAtom("string", lhs.raw_str() + rhs.raw_str())
         elif lhs.type == "list" and rhs.type == "list":
             return ValueAtom("list", lhs.value + rhs.value)
         elif lhs.type == "number" and rhs.type == "number":
-            return ValueAtom("number", lhs.value + rhs.value)
+            return number_atom(lhs.value + rhs.value)
         elif lhs.type == "tuple" and rhs.type == "tuple":
             # Ensure that the tuples have the same length
             if len(lhs.value) != len(rhs.value):
@@ -257,99 +422,183 @@ def evaluate_binary_atom_expression(op: str, lhs: Atom, rhs: Atom, env: Environm
         elif lhs.type == "map" and rhs.type == "map":
             # Concate the maps
             return ValueAtom("map", {**lhs.value, **rhs.value})
+        elif lhs.type == "bytes" and rhs.type == "bytes":
+            return ValueAtom("bytes", b"".join((lhs.value, rhs.value)))
         else:
             raise Exception(f"Cannot add {lhs.type} and {rhs.type}")
     elif op == "MINUS" and compatible_types(lhs, rhs, ["number"]):
-        return ValueAtom("number", lhs.value - rhs.value)
+        return number_atom(lhs.value - rhs.value)
     elif op == "MULTIPLY" and compatible_types(lhs, rhs, ["number"]):
-        return ValueAtom("number", lhs.value * rhs.value)
+        return number_atom(lhs.value * rhs.value)
     elif op == "DIVIDE" and compatible_types(lhs, rhs, ["number"]):
-        return ValueAtom("number", lhs.value / rhs.value)
+        return number_atom(lhs.value / rhs.value)
     elif op == "MODULO" and compatible_types(lhs, rhs, ["number"]):
-        return ValueAtom("number", lhs.value % rhs.value)
+        return number_atom(lhs.value % rhs.value)
     elif op == "POWER" and compatible_types(lhs, rhs, ["number"]):
-        return ValueAtom("number", lhs.value ** rhs.value)
-    elif op == "EQUAL" and compatible_types(lhs, rhs, ["number", "string", "bool", "unit", "tuple", "list", "map"]):
+        return number_atom(lhs.value ** rhs.value)
+    elif op == "EQUAL" and compatible_types(lhs, rhs, ["number", "string", "builder", "bool", "unit", "tuple", "list", "map", "set", "bytes"]):
+        if lhs.type in ["string", "builder"] and rhs.type in ["string", "builder"]:
+            return bool_atom(lhs.raw_str() == rhs.raw_str()) # Builders are read as the string built so far
         if lhs.type != rhs.type:
-            return ValueAtom("bool", False)
-        return ValueAtom("bool", lhs.value == rhs.value)
-    elif op == "NOTEQUAL" and compatible_types(lhs, rhs, ["number", "string", "bool"]):
-        return ValueAtom("bool", lhs.value != rhs.value)
+            return bool_atom(False)
+        return bool_atom(lhs.value == rhs.value)
+    elif op == "NOTEQUAL" and compatible_types(lhs, rhs, ["number", "string", "builder", "bool"]):
+        if lhs.type in ["string", "builder"] and rhs.type in ["string", "builder"]:
+            return bool_atom(lhs.raw_str() != rhs.raw_str())
+        return bool_atom(lhs.value != rhs.value)
     elif op == "LESS" and compatible_types(lhs, rhs, ["number"]):
-        return ValueAtom("bool", lhs.value < rhs.value)
+        return bool_atom(lhs.value < rhs.value)
     elif op == "GREATER" and compatible_types(lhs, rhs, ["number"]):
-        return ValueAtom("bool", lhs.value > rhs.value)
+        return bool_atom(lhs.value > rhs.value)
     elif op == "LESSEQUAL" and compatible_types(lhs, rhs, ["number"]):
-        return ValueAtom("bool", lhs.value <= rhs.value)
+        return bool_atom(lhs.value <= rhs.value)
     elif op == "GREATEREQUAL" and compatible_types(lhs, rhs, ["number"]):
-        return ValueAtom("bool", lhs.value >= rhs.value)
+        return bool_atom(lhs.value >= rhs.value)
     elif op == "AND" and compatible_types(lhs, rhs, ["bool"]):
-        return ValueAtom("bool", lhs.value and rhs.value)
+        return bool_atom(lhs.value and rhs.value)
     elif op == "OR" and compatible_types(lhs, rhs, ["bool"]):
-        return ValueAtom("bool", lhs.value or rhs.value)
+        return bool_atom(lhs.value or rhs.value)
     elif op == "RANGE" and compatible_types(lhs, rhs, ["number"]):
-        return ValueAtom("list", [ValueAtom("number", i) for i in range(lhs.value, rhs.value)])
-    elif op == "INDEX" and compatible_type(lhs, ["list", "tuple", "map"]):
+        return ValueAtom("list", Range(range(lhs.value, rhs.value)))
+    elif op == "INDEX" and compatible_type(lhs, ["list", "tuple", "map", "bytes"]):
         if not isinstance(rhs, ValueAtom):
             raise Exception(f"Indexing expression in not a valid value type: {rhs}")
+        if lhs.type == "map":
+            element = lhs.value.get(check_map_key(rhs))
+            if element is None:
+                raise Exception(f"Map does not contain key {rhs.formatted_str()}")
+            if tracing: emit(TraceEvent("eval", "index", None, "INDEX", (lhs, rhs, element)))
+            return element
+        if lhs.type == "bytes" and rhs.type == "number":
+            return number_atom(lhs.value[rhs.value])
         if rhs.type in ["number", "string", "bool"]:
-            if lhs.type == "list" or lhs.type == "tuple":
-                element: Atom = lhs.value[rhs.value]
-            elif lhs.type == "map":
-                index = rhs.raw_str()
-                if index not in lhs.value:
-                    print(lhs.value)
-                    raise Exception(f"Map does not contain key '{index}'")
-                element: Atom = lhs.value[index]
-            dprint(f"Indexing {lhs.type}: {lhs.formatted_str()} with index {rhs.formatted_str()} -> {element.formatted_str()}")
+            element: Atom = lhs.value[rhs.value]
+            if tracing: emit(TraceEvent("eval", "index", None, "INDEX", (lhs, rhs, element)))
             return element
         else:
             raise Exception(f"Indexing expression does not evaluate to an integer or string")
     elif op == "CALL":
-        # The tuple may have been evaluated to a single value
-        args = [rhs]
-        if isinstance(rhs, ValueAtom):
-            if rhs.type == "tuple":
-                args: list[Atom] = rhs.value
-            elif rhs.type == "unit":
-                args = []
-        # args = list(map(lambda e: evaluate_expression(e, env), rhs.value))
-        return evaluate_call(lhs, args)
+        return evaluate_call(lhs, spread_arguments(rhs))
 
     return None
 
+def spread_arguments(value: Atom) -> list[Atom]:
+    """
+    Get the arguments of a call from its evaluated argument tuple,
+    which may have been evaluated to a single value or unit.
+    """
+    if isinstance(value, ValueAtom):
+        if value.type == "tuple":
+            return value.value
+        elif value.type == "unit":
+            return []
+    return [value]
+
 def evaluate_call(function: FunctionAtom | BuiltinFunctionAtom, args: list[Atom]) -> Atom:
     if isinstance(function, FunctionAtom):
         return evaluate_function_atom_call(function, args)
     elif isinstance(function, BuiltinFunctionAtom):
+        if profiler.active is not None:
+            profiler.active.enter(function)
+            try:
+                return function.func(args)
+            finally:
+                profiler.active.exit()
         return function.func(args) # Call the builtin function
     else:
         raise Exception(f"Cannot call non-function: {function}")
 
-def evaluate_function_atom_call(function: FunctionAtom, args: list[Atom]) -> Atom:
-    # Build a new environment for the function call
-    # where the arguments are bound to the parameters
-    funcEnv = Environment(f"<function {function.name}>", function.environment)
+def bind_arguments(function: FunctionAtom, args: list[Atom]) -> Environment:
+    """
+    Build a new environment for a function call
+    where the arguments are bound to the parameters.
+    """
+    funcEnv = Environment(f"<function {function.name}>", function.environment, function.scope)
     if len(args) != len(function.argumentNames):
         raise Exception(f"Function '{function.name}' expects {len(function.argumentNames)} arguments, but got {len(args)}")
     for name, val in zip(function.argumentNames, args):
         funcEnv.set(name, val)
-    return evaluate_expression(function.body, funcEnv)
+    return funcEnv
+
+def evaluate_function_atom_call(function: FunctionAtom, args: list[Atom]) -> Atom:
+    """
+    Call a mini function.
+    The body is evaluated in tail position, and tail calls it returns
+    are made in a loop here instead of growing the Python stack.
+    """
+    if profiler.active is not None:
+        return profiled_function_atom_call(function, args, profiler.active)
+    while True:
+        funcEnv = bind_arguments(function, args)
+        if function.compiled is not None:
+            result = function.compiled(funcEnv)
+        else:
+            result = evaluate_expression(function.body, funcEnv, True)
+        if type(result) is not TailCall:
+            return result
+        function, args = result.function, result.args
+
+def profiled_function_atom_call(function: FunctionAtom, args: list[Atom], active: profiler.Profiler) -> Atom:
+    """
+    Call a mini function like `evaluate_function_atom_call`, recording each call with the profiler.
+    A tail call ends the call it replaces.
+    """
+    while True:
+        active.enter(function)
+        try:
+            funcEnv = bind_arguments(function, args)
+            if function.compiled is not None:
+                result = function.compiled(funcEnv)
+            else:
+                result = evaluate_expression(function.body, funcEnv, True)
+        finally:
+            active.exit()
+        if type(result) is not TailCall:
+            return result
+        function, args = result.function, result.args
 
-def evaluate_expressions(expressions: list[Node], env: Environment) -> Atom:
+def evaluate_expressions(expressions: list[Node], env: Environment, tail = False) -> Atom:
     """
     Evaluate a list of expressions and return the last result.
+    Only the last expression is evaluated in tail position.
+    A `break` or `continue` stops the evaluation and is returned to the loop.
     """
-    result = ValueAtom("unit", None)
-    for expression in expressions:
-        result = evaluate_expression(expression, env)
+    result = UNIT
+    for i, expression in enumerate(expressions):
+        result = evaluate_expression(expression, env, tail and i == len(expressions) - 1)
+        if type(result) is LoopSignal:
+            return result
     return result
 
 # Evaluator function
-def evaluate(program: ProgramNode, env: Environment, _debug = False) -> Atom:
+def evaluate(program: ProgramNode, env: Environment, _debug = False, engine = "closure") -> Atom:
     """
     Evaluate a program node.
+    The program is compiled to closures first, unless debugging, tracing evaluation or the "tree" engine is used,
+    in which case the tree-walker evaluates the nodes directly.
+    The "vm" engine compiles the program to bytecode and runs it on the stack VM.
+    Variables are resolved to slots before evaluating the program.
+    When profiling, the VM is not used, as its calls do not go through `evaluate_call`,
+    and while a heatmap is active, programs are always compiled to closures, which it instruments.
     """
-    global debug
+    global debug, tracing
     debug = _debug
-    return evaluate_expressions(program.expressions, env)
+    tracing = debug or is_enabled("eval")
+    from .resolver import resolve_program
+    resolve_program(program)
+    if profiler.active is not None:
+        for e in program.expressions:
+            profiler.active.register(e)
+    if heatmap.active is not None or (engine == "vm" and profiler.active is not None):
+        engine = "closure"
+    if engine == "vm":
+        from .bytecode import compile_program
+        from .vm import run
+        code = compile_program(program)
+        if debug:
+            print("  " + "\n  ".join(code.disassemble()))
+        return run(code, env)
+    if tracing or engine == "tree":
+        return evaluate_expressions(program.expressions, env)
+    from .compiler import compile_program
+    return compile_program(program)(env)
@@ -0,0 +1,204 @@
+import asyncio
+import socket
+
+from .atoms import Atom, IntrinsicAtom, ValueAtom
+from .evaluator import evaluate_call
+
+class EventLoop():
+    """
+    Runs the callbacks of timers and non-blocking connections on an asyncio event loop.
+    Every server, connection and timer that may still call back holds the loop,
+    which runs until none are left or it is stopped.
+    An error in a callback stops the loop, and is raised by `run`.
+    """
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.held = 0
+        self.idle: asyncio.Future | None = None # Done when the loop has to stop running
+        self.error: Exception | None = None
+
+    def hold(self):
+        self.held += 1
+
+    def release(self):
+        self.held -= 1
+        if self.held == 0:
+            self.stop()
+
+    def stop(self):
+        if self.idle is not None and not self.idle.done():
+            self.idle.set_result(None)
+
+    def call(self, function: Atom, args: list[Atom]):
+        """
+        Call a mini function from the loop, stopping the loop if it raises an error.
+        """
+        try:
+            evaluate_call(function, args)
+        except Exception as e:
+            self.fail(e)
+
+    def fail(self, error: Exception):
+        """
+        Stop the loop, raising the first error from `run`.
+        """
+        if self.error is None:
+            self.error = error
+        self.stop()
+
+    def run(self):
+        """
+        Run callbacks until nothing holds the loop any more, or it is stopped.
+        """
+        if self.idle is not None:
+            raise Exception("The event loop is already running")
+        if self.held == 0:
+            return
+        self.idle = self.loop.create_future()
+        try:
+            self.loop.run_until_complete(self.idle)
+        finally:
+            self.idle = None
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+class Timer():
+    """
+    A callback to make after a delay, and again after every delay if it repeats.
+    """
+    def __init__(self, events: EventLoop, delay: float, function: Atom, repeat: bool):
+        self.events = events
+        self.delay = delay
+        self.function = function
+        self.repeat = repeat
+        self.handle = events.loop.call_later(delay, self.fire)
+        events.hold()
+
+    def fire(self):
+        # Released after the callback, which may schedule more callbacks holding the loop
+        if self.repeat:
+            self.handle = self.events.loop.call_later(self.delay, self.fire)
+            self.events.call(self.function, [])
+        else:
+            self.handle = None
+            self.events.call(self.function, [])
+            self.events.release()
+
+    def cancel(self):
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+            self.events.release()
+
+class Connection(asyncio.Protocol):
+    """
+    A non-blocking TCP connection, passing the data it receives to a callback.
+    Data received before a callback is set is kept until one is.
+    """
+    def __init__(self, events: EventLoop, on_connect: Atom):
+        self.events = events
+        self.on_connect = on_connect
+        self.on_data: Atom | None = None
+        self.on_close: Atom | None = None
+        self.buffered: list[bytes] = []
+        self.transport: asyncio.Transport | None = None
+        self.atom = IntrinsicAtom("connection", self)
+
+    def connection_made(self, transport: asyncio.Transport):
+        self.transport = transport
+        self.events.hold()
+        self.events.call(self.on_connect, [self.atom])
+
+    def data_received(self, data: bytes):
+        if self.on_data is None:
+            self.buffered.append(data)
+        else:
+            self.events.call(self.on_data, [ValueAtom("bytes", data)])
+
+    def connection_lost(self, exc: Exception | None):
+        self.transport = None
+        if self.on_close is not None:
+            self.events.call(self.on_close, [])
+        self.events.release()
+
+    def set_on_data(self, function: Atom):
+        self.on_data = function
+        buffered, self.buffered = self.buffered, []
+        for data in buffered:
+            self.events.call(function, [ValueAtom("bytes", data)])
+
+    def send(self, data: bytes):
+        if self.transport is None:
+            raise Exception("Can not send on a closed connection")
+        self.transport.write(data) # Buffered by the transport until the socket can take it
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close() # Sends buffered data first
+
+    def __repr__(self) -> str:
+        return f"<connection {self.transport.get_extra_info('peername') if self.transport else 'closed'}>"
+
+class Server():
+    """
+    A listening TCP socket, calling back with a new connection for every client.
+    """
+    def __init__(self, events: EventLoop, host: str, port: int, on_connect: Atom):
+        self.events = events
+        self.socket = socket.create_server((host, port), backlog=1024)
+        self.socket.setblocking(False)
+        self.port = self.socket.getsockname()[1]
+        self.server: asyncio.Server | None = None
+        self.closed = False
+        events.hold()
+        task = events.loop.create_task(events.loop.create_server(lambda: Connection(events, on_connect), sock=self.socket))
+        task.add_done_callback(self.started)
+
+    def started(self, task: asyncio.Task):
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            self.events.fail(task.exception())
+            self.close()
+            return
+        self.server = task.result()
+        if self.closed:
+            self.server.close()
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            if self.server is not None:
+                self.server.close()
+            else:
+                self.socket.close()
+            self.events.release()
+
+    def __repr__(self) -> str:
+        return f"<server on port {self.port}>"
+
+def connect(events: EventLoop, host: str, port: int, on_connect: Atom, on_error: Atom | None):
+    """
+    Open a connection without waiting for it, calling back once it is made or has failed.
+    Without an error callback, failing to connect stops the loop with the error.
+    """
+    def connected(task: asyncio.Task):
+        error = task.exception()
+        if error is not None and on_error is not None:
+            events.call(on_error, [ValueAtom("string", str(error))])
+        elif error is not None:
+            events.fail(Exception(f"Could not connect to {host}:{port}: {error}"))
+        events.release()
+    events.hold()
+    task = events.loop.create_task(events.loop.create_connection(lambda: Connection(events, on_connect), host, port))
+    task.add_done_callback(connected)
+
+# The event loop of the interpreter, created on first use
+_events: EventLoop | None = None
+
+def event_loop() -> EventLoop:
+    global _events
+    if _events is None:
+        _events = EventLoop()
+    return _events
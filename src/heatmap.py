@@ -0,0 +1,125 @@
+import sys
+import time
+from typing import Callable, TextIO
+
+from .ast import AtomicNode, BinaryNode, Node, UnaryNode
+
+class NodeStats():
+    """
+    The evaluations of one node of a program and the time spent in them.
+    """
+    __slots__ = ("kind", "position", "count", "total", "own")
+
+    def __init__(self, kind: str, position: tuple[int, int] | None):
+        self.kind = kind
+        self.position = position
+        self.count = 0
+        self.total = 0.0 # Time spent evaluating the node, including its sub-expressions
+        self.own = 0.0 # Time spent in the node itself, not in its instrumented sub-expressions
+
+def node_kind(node: Node) -> str:
+    if isinstance(node, (BinaryNode, UnaryNode)):
+        return node.operator
+    elif isinstance(node, AtomicNode):
+        return node.type
+    return node.name
+
+class Heatmap():
+    """
+    Counts the evaluations of every node of the programs compiled while it is active,
+    and the time spent in them, by their position in the source.
+    The compiler instruments the closure of each node with `instrument`.
+    """
+    def __init__(self):
+        self.stats: dict[Node, NodeStats] = {}
+        self.frames: list[float] = [] # Time spent in the instrumented sub-expressions of each node being evaluated
+
+    def instrument(self, node: Node, compiled: Callable) -> Callable:
+        """
+        Wrap the compiled closure of a node in one counting its evaluations.
+        """
+        stats = self.stats.get(node)
+        if stats is None:
+            stats = self.stats[node] = NodeStats(node_kind(node), node.position)
+        frames = self.frames
+        def instrumented(env):
+            frames.append(0.0)
+            start = time.perf_counter()
+            try:
+                return compiled(env)
+            finally:
+                elapsed = time.perf_counter() - start
+                sub_expressions = frames.pop()
+                stats.count += 1
+                stats.total += elapsed
+                stats.own += elapsed - sub_expressions
+                if len(frames) > 0:
+                    frames[-1] += elapsed
+        return instrumented
+
+    def lines(self) -> dict[int, tuple[int, float]]:
+        """
+        Get the most evaluations of a node and the total own time of all nodes on each line.
+        """
+        lines: dict[int, tuple[int, float]] = {}
+        for s in self.stats.values():
+            if s.position is None or s.count == 0:
+                continue
+            count, own = lines.get(s.position[0], (0, 0.0))
+            lines[s.position[0]] = (max(count, s.count), own + s.own)
+        return lines
+
+    def print_report(self, source: list[str], file: TextIO = sys.stderr, hottest = 10):
+        """
+        Print the source annotated with the share of time spent on each line and how often it ran,
+        followed by the expressions that took the most time.
+        """
+        lines = self.lines()
+        total = sum(own for _, own in lines.values()) or 1.0
+        peak = max([own for _, own in lines.values()], default=0.0) or 1.0
+        for number, text in enumerate(source, 1):
+            if number in lines:
+                count, own = lines[number]
+                bar = "#" * round(own / peak * 10)
+                print(f"{number:>5} {own / total:>6.1%} {count:>9} {bar:<10} | {text}", file=file)
+            else:
+                print(f"{number:>5} {'':>6} {'':>9} {'':<10} | {text}", file=file)
+        print(f"\nHottest expressions:", file=file)
+        stats = sorted([s for s in self.stats.values() if s.count > 0], key=lambda s: s.own, reverse=True)
+        for s in stats[:hottest]:
+            position = f"{s.position[0]}:{s.position[1]}" if s.position is not None else "?"
+            print(f"{position:>9} {s.kind:<12} {s.count:>9} evaluations {s.own * 1000:>9.2f} ms", file=file)
+
+    def to_json(self) -> dict:
+        """
+        Get the counters of all nodes and lines as JSON serializable values.
+        """
+        nodes = [{
+            "line": s.position[0] if s.position is not None else None,
+            "column": s.position[1] if s.position is not None else None,
+            "kind": s.kind,
+            "count": s.count,
+            "total_s": s.total,
+            "self_s": s.own,
+        } for s in self.stats.values() if s.count > 0]
+        lines = [{"line": number, "count": count, "self_s": own} for number, (count, own) in sorted(self.lines().items())]
+        return {"nodes": nodes, "lines": lines}
+
+# The heatmap instrumenting compiled programs, if any
+active: Heatmap | None = None
+
+def start() -> Heatmap:
+    """
+    Start counting the node evaluations of the programs compiled from now on.
+    """
+    global active
+    active = Heatmap()
+    return active
+
+def stop() -> Heatmap | None:
+    """
+    Stop instrumenting programs and return the heatmap of the counted evaluations.
+    """
+    global active
+    heatmap, active = active, None
+    return heatmap
@@ -1,13 +1,17 @@
 from io import TextIOBase
+from typing import Callable
 
 from .stdlib import init_stdlib
 
 from .error import print_error
 
+from .ast import ProgramNode
 from .parser import Parser
 from .lexer import Lexer
 from .evaluator import evaluate
+from .optimizer import DEFAULT_LEVEL, optimize_program
 from .environment import Environment
+from .trace import is_enabled
 
 
 def globalEnvironment():
@@ -15,18 +19,42 @@ def globalEnvironment():
     init_stdlib(env)
     return env
 
-def execute(input: TextIOBase, env: Environment, debug = False):
-    try:
+def execute(input: TextIOBase, env: Environment, debug = False, engine = "closure", level = DEFAULT_LEVEL):
+    def parse() -> ProgramNode:
         lexer = Lexer(input, debug)
         parser = Parser(lexer, debug)
         if debug:
             print("== Tokens ==")
-        ast = parser.parse()
+        return parser.parse()
+    return run(parse, env, debug, engine, level)
+
+def execute_file(filepath: str, env: Environment, debug = False, engine = "closure", cache = True, level = DEFAULT_LEVEL):
+    """
+    Execute a source file.
+    Unless debugging or tracing the lexer or parser, the parsed program is loaded from the cache
+    when the source is unchanged.
+    """
+    if debug or not cache or is_enabled("lex") or is_enabled("parse"):
+        with open(filepath, mode='r') as f:
+            return execute(f, env, debug, engine, level)
+    from .cache import parse_cached
+    def parse() -> ProgramNode:
+        with open(filepath, mode='r') as f:
+            source = f.read()
+        return parse_cached(filepath, source)
+    return run(parse, env, debug, engine, level)
+
+def run(parse: Callable[[], ProgramNode], env: Environment, debug = False, engine = "closure", level = DEFAULT_LEVEL):
+    """
+    Parse, optimize and evaluate a program, printing any error.
+    """
+    try:
+        ast = optimize_program(parse(), level)
         if debug:
             print("== AST ==")
             print('  ' + '\n  '.join(str(e) for e in ast.expressions))
             print("== Evaluation ==")
-        result = evaluate(ast, env, debug)
+        result = evaluate(ast, env, debug, engine)
         if debug:
             print("== END ==")
             print("Result:", result, "//", result.type)
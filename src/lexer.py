@@ -1,5 +1,83 @@
+import re
 from io import TextIOBase
 
+from .trace import TraceEvent, emit, is_enabled
+
+# Number of characters read from a source stream per I/O call
+CHUNK_SIZE = 1 << 16
+
+# Patterns used to scan runs of characters at the cursor
+STRING_CONTENT = {
+    '"': re.compile(r'[^"\\]*'),
+    "'": re.compile(r"[^'\\]*"),
+}
+LINE_COMMENT = re.compile(r"[^\n]*")
+# Leading whitespace followed by an identifier, number or operator token.
+# Strings, comments and unexpected characters are left to the slow path.
+TOKEN = re.compile(r"""
+    (?P<space>[ \t\n\r]*)
+    (?:
+        (?P<identifier>[^\W\d]\w*)
+      | (?P<number>\d+(?:\.(?!\.)\d*)?)
+      | (?P<operator>
+            \+= | -= | \*= | /= | %= | \^= | <= | >= | != | == | => | && | \|\| | \#\{ | \.\.
+          | /(?![/*]) | [-+*%^<>=!&|~?.,:;{}()\[\]]
+        )
+    )?
+""", re.VERBOSE)
+
+KEYWORDS = ["if", "else", "match", "class", "enum", "while", "for", "break", "continue", "return"]
+WORD_OPERATORS = ["and", "or", "not", "is", "in"]
+ESCAPE_SEQUENCES = {
+    'n': '\n',
+    't': '\t',
+    'r': '\r',
+    '\\': '\\',
+    '"': '"',
+    "'": "'",
+}
+DOUBLE_CHAR_OPERATORS = {
+    "+=": "PLUSEQUAL",
+    "-=": "MINUSEQUAL",
+    "*=": "TIMESEQUAL",
+    "/=": "DIVEQUAL",
+    "%=": "MODEQUAL",
+    "^=": "POWEQUAL",
+    "<=": "LESSEQUAL",
+    ">=": "GREATEREQUAL",
+    "!=": "NOTEQUAL",
+    "==": "EQUAL",
+    "=>": "RIGHTARROW",
+    "&&": "AND",
+    "||": "OR",
+    "#{": "HASHBRACE",
+    "..": "RANGE",
+}
+SINGLE_CHAR_OPERATORS = {
+    '+': "PLUS",
+    '-': "MINUS",
+    '*': "MULTIPLY",
+    '/': "DIVIDE",
+    '%': "MODULO",
+    '^': "POWER",
+    '<': "LESS",
+    '>': "GREATER",
+    '=': "ASSIGNMENT",
+    '!': "NOT",
+    '&': "BITWISEAND",
+    '|': "BITWISEOR",
+    '~': "BITWISENOT",
+    '?': "QUESTIONMARK",
+    '.': "DOT",
+    ',': "COMMA",
+    ':': "COLON",
+    ';': "SEMICOLON",
+    '{': "LBRACE",
+    '}': "RBRACE",
+    ')': "RPAREN",
+    ']': "RBRACKET",
+}
+
 # Token class
 class Token():
     """
@@ -22,23 +100,28 @@ class Token():
 
 # Lexer class
 class Lexer:
-    def __init__(self, source: TextIOBase, debug = False):
-        self.__source = source
-        self.__process_queue: list[str] = [] # FIFO Queue of chars that have been read but not yet processed
+    def __init__(self, source: TextIOBase | str, debug = False, chunk_size = CHUNK_SIZE):
+        """
+        Initialize a lexer over a source stream or a whole source string.
+        Streams are read `chunk_size` characters at a time into a buffer
+        which is then scanned with an index cursor.
+        """
+        if isinstance(source, str):
+            self.__source: TextIOBase | None = None # The whole source is already buffered
+            self.__buffer = source
+        else:
+            self.__source: TextIOBase | None = source
+            self.__buffer = ""
+        self.__chunk_size = chunk_size
+        self.__pos = 0 # Index of the next unprocessed character in the buffer
         self.__line = 1
         self.__column = 1
-        self.__debug = debug
+        self.__tracing = debug or is_enabled("lex")
         self.__prev_char: str = None # Previously read character
         self.__peeked_token: Token | None = None # The last token that was peeked
         self.__prev_comment: Token | None = None # The last comment that was read before the previous token
 
     # Helper functions
-    def __dprint(self, *args):
-        """
-        Print debug information.
-        """
-        if self.__debug:
-            print(*args)
     def __token(self, name: str, value = None) -> Token:
         """
         Create a token with the given name and value.
@@ -52,33 +135,97 @@ class Lexer:
         raise Exception(f"Syntax Error at {self.__line}:{self.__column}: {msg}")
 
     # Tokenizer functions
-    def __can_read(self) -> bool:
+    def __fill(self) -> bool:
         """
-        Check if source can be read.
+        Read the next chunk from the source stream into the buffer.
+        Already processed characters are dropped from the buffer.
 
         Returns
         -------
         bool
-            True if source can be read, False otherwise.
+            True if more characters were read, False at the end of the stream.
         """
-        return self.__source.readable()
+        if self.__source is None: return False
+        chunk = self.__source.read(self.__chunk_size) if self.__source.readable() else ''
+        if chunk == '':
+            self.__source = None
+            return False
+        self.__buffer = self.__buffer[self.__pos:] + chunk
+        self.__pos = 0
+        return True
 
     def __queue_request(self, length: int):
         """
-        Assert that the queue has at least the given length.
-        If the queue is too short, read more characters from source
-        until the queue is as long as the given length.
+        Assert that the buffer has at least the given number of unprocessed characters.
+        If the buffer is too short, read more chunks from source
+        until it is long enough or the source is exhausted.
 
         Parameters
         ----------
         length : int
             The length to assert.
         """
-        while len(self.__process_queue) < length:
-            if not self.__can_read(): break
-            c = self.__source.read(1)
-            if c == '': break
-            self.__process_queue.append(c)
+        while len(self.__buffer) - self.__pos < length:
+            if not self.__fill(): break
+
+    def __advance(self, text: str):
+        """
+        Move the cursor past the given text, updating the line and column.
+
+        Parameters
+        ----------
+        text : str
+            The text at the cursor that is consumed.
+        """
+        if text == "": return
+        self.__pos += len(text)
+        newlines = text.count('\n')
+        if newlines > 0:
+            self.__line += newlines
+            text = text[text.rindex('\n') + 1:]
+            self.__column = 1
+        self.__column += len(text) + 3 * text.count('\t')
+        self.__prev_char = '\n' if text == "" else text[-1]
+
+    def __scan(self, pattern: re.Pattern) -> str:
+        """
+        Consume the longest run of characters at the cursor matching the given pattern.
+        The buffer is refilled while the match reaches its end.
+
+        Returns
+        -------
+        str
+            The consumed text, possibly empty.
+        """
+        m = pattern.match(self.__buffer, self.__pos)
+        while m.end() == len(self.__buffer) and self.__fill():
+            m = pattern.match(self.__buffer, self.__pos)
+        text = m.group()
+        self.__advance(text)
+        return text
+
+    def __scan_until(self, terminator: str) -> str | None:
+        """
+        Consume all characters up to and including the given terminator.
+
+        Returns
+        -------
+        str | None
+            The consumed text without the terminator.
+            Or None if the end of the stream was reached first.
+        """
+        start = self.__pos
+        end = self.__buffer.find(terminator, start)
+        while end < 0:
+            searched = len(self.__buffer) - self.__pos
+            if not self.__fill():
+                self.__advance(self.__buffer[self.__pos:])
+                return None
+            start = self.__pos + max(0, searched - len(terminator) + 1)
+            end = self.__buffer.find(terminator, start)
+        text = self.__buffer[self.__pos:end]
+        self.__advance(self.__buffer[self.__pos:end + len(terminator)])
+        return text
 
     def __next_char(self):
         """
@@ -90,9 +237,11 @@ class Lexer:
             The next character from the source stream.
             Or None if the end of the stream has been reached.
         """
-        self.__queue_request(1)
-        if len(self.__process_queue) == 0: return None
-        c = self.__process_queue.pop(0)
+        if self.__pos >= len(self.__buffer):
+            self.__queue_request(1)
+            if self.__pos >= len(self.__buffer): return None
+        c = self.__buffer[self.__pos]
+        self.__pos += 1
         if c == '\n':
             self.__line += 1
             self.__column = 1
@@ -102,7 +251,7 @@ class Lexer:
             self.__column += 1
         self.__prev_char = c
         return c
-    
+
     def __expect_char(self, expected: str):
         """
         Assert that the next character from source is the expected character.
@@ -131,8 +280,12 @@ class Lexer:
             The next character from the source stream.
             Or '\\0' if the end of the stream has been reached.
         """
-        self.__queue_request(1 + offset)
-        return self.__process_queue[offset] if len(self.__process_queue) > offset else '\0'
+        i = self.__pos + offset
+        if i >= len(self.__buffer):
+            self.__queue_request(1 + offset)
+            i = self.__pos + offset
+            if i >= len(self.__buffer): return '\0'
+        return self.__buffer[i]
 
     def __read_string(self, quote: str) -> Token:
         """
@@ -148,170 +301,82 @@ class Lexer:
         Token
             A token with the string value.
         """
-        s = ""
-        while self.__can_read():
+        content = STRING_CONTENT[quote]
+        parts = []
+        while True:
+            parts.append(self.__scan(content))
             c = self.__expect_char("string content, escape sequence, or closing quote")
             if c == quote:
-                return self.__token("STRING", s)
-            elif c == '\\':
-                c = self.__expect_char("string escape sequence")
-                if c == 'n':
-                    s += '\n'
-                elif c == 't':
-                    s += '\t'
-                elif c == 'r':
-                    s += '\r'
-                elif c == '\\':
-                    s += '\\'
-                elif c in ['"', "'"]:
-                    s += c
-                else:
-                    self.__error("Invalid escape sequence: \\" + c)
-            else:
-                s += c
-        self.__error("Unterminated string")
-
-    def __read_identifier(self, first: str) -> Token:
-        """
-        Read an identifier from source.
-
-        Returns
-        -------
-        Token
-            A token with the identifier value.
-        """
-        s = first
-        nc = self.__peek_char()
-        while nc.isalnum() or nc == '_':
-            s += self.__expect_char("identifier character")
-            if self.__can_read():
-                nc = self.__peek_char()
-            else:
-                break
-        return self.__token("IDENTIFIER", s)
-
-    def __read_number(self, first: str) -> Token:
-        """
-        Read a number from source.
-
-        Returns
-        -------
-        Token
-            A token with the number value.
-        """
-        s = first
-        decimalPoint = False
-        nc = self.__peek_char()
-        nnc = self.__peek_char(1)
-        while (nc.isdigit() or nc == '.') and not (nc == '.' and nnc == '.'):
-            if nc == '.':
-                if decimalPoint:
-                    break
-                decimalPoint = True
-            s += self.__expect_char("digit or decimal point")
-            if self.__can_read():
-                nc = self.__peek_char()
-            else:
-                break
-        value = float(s)
-        value = int(value) if value.is_integer() else value
-        return self.__token("NUMBER", value)
+                return self.__token("STRING", "".join(parts))
+            # Only a backslash can stop the content scan before the closing quote
+            c = self.__expect_char("string escape sequence")
+            if c not in ESCAPE_SEQUENCES:
+                self.__error("Invalid escape sequence: \\" + c)
+            parts.append(ESCAPE_SEQUENCES[c])
 
     def __is_end_of_expression(self, c: str) -> bool:
         return (c is not None) and (c.isalnum() or c in ['_', ']', '}', ')'])
 
     def __read_token(self) -> Token:
         """
-        Tokenize the next character from source.
+        Tokenize the next token from source.
 
         Returns
         -------
         Token
             The next token from the source stream.
         """
+        # Fast path: skip whitespace and match identifiers, numbers and operators in one go
+        # Refill while a token may continue into the next chunk, like `#` before `{`
+        m = TOKEN.match(self.__buffer, self.__pos)
+        while len(self.__buffer) - m.end() < 2 and self.__fill():
+            m = TOKEN.match(self.__buffer, self.__pos)
+        self.__advance(m.group("space"))
         pc = self.__prev_char
+        kind = m.lastgroup
+        if kind != "space":
+            text = m.group(kind)
+            # Tokens matched here never contain newlines or tabs
+            self.__pos = m.end()
+            self.__column += len(text)
+            self.__prev_char = text[-1]
+            if kind == "identifier":
+                if text in ["true", "false"]:
+                    return self.__token("BOOL", text == "true")
+                if text in KEYWORDS:
+                    return self.__token("KEYWORD", text)
+                if text in WORD_OPERATORS:
+                    return self.__token(text.upper(), text)
+                return self.__token("IDENTIFIER", text)
+            if kind == "number":
+                value = float(text)
+                value = int(value) if value.is_integer() else value
+                return self.__token("NUMBER", value)
+            if text in DOUBLE_CHAR_OPERATORS: return self.__token(DOUBLE_CHAR_OPERATORS[text], text)
+            if text in SINGLE_CHAR_OPERATORS: return self.__token(SINGLE_CHAR_OPERATORS[text], text)
+            if text == '(':
+                if self.__is_end_of_expression(pc):
+                    return self.__token("CALL", text) # Treat as a function call
+                return self.__token("LPAREN", text) # Normal parenthesis
+            if self.__is_end_of_expression(pc):
+                return self.__token("INDEX", text) # Indexing
+            return self.__token("LBRACKET", text) # Normal bracket
+
+        # Slow path: strings, comments and everything else
         c = self.__next_char()
         if c in ['', '\0', None]: return self.__token("EOF")
         nc = self.__peek_char() # Look ahead one character: LL(1)
 
-        # Whitespace
-        if c in [' ', '\t', '\n', '\r']:
-            return self.__read_token() # Skip whitespace
         if c in ['"', "'"]:
             return self.__read_string(c)
-        if c.isdigit():
-            return self.__read_number(c)
-        if c.isalpha() or c == '_':
-            t = self.__read_identifier(c)
-            if t.value in ["true", "false"]:
-                return self.__token("BOOL", t.value == "true")
-            if t.value in ["if", "else", "match", "class", "enum", "while", "for", "break", "continue", "return"]:
-                return self.__token("KEYWORD", t.value)
-            if t.value in ["and", "or", "not", "is", "in"]:
-                return self.__token(t.value.upper(), t.value)
-            return t
         if c == '/' and nc == '/':
             self.__expect_char("single line comment start")
-            comment = ""
-            while self.__can_read() and self.__peek_char() != '\n':
-                comment += self.__expect_char("comment content")
-            return self.__token("COMMENT", comment)
+            return self.__token("COMMENT", self.__scan(LINE_COMMENT))
         if c == '/' and nc == '*':
             self.__expect_char("multi line comment start")
-            comment = ""
-            while self.__can_read():
-                c = self.__expect_char("comment content")
-                if c == '*' and self.__peek_char() == '/':
-                    self.__expect_char("multi line comment end")
-                    break
-                comment += c
+            comment = self.__scan_until("*/")
+            if comment is None: self.__error("Expected multi line comment end but got EOF")
             return self.__token("COMMENT", comment)
-        # Operators
-        if c == '+' and nc == '=': return self.__token("PLUSEQUAL", c + self.__next_char())
-        if c == '-' and nc == '=': return self.__token("MINUSEQUAL", c + self.__next_char())
-        if c == '*' and nc == '=': return self.__token("TIMESEQUAL", c + self.__next_char())
-        if c == '/' and nc == '=': return self.__token("DIVEQUAL", c + self.__next_char())
-        if c == '%' and nc == '=': return self.__token("MODEQUAL", c + self.__next_char())
-        if c == '^' and nc == '=': return self.__token("POWEQUAL", c + self.__next_char())
-        if c == '<' and nc == '=': return self.__token("LESSEQUAL", c + self.__next_char())
-        if c == '>' and nc == '=': return self.__token("GREATEREQUAL", c + self.__next_char())
-        if c == '!' and nc == '=': return self.__token("NOTEQUAL", c + self.__next_char())
-        if c == '=' and nc == '=': return self.__token("EQUAL", c + self.__next_char())
-        if c == '=' and nc == '>': return self.__token("RIGHTARROW", c + self.__next_char())
-        if c == '&' and nc == '&': return self.__token("AND", c + self.__next_char())
-        if c == '|' and nc == '|': return self.__token("OR", c + self.__next_char())
-        if c == '#' and nc == '{': return self.__token("HASHBRACE", c + self.__next_char())
-        if c == '.' and nc == '.': return self.__token("RANGE", c + self.__next_char())
-        if c == '+': return self.__token("PLUS", c)
-        if c == '-': return self.__token("MINUS", c)
-        if c == '*': return self.__token("MULTIPLY", c)
-        if c == '/': return self.__token("DIVIDE", c)
-        if c == '%': return self.__token("MODULO", c)
-        if c == '^': return self.__token("POWER", c)
-        if c == '<': return self.__token("LESS", c)
-        if c == '>': return self.__token("GREATER", c)
-        if c == '=': return self.__token("ASSIGNMENT", c)
-        if c == '!': return self.__token("NOT", c)
-        if c == '&': return self.__token("BITWISEAND", c)
-        if c == '|': return self.__token("BITWISEOR", c)
-        if c == '~': return self.__token("BITWISENOT", c)
-        if c == '?': return self.__token("QUESTIONMARK", c)
-        if c == '.': return self.__token("DOT", c)
-        if c == ',': return self.__token("COMMA", c)
-        if c == ':': return self.__token("COLON", c)
-        if c == ';': return self.__token("SEMICOLON", c)
-        if c == '{': return self.__token("LBRACE", c)
-        if c == '}': return self.__token("RBRACE", c)
-        if c == '(':
-            if self.__is_end_of_expression(pc):
-                return self.__token("CALL", c) # Treat as a function call
-            return self.__token("LPAREN", c) # Normal parenthesis
-        if c == ')': return self.__token("RPAREN", c)
-        if c == '[':
-            if self.__is_end_of_expression(pc):
-                return self.__token("INDEX", c) # Indexing
-            return self.__token("LBRACKET", c) # Normal bracket
-        if c == ']': return self.__token("RBRACKET", c)
         self.__error("Unexpected character: " + c)
 
     def is_done(self):
@@ -323,7 +388,7 @@ class Lexer:
         bool
             True if the lexer is done, False otherwise.
         """
-        return not self.__can_read() or self.peek_token().name == "EOF"
+        return self.peek_token().name == "EOF"
 
     def reset_peek(self):
         """
@@ -362,10 +427,10 @@ class Lexer:
             return t
         else:
             t = self.__read_token()
-            if not allow_comment and t.name == "COMMENT":
+            while not allow_comment and t.name == "COMMENT":
                 self.__prev_comment = t
-                return self.next_token(False)
-            self.__dprint("  " + str(t))
+                t = self.__read_token()
+            if self.__tracing: emit(TraceEvent("lex", "token", t))
             return t
 
     def prev_comment(self):
@@ -0,0 +1,132 @@
+import os
+from array import array
+from itertools import accumulate
+
+from .cache import CACHE_DIR
+
+# Line indexes are persisted next to their file in the cache directory of parsed programs
+INDEX_EXTENSION = ".lidx"
+MAGIC = b"MINIIDX\x01"
+CHUNK_SIZE = 1 << 20
+
+class LineIndex():
+    """
+    The offsets of the lines of a text file, to read any line with a single seek.
+    The index is rebuilt when the size or modification time of the file changes.
+    """
+    def __init__(self, path: str, persist: bool):
+        self.path = path
+        self.persist = persist
+        self.offsets = array("q") # Start of each line, followed by the size of the file
+        self.stamp: tuple[int, int] | None = None # Size and modification time the offsets are valid for
+        self.file = None
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __repr__(self) -> str:
+        return f"<line index of '{self.path}'>"
+
+    def refresh(self):
+        """
+        Make sure the offsets match the file, loading or building them if it changed.
+        """
+        stat = os.stat(self.path)
+        stamp = (stat.st_size, stat.st_mtime_ns)
+        if stamp == self.stamp:
+            return
+        if not self.load(stamp):
+            self.build(stamp)
+            if self.persist:
+                self.store()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def build(self, stamp: tuple[int, int]):
+        """
+        Scan the file for line breaks, in chunks so that memory use does not depend on its size.
+        """
+        offsets = array("q", [0])
+        position = 0
+        with open(self.path, "rb") as f:
+            while chunk := f.read(CHUNK_SIZE):
+                # Each line break starts a line one past the end of the text before it, summed in C
+                starts = accumulate(map((1).__add__, map(len, chunk.split(b"\n")[:-1])), initial=position)
+                next(starts)
+                offsets.extend(starts)
+                position += len(chunk)
+        if offsets[-1] != position:
+            offsets.append(position) # The last line has no line break
+        self.offsets, self.stamp = offsets, stamp
+
+    def index_path(self) -> str:
+        directory, name = os.path.split(os.path.abspath(self.path))
+        return os.path.join(directory, CACHE_DIR, name + INDEX_EXTENSION)
+
+    def header(self, stamp: tuple[int, int]) -> bytes:
+        return MAGIC + array("q", stamp).tobytes()
+
+    def load(self, stamp: tuple[int, int]) -> bool:
+        """
+        Load the persisted offsets, if there are any for the current version of the file.
+        """
+        try:
+            with open(self.index_path(), "rb") as f:
+                data = f.read()
+        except OSError:
+            return False
+        header = self.header(stamp)
+        if not data.startswith(header):
+            return False
+        offsets = array("q")
+        offsets.frombytes(data[len(header):])
+        self.offsets, self.stamp = offsets, stamp
+        return True
+
+    def store(self):
+        """
+        Persist the offsets, replacing the file atomically. Failing to write them is not an error.
+        """
+        path = self.index_path()
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp = f"{path}.{os.getpid()}.tmp"
+            with open(temp, "wb") as f:
+                f.write(self.header(self.stamp))
+                self.offsets.tofile(f)
+            os.replace(temp, path)
+        except OSError:
+            pass
+
+    def read(self, start: int, end: int) -> bytes:
+        """
+        Read the lines from `start` up to but not including `end`.
+        """
+        self.refresh()
+        if not (0 <= start <= end <= len(self)):
+            raise Exception(f"Lines {start} to {end} are out of range of the {len(self)} lines of '{self.path}'")
+        if self.file is None:
+            self.file = open(self.path, "rb")
+        self.file.seek(self.offsets[start])
+        return self.file.read(self.offsets[end] - self.offsets[start])
+
+    def line(self, n: int) -> str:
+        return self.read(n, n + 1).rstrip(b"\r\n").decode("utf-8")
+
+    def lines(self, start: int, end: int) -> list[str]:
+        """
+        Read the lines from `start` up to but not including `end`, split where the index splits them,
+        so that other characters `str.splitlines` breaks at stay in their line.
+        """
+        data = self.read(start, end)
+        base, offsets = self.offsets[start], self.offsets
+        return [data[offsets[i] - base:offsets[i + 1] - base].rstrip(b"\r\n").decode("utf-8") for i in range(start, end)]
+
+def open_index(path: str, persist = False) -> LineIndex:
+    """
+    Get the line index of a file, building it unless a persisted one is still valid.
+    """
+    index = LineIndex(path, persist)
+    index.refresh()
+    return index
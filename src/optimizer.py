@@ -0,0 +1,174 @@
+import math
+
+from .atoms import Atom
+from .ast import AtomicNode, BinaryNode, BlockNode, ForNode, IfNode, LambdaNode, ListNode, MapNode, Node, ProgramNode, SliceNode, TupleNode, UnaryNode, WhileNode
+from .evaluator import evaluate_binary_atom_expression, evaluate_unary_atom_expression, is_identifier, literal_atom, map_key
+
+# Optimization levels
+NONE = 0 # Evaluate the program as parsed
+LITERALS = 1 # Share the atoms of equal literals and of map keys
+FOLDING = 2 # Also fold constant expressions and drop branches that are never taken
+DEFAULT_LEVEL = FOLDING
+
+# Operators folded when both operands are constant,
+# they have no side effects and never depend on the environment
+FOLDED_OPERATORS = ["PLUS", "MINUS", "MULTIPLY", "DIVIDE", "MODULO", "POWER", "EQUAL", "NOTEQUAL",
+                    "LESS", "GREATER", "LESSEQUAL", "GREATEREQUAL", "AND", "OR"]
+# Only immutable values can be shared, lists, tuples and maps may be changed in place
+CONSTANT_TYPES = ["number", "string", "bool"]
+# Powers with larger results, in bits, are left to be computed if they are ever evaluated
+MAX_FOLDED_POWER_BITS = 4096
+
+def is_constant(expression: Node) -> bool:
+    return isinstance(expression, AtomicNode) and expression.atom is not None
+
+def is_small_power(base: Atom, exponent: Atom) -> bool:
+    if base.type != "number" or exponent.type != "number" or abs(base.value) <= 1 or exponent.value <= 0:
+        return True
+    return exponent.value * math.log2(abs(base.value)) <= MAX_FOLDED_POWER_BITS
+
+class Optimizer():
+    """
+    Rewrites a parsed program into one that evaluates to the same result with less work.
+    Each literal gets the atom it evaluates to, shared by all literals of the same value,
+    so that no engine has to allocate it again. At higher levels, expressions of constants
+    are evaluated once, and the branches of ifs and loops with constant conditions are dropped.
+    """
+    def __init__(self, level: int):
+        self.level = level
+        self.pool: dict[tuple, Atom] = {} # Shared atoms of literals by type and value
+
+    def constant(self, type: str, value, position: tuple[int, int] | None = None) -> AtomicNode:
+        """
+        Get a literal node of a constant value, evaluating to its shared atom.
+        """
+        key = (type, value.__class__, value) # Keep 1, 1.0 and true apart
+        if key not in self.pool:
+            self.pool[key] = literal_atom(type, value)
+        node = AtomicNode(type, value)
+        node.atom = self.pool[key]
+        node.position = position
+        return node
+
+    def optimize_all(self, expressions: list[Node]) -> list[Node]:
+        return [self.optimize(e) for e in expressions]
+
+    def optimize(self, expression: Node) -> Node:
+        """
+        Optimize an expression and return the node to evaluate in its place.
+        """
+        if isinstance(expression, AtomicNode):
+            if is_identifier(expression) or expression.type not in CONSTANT_TYPES:
+                return expression
+            return self.constant(expression.type, expression.value, expression.position)
+        elif isinstance(expression, (TupleNode, ListNode)):
+            expression.elements = self.optimize_all(expression.elements)
+        elif isinstance(expression, MapNode):
+            self.optimize_map(expression)
+        elif isinstance(expression, BlockNode):
+            expression.expressions = self.optimize_all(expression.expressions)
+        elif isinstance(expression, LambdaNode):
+            expression.body = self.optimize(expression.body)
+        elif isinstance(expression, IfNode):
+            expression.condition = self.optimize(expression.condition)
+            expression.ifBody = self.optimize(expression.ifBody)
+            expression.elseIfs = [(self.optimize(c), self.optimize(b)) for c, b in expression.elseIfs]
+            if expression.elseBody is not None:
+                expression.elseBody = self.optimize(expression.elseBody)
+            if self.level >= FOLDING:
+                return self.fold_if(expression)
+        elif isinstance(expression, WhileNode):
+            expression.condition = self.optimize(expression.condition)
+            expression.body = self.optimize(expression.body)
+            if self.level >= FOLDING and self.is_bool(expression.condition, False):
+                return TupleNode([]) # The body is never evaluated
+        elif isinstance(expression, ForNode):
+            expression.iterable = self.optimize(expression.iterable)
+            expression.body = self.optimize(expression.body)
+        elif isinstance(expression, SliceNode):
+            expression.start = self.optimize(expression.start)
+            expression.end = self.optimize(expression.end)
+            if expression.step is not None:
+                expression.step = self.optimize(expression.step)
+        elif isinstance(expression, UnaryNode):
+            expression.rhs = self.optimize(expression.rhs)
+            if self.level >= FOLDING and is_constant(expression.rhs):
+                return self.fold(expression, lambda: evaluate_unary_atom_expression(expression.operator, expression.rhs.atom))
+        elif isinstance(expression, BinaryNode):
+            if expression.operator != "ASSIGNMENT":
+                # The left hand side of an assignment is a pattern, not a value
+                expression.left = self.optimize(expression.left)
+            if expression.operator != "DOT":
+                # The right hand side of a member access is a member name
+                expression.right = self.optimize(expression.right)
+            if (self.level >= FOLDING and expression.operator in FOLDED_OPERATORS
+                    and is_constant(expression.left) and is_constant(expression.right)
+                    and (expression.operator != "POWER" or is_small_power(expression.left.atom, expression.right.atom))):
+                return self.fold(expression, lambda: evaluate_binary_atom_expression(
+                    expression.operator, expression.left.atom, expression.right.atom, None))
+        return expression
+
+    def optimize_map(self, expression: MapNode):
+        """
+        Optimize the values of a map literal and normalize its keys to the constants they stand for,
+        unless two keys stand for the same constant.
+        """
+        pairs = {}
+        for key, value in expression.pairs.items():
+            value = self.optimize(value)
+            try:
+                atom = map_key(key)
+                key = self.constant(atom.type, atom.value, key.position)
+            except Exception:
+                pass # Invalid keys are reported when evaluated
+            pairs[key] = value
+        if len(pairs) == len(expression.pairs):
+            expression.pairs = pairs
+        else:
+            expression.pairs = dict(zip(expression.pairs.keys(), pairs.values()))
+
+    def fold(self, expression: Node, evaluate) -> Node:
+        """
+        Replace an expression of constants by the constant it evaluates to.
+        Expressions raising an error are kept, so the error is raised when they are evaluated.
+        """
+        try:
+            result = evaluate()
+        except Exception:
+            return expression
+        if result.type not in CONSTANT_TYPES:
+            return expression
+        return self.constant(result.type, result.value, expression.position)
+
+    def is_bool(self, expression: Node, value: bool) -> bool:
+        return is_constant(expression) and expression.atom.type == "bool" and expression.atom.value == value
+
+    def fold_if(self, expression: IfNode) -> Node:
+        """
+        Drop the branches of an if expression whose conditions are constant.
+        """
+        branches = [(expression.condition, expression.ifBody)] + expression.elseIfs
+        # Branches after a condition that is always true are never taken
+        for i, (cond, _) in enumerate(branches):
+            if self.is_bool(cond, True):
+                branches, elseBody = branches[:i], branches[i][1]
+                break
+        else:
+            elseBody = expression.elseBody
+        branches = [(c, b) for c, b in branches if not self.is_bool(c, False)]
+        if len(branches) == 0:
+            return elseBody if elseBody is not None else TupleNode([])
+        expression.condition, expression.ifBody = branches[0]
+        expression.elseIfs = branches[1:]
+        expression.elseBody = elseBody
+        return expression
+
+def optimize_program(program: ProgramNode, level = DEFAULT_LEVEL) -> ProgramNode:
+    """
+    Optimize all expressions of a program at the given level.
+    """
+    if level <= NONE:
+        return program
+    optimizer = Optimizer(level)
+    program.expressions = optimizer.optimize_all(program.expressions)
+    return program
@@ -0,0 +1,175 @@
+import io
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+from .ast import Node
+from .atoms import Atom, BuiltinFunctionAtom, FunctionAtom
+from .environment import Environment
+
+# Chunks handed to each worker when no chunk size is given, so that uneven chunks even out
+CHUNKS_PER_WORKER = 4
+
+class Pickler(pickle.Pickler):
+    """
+    Pickles atoms to send them between the interpreter and its worker processes.
+    The global environment and the builtins in it are not sent, but refer to those of the receiving process,
+    and functions compiled to closures are sent as their body, to be compiled again by the receiver.
+    """
+    def __init__(self, file, globals: Environment):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.globals = globals
+
+    def reducer_override(self, obj):
+        # Unlike `persistent_id`, this is not called for numbers, strings and Python containers
+        if obj is self.globals:
+            return received, ("globals",)
+        elif isinstance(obj, BuiltinFunctionAtom) and obj.functionName in builtins().values:
+            return received, ("builtin", obj.functionName)
+        elif isinstance(obj, FunctionAtom):
+            # The environment is set once the function exists, as it may contain the function itself
+            closure = obj.compiled is not None and obj.code is None
+            return rebuild_function, (obj.argumentNames, obj.body, obj.name, obj.code, obj.scope, closure), {"environment": obj.environment}
+        return NotImplemented
+
+def received(kind: str, name: str = None):
+    raise Exception("Values referring to the receiving process can only be loaded by `loads`")
+
+class Unpickler(pickle.Unpickler):
+    def __init__(self, file, globals: Environment):
+        super().__init__(file)
+        self.globals = globals
+
+    def find_class(self, module: str, name: str):
+        if module == __name__ and name == "received":
+            return self.received
+        return super().find_class(module, name)
+
+    def received(self, kind: str, name: str = None):
+        if kind == "globals":
+            return self.globals
+        return builtins().values[name]
+
+# All builtins, by their name, as programs may define globals of the same names
+_builtins: Environment | None = None
+
+def builtins() -> Environment:
+    global _builtins
+    if _builtins is None:
+        from .stdlib import init_stdlib
+        _builtins = Environment("builtins", None)
+        init_stdlib(_builtins, False)
+    return _builtins
+
+def rebuild_function(argumentNames: list[str], body: Node, name: str, code, scope, closure: bool) -> FunctionAtom:
+    compiled = code.entry if code is not None else None
+    if closure:
+        from .compiler import compile_expression
+        compiled = compile_expression(body, True)
+    return FunctionAtom(argumentNames, body, None, name, compiled, code, scope)
+
+def dumps(value, globals: Environment) -> bytes:
+    f = io.BytesIO()
+    Pickler(f, globals).dump(value)
+    return f.getvalue()
+
+def loads(data: bytes, globals: Environment):
+    return Unpickler(io.BytesIO(data), globals).load()
+
+def identifiers(node: Node, names: set[str]):
+    """
+    Collect the names of all identifiers in an expression, including those in nested functions.
+    """
+    pending = [node]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, Node):
+            if getattr(value, "type", None) == "identifier":
+                names.add(value.value)
+            pending.extend(vars(value).values())
+        elif isinstance(value, (list, tuple)):
+            pending.extend(value)
+        elif isinstance(value, dict):
+            pending.extend(value.keys())
+            pending.extend(value.values())
+
+def used_globals(function: Atom, globals: Environment) -> dict[str, Atom]:
+    """
+    Find the global variables a function may use, directly or through the functions it calls,
+    leaving out builtins, which every worker has already.
+    """
+    used: dict[str, Atom] = {}
+    pending, seen = [function], set()
+    while pending:
+        value = pending.pop()
+        if id(value) in seen:
+            continue
+        seen.add(id(value))
+        if isinstance(value, BuiltinFunctionAtom) and hasattr(value.func, "function"):
+            pending.append(value.func.function) # Memoized functions
+        elif isinstance(value, FunctionAtom):
+            names = set()
+            identifiers(value.body, names)
+            for name in names:
+                global_ = globals.values.get(name)
+                if name not in used and global_ is not None and not (isinstance(global_, BuiltinFunctionAtom) and global_.functionName == name):
+                    used[name] = global_
+                    pending.append(global_)
+            env = value.environment
+            while env is not None and env is not globals:
+                pending.extend(v for v in env.slots + list(env.values.values()) if v is not None)
+                env = env.parent
+    return used
+
+def run_chunk(data: bytes, filter: bool) -> bytes:
+    """
+    Call a function on a chunk of elements in a worker process, with the globals it uses.
+    """
+    from .evaluator import evaluate_call
+    from .interpreter import globalEnvironment
+    env = globalEnvironment()
+    used, function, elements = loads(data, env)
+    for name, value in used.items():
+        env.set(name, value)
+    if filter:
+        return dumps([evaluate_call(function, [e]).value == True for e in elements], env)
+    return dumps([evaluate_call(function, [e]) for e in elements], env)
+
+# Worker pools by their number of workers, kept for later calls as starting workers is slow
+pools: dict[int, ProcessPoolExecutor] = {}
+
+def pool(workers: int) -> ProcessPoolExecutor:
+    if workers not in pools:
+        pools[workers] = ProcessPoolExecutor(workers)
+    return pools[workers]
+
+def parallel_map(name: str, function: Atom, elements: list[Atom], workers: int | None, chunk_size: int | None, filter = False) -> list[Atom]:
+    """
+    Call a function on every element in worker processes, in chunks, and return the results in order.
+    When filtering, the elements for which the function returned true are returned instead.
+    Workers get copies of the elements and of the globals the function uses, so changes they make are not seen by the caller.
+    """
+    if len(elements) == 0:
+        return []
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 1 or (chunk_size is not None and chunk_size < 1):
+        raise Exception(f"Function '{name}' expected a positive number of workers and chunk size!")
+    if chunk_size is None:
+        chunk_size = -(-len(elements) // (workers * CHUNKS_PER_WORKER))
+    # Functions refer to the globals of the program they were defined in, builtins need none
+    globals = function.environment.globals if isinstance(function, FunctionAtom) else Environment("global", None)
+    try:
+        used = used_globals(function, globals)
+        chunks = [dumps((used, function, elements[i:i + chunk_size]), globals) for i in range(0, len(elements), chunk_size)]
+    except (pickle.PicklingError, TypeError, AttributeError) as e:
+        raise Exception(f"Function '{name}' can not send the function or its values to worker processes: {e}")
+    futures = [pool(workers).submit(run_chunk, chunk, filter) for chunk in chunks]
+    results = []
+    for i, future in enumerate(futures):
+        chunk = loads(future.result(), globals)
+        if filter:
+            results += [e for e, keep in zip(elements[i * chunk_size:(i + 1) * chunk_size], chunk) if keep]
+        else:
+            results += chunk
+    return results
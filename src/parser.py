@@ -1,6 +1,7 @@
 # Parser class
 from .lexer import Lexer, Token
-from .ast import AtomicNode, BinaryNode, BlockNode, IfNode, LambdaNode, ListNode, MapNode, Node, ProgramNode, SliceNode, TupleNode, UnaryNode
+from .trace import TraceEvent, emit, is_enabled
+from .ast import AtomicNode, BinaryNode, BlockNode, BreakNode, ContinueNode, ForNode, IfNode, LambdaNode, ListNode, MapNode, Node, ProgramNode, SliceNode, TupleNode, UnaryNode, WhileNode
 
 # Left associative infix operators binding powers
 precedence_left = {
@@ -38,14 +39,9 @@ class Parser:
     def __init__(self, lexer: Lexer, debug = False):
         self.lexer = lexer
         self.debug = debug
+        self.tracing = debug or is_enabled("parse")
 
     # Helper functions
-    def __dprint(self, *args):
-        """
-        Print debug messages.
-        """
-        if self.debug:
-            print(*args)
 
     def __error(self, msg: str, token: Token):
         """
@@ -114,7 +110,16 @@ class Parser:
     def __parse_primary(self) -> Node:
         """
         Parse a primary expression from the lexer.
+        The node is given the position of its first token, unless it has a position of its own,
+        such as the operator of a binary expression or the arrow of a lambda.
         """
+        t = self.lexer.peek_token()
+        node = self.__parse_primary_node()
+        if node.position is None:
+            node.position = (t.line, t.column)
+        return node
+
+    def __parse_primary_node(self) -> Node:
         prev_comment = self.lexer.prev_comment()
         t = self.lexer.next_token()
         if t.name in ["IDENTIFIER", "STRING", "NUMBER", "BOOL"]:
@@ -127,6 +132,10 @@ class Parser:
         elif t.name == "KEYWORD":
             match t.value:
                 case "if": return self.__parse_if()
+                case "while": return self.__parse_while()
+                case "for": return self.__parse_for()
+                case "break": return BreakNode()
+                case "continue": return ContinueNode()
                 case _: raise Exception(f"Keyword '{t.value}' is not implemented!")
         elif t.name == "LPAREN":
             lhs = TupleNode(self.__parse_list_of_expressions("COMMA", "RPAREN", False))
@@ -153,13 +162,15 @@ class Parser:
         """
         Parse a lambda expression from the lexer.
         """
-        self.__expect("RIGHTARROW")
+        arrow = self.__expect("RIGHTARROW")
         # Validate that the tuple only has identifiers
         # And add them to a list of argument names
         params = self.__ident_list_to_str(args)
         # Parse the body of the lambda
         body = self.__parse_expression()
-        return LambdaNode(params, body)
+        node = LambdaNode(params, body)
+        node.position = (arrow.line, arrow.column)
+        return node
 
     def __parse_binary_expression(self, lhs: Node, precedence: int) -> Node:
         """
@@ -169,9 +180,10 @@ class Parser:
         """
         l = self.lexer.peek_token().name
         while (l in precedence_left and precedence_left[l] >= precedence):
-            op = self.lexer.next_token().name
+            token = self.lexer.next_token()
+            op = token.name
             if op == "INDEX":
-                self.__dprint(f"Parsing indexing expression")
+                if self.tracing: emit(TraceEvent("parse", "index", None, op))
                 rhs = self.__parse_expression()
                 # Check if range index
                 if self.lexer.peek_token().name == "COLON":
@@ -185,6 +197,7 @@ class Parser:
                 self.__expect("RBRACKET")
             elif op == 'CALL':
                 rhs = TupleNode(self.__parse_list_of_expressions("COMMA", "RPAREN", False))
+                rhs.position = (token.line, token.column)
                 # if self.lexer.peek_token().name == "ASSIGNMENT":
                 #     self.lexer.next_token() # Remove the assignment
                 #     rhs = self.__parse_expression()
@@ -198,6 +211,7 @@ class Parser:
                 rhs = self.__parse_binary_expression(rhs, precedence_left[l])
                 l = self.lexer.peek_token().name
             lhs = BinaryNode(op, lhs, rhs)
+            lhs.position = (token.line, token.column)
         return lhs
 
     def __parse_hash_map(self) -> MapNode:
@@ -240,11 +254,48 @@ class Parser:
                 elseIfCond = self.__parse_expression()
                 elseIfBody = self.__parse_expression()
                 elseIfs.append((elseIfCond, elseIfBody))
+                nt = self.lexer.peek_token()
             else:
                 elseBody = self.__parse_expression()
                 break
         return IfNode(cond, ifBody, elseIfs, elseBody)
 
+    def __parse_while(self) -> WhileNode:
+        """
+        Parse a while loop from the lexer.
+        Example: while x < 10 x += 1
+        """
+        cond = self.__parse_expression()
+        return WhileNode(cond, self.__parse_loop_body())
+
+    def __parse_for(self) -> ForNode:
+        """
+        Parse a for loop from the lexer.
+        Example: for x in [1, 2, 3] print(x) or for (k, v) in #{a: 1} print(k, v)
+        """
+        t = self.lexer.next_token()
+        if t.name in ["LPAREN", "CALL"]:
+            variables = self.__parse_list_of_expressions("COMMA", "RPAREN", False)
+        else:
+            variables = [AtomicNode(t.name.lower(), t.value)]
+            variables[0].position = (t.line, t.column)
+        for v in variables:
+            if not (isinstance(v, AtomicNode) and v.type == "identifier"):
+                self.__error(f"Loop variable '{v}' is not an identifier", t)
+        self.__expect("IN")
+        iterable = self.__parse_expression()
+        return ForNode(variables, iterable, self.__parse_loop_body())
+
+    def __parse_loop_body(self) -> Node:
+        """
+        Parse the body of a loop.
+        A block body shares the scope enclosing the loop, so it can update variables declared before the loop.
+        """
+        body = self.__parse_expression()
+        if isinstance(body, BlockNode):
+            body.scoped = False
+        return body
+
     def __parse_expression(self) -> Node:
         """
         Parse an expression from the lexer.
@@ -258,5 +309,6 @@ class Parser:
         program = ProgramNode([])
         while not self.lexer.is_done():
             e = self.__parse_expression()
+            if self.tracing: emit(TraceEvent("parse", "expression", e))
             program.expressions.append(e)
         return program
@@ -0,0 +1,149 @@
+import sys
+import time
+from typing import TextIO
+
+from .atoms import Atom, BuiltinFunctionAtom, FunctionAtom
+from .ast import BlockNode, LambdaNode, Node
+
+class FunctionStats():
+    """
+    The calls of one mini function, or of one builtin, and the time spent in them.
+    All closures created by the same definition share their stats.
+    """
+    __slots__ = ("label", "calls", "inclusive", "exclusive", "sites", "depth")
+
+    def __init__(self, label: str):
+        self.label = label
+        self.calls = 0
+        self.inclusive = 0.0 # Time from call to return, not counting recursive calls twice
+        self.exclusive = 0.0 # Time in the function itself, not in the functions it called
+        self.sites: dict[tuple[int, int] | None, int] = {} # Number of calls from each source position
+        self.depth = 0 # Number of active calls
+
+class StackNode():
+    """
+    A node in the tree of all call stacks seen, holding the exclusive time of its top frame.
+    """
+    __slots__ = ("label", "children", "time")
+
+    def __init__(self, label: str):
+        self.label = label
+        self.children: dict[str, StackNode] = {}
+        self.time = 0.0
+
+class Profiler():
+    """
+    Records the calls of mini functions and builtins made while evaluating programs.
+    Calls report to the profiler through `enter` and `exit`,
+    and the call expression making the next call sets `site` to its source position.
+    """
+    def __init__(self):
+        self.stats: dict[object, FunctionStats] = {}
+        self.definitions: dict[Node, tuple[int, int]] = {} # Source position of each function body
+        self.root = StackNode("<program>")
+        self.frames: list[list] = [] # Stats, stack node, start and time spent in callees of each active call
+        self.site: tuple[int, int] | None = None
+
+    def register(self, expression: Node):
+        """
+        Remember where the functions of an expression are defined, to tell them apart in reports.
+        """
+        from .resolver import children, is_function_declaration
+        if isinstance(expression, LambdaNode):
+            self.definitions[expression.body] = expression.position
+            self.register(expression.body)
+        elif is_function_declaration(expression):
+            self.definitions[expression.right] = expression.left.position
+            self.register(expression.right)
+        elif isinstance(expression, BlockNode) and expression.scoped:
+            for e in expression.expressions:
+                self.register(e)
+        for e in children(expression):
+            self.register(e)
+
+    def label(self, function: Atom) -> tuple[object, str]:
+        if isinstance(function, FunctionAtom):
+            position = self.definitions.get(function.body)
+            if position is None:
+                return function.body, function.name
+            return function.body, f"{function.name} ({position[0]}:{position[1]})"
+        elif isinstance(function, BuiltinFunctionAtom):
+            return function.functionName, function.functionName
+        return function, str(function)
+
+    def enter(self, function: Atom):
+        key, label = self.label(function)
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = self.stats[key] = FunctionStats(label)
+        stats.calls += 1
+        stats.sites[self.site] = stats.sites.get(self.site, 0) + 1
+        self.site = None
+        stats.depth += 1
+        parent = self.frames[-1][1] if len(self.frames) > 0 else self.root
+        node = parent.children.get(label)
+        if node is None:
+            node = parent.children[label] = StackNode(label)
+        self.frames.append([stats, node, time.perf_counter(), 0.0])
+
+    def exit(self):
+        stats, node, start, callees = self.frames.pop()
+        elapsed = time.perf_counter() - start
+        stats.exclusive += elapsed - callees
+        node.time += elapsed - callees
+        stats.depth -= 1
+        if stats.depth == 0:
+            stats.inclusive += elapsed
+        if len(self.frames) > 0:
+            self.frames[-1][3] += elapsed
+
+    def print_report(self, file: TextIO = sys.stderr, limit = 30):
+        """
+        Print the functions by exclusive time, with their most frequent call sites.
+        """
+        stats = sorted(self.stats.values(), key=lambda s: s.exclusive, reverse=True)
+        print(f"{'function':<32} {'calls':>9} {'inclusive':>12} {'exclusive':>12} {'per call':>10}  call sites", file=file)
+        for s in stats[:limit]:
+            sites = sorted(s.sites.items(), key=lambda site: site[1], reverse=True)
+            sites = ", ".join(f"{format_site(site)} x{n}" for site, n in sites[:3])
+            print(f"{s.label:<32} {s.calls:>9} {s.inclusive * 1000:>9.2f} ms {s.exclusive * 1000:>9.2f} ms "
+                  f"{s.inclusive / s.calls * 1e6:>7.1f} us  {sites}", file=file)
+        if len(stats) > limit:
+            print(f"... and {len(stats) - limit} more functions", file=file)
+
+    def collapsed_stacks(self) -> list[str]:
+        """
+        Get the call stacks in the collapsed format of flame graph tools,
+        one line per stack with the frames separated by semicolons followed by the microseconds spent in its top frame.
+        """
+        lines = []
+        pending = [(self.root, self.root.label)]
+        while len(pending) > 0:
+            node, path = pending.pop()
+            if node.time > 0:
+                lines.append(f"{path} {round(node.time * 1e6)}")
+            for child in reversed(node.children.values()):
+                pending.append((child, f"{path};{child.label}"))
+        return lines
+
+def format_site(site: tuple[int, int] | None) -> str:
+    return f"{site[0]}:{site[1]}" if site is not None else "<builtin>"
+
+# The profiler recording calls, if profiling
+active: Profiler | None = None
+
+def start() -> Profiler:
+    """
+    Start profiling the programs evaluated from now on.
+    """
+    global active
+    active = Profiler()
+    return active
+
+def stop() -> Profiler | None:
+    """
+    Stop profiling and return the profiler with the recorded calls.
+    """
+    global active
+    profiler, active = active, None
+    return profiler
@@ -0,0 +1,149 @@
+from .ast import AtomicNode, BinaryNode, BlockNode, BreakNode, ContinueNode, ForNode, IfNode, LambdaNode, ListNode, MapNode, Node, ProgramNode, SliceNode, TupleNode, UnaryNode, WhileNode
+from .environment import Scope
+from .evaluator import is_identifier
+
+def is_function_declaration(expression: Node) -> bool:
+    return (isinstance(expression, BinaryNode) and expression.operator == "ASSIGNMENT"
+            and isinstance(expression.left, BinaryNode) and expression.left.operator == "CALL"
+            and is_identifier(expression.left.left) and isinstance(expression.left.right, TupleNode)
+            and all(is_identifier(a) for a in expression.left.right.elements))
+
+def children(expression: Node) -> list[Node]:
+    """
+    Get the sub-expressions of a node that are evaluated in the same scope as the node itself.
+    """
+    if isinstance(expression, (TupleNode, ListNode)):
+        return expression.elements
+    elif isinstance(expression, MapNode):
+        return list(expression.pairs.values()) # Keys are never variables
+    elif isinstance(expression, IfNode):
+        nodes = [expression.condition, expression.ifBody]
+        for cond, body in expression.elseIfs:
+            nodes += [cond, body]
+        if expression.elseBody is not None:
+            nodes.append(expression.elseBody)
+        return nodes
+    elif isinstance(expression, UnaryNode):
+        return [expression.rhs]
+    elif isinstance(expression, SliceNode):
+        return [e for e in [expression.start, expression.end, expression.step] if e is not None]
+    elif isinstance(expression, WhileNode):
+        return [expression.condition, expression.body]
+    elif isinstance(expression, ForNode):
+        return expression.variables + [expression.iterable, expression.body]
+    elif isinstance(expression, BlockNode) and not expression.scoped:
+        return expression.expressions
+    elif isinstance(expression, BinaryNode):
+        if is_function_declaration(expression):
+            return [] # The body is a scope of its own
+        if expression.operator == "DOT":
+            return [expression.left] # The right hand side is a member name
+        return [expression.left, expression.right]
+    return []
+
+class Resolver():
+    """
+    Resolves the variables of a program to the slots of their scopes.
+    Every function and block gets a scope declaring the parameters and variables assigned in it,
+    and every identifier is given the depth and slot of the closest scope declaring it.
+    Identifiers not declared by any enclosing scope are globals and are left unresolved.
+    """
+    def __init__(self):
+        self.scopes: list[Scope] = [] # Innermost scope last
+
+    def lookup(self, name: str) -> tuple[int, int] | None:
+        for depth, scope in enumerate(reversed(self.scopes)):
+            if name in scope.slots:
+                return (depth, scope.slots[name])
+        return None
+
+    def declare(self, expression: Node, scope: Scope):
+        """
+        Declare all variables assigned by an expression in the given scope.
+        """
+        if isinstance(expression, BinaryNode):
+            if is_function_declaration(expression):
+                scope.declare(expression.left.left.value)
+            elif expression.operator in ["ASSIGNMENT", "PLUSEQUAL"] and is_identifier(expression.left):
+                scope.declare(expression.left.value)
+        elif isinstance(expression, ForNode):
+            for variable in expression.variables:
+                scope.declare(variable.value)
+        elif isinstance(expression, LambdaNode) or (isinstance(expression, BlockNode) and expression.scoped):
+            return
+        for e in children(expression):
+            self.declare(e, scope)
+
+    def resolve_scope(self, scope: Scope, params: list[str], expressions: list[Node]) -> Scope:
+        for param in params:
+            scope.declare(param)
+        for e in expressions:
+            self.declare(e, scope)
+        self.scopes.append(scope)
+        for e in expressions:
+            self.resolve(e)
+        self.scopes.pop()
+        return scope
+
+    def resolve(self, expression: Node):
+        if is_identifier(expression):
+            expression.address = self.lookup(expression.value)
+        elif isinstance(expression, BlockNode) and expression.scoped:
+            expression.scope = self.resolve_scope(Scope("<block>"), [], expression.expressions)
+        elif isinstance(expression, LambdaNode):
+            expression.scope = self.resolve_scope(Scope("<lambda>"), expression.params, [expression.body])
+        elif is_function_declaration(expression):
+            name = expression.left.left
+            self.resolve(name)
+            params = [a.value for a in expression.left.right.elements]
+            expression.scope = self.resolve_scope(Scope(name.value), params, [expression.right])
+        for e in children(expression):
+            self.resolve(e)
+
+def resolve_loop_control(expression: Node, control = False) -> bool:
+    """
+    Check that `break` and `continue` are only used where they can leave a loop body:
+    the body itself, and the expressions of blocks and branches of ifs in control position.
+    Returns whether evaluating the expression may break or continue the enclosing loop,
+    and marks the blocks that may, so that they stop evaluating their expressions early.
+    """
+    if isinstance(expression, (BreakNode, ContinueNode)):
+        if not control:
+            raise Exception(f"'{expression.name.lower()}' can only be used in the body of a loop")
+        return True
+    elif isinstance(expression, (WhileNode, ForNode)):
+        for e in children(expression)[:-1]:
+            resolve_loop_control(e)
+        resolve_loop_control(expression.body, True)
+        return False
+    elif isinstance(expression, BlockNode):
+        expression.breaks = any([resolve_loop_control(e, control) for e in expression.expressions])
+        return expression.breaks
+    elif isinstance(expression, IfNode):
+        breaks = resolve_loop_control(expression.ifBody, control)
+        resolve_loop_control(expression.condition)
+        for cond, body in expression.elseIfs:
+            resolve_loop_control(cond)
+            breaks |= resolve_loop_control(body, control)
+        if expression.elseBody is not None:
+            breaks |= resolve_loop_control(expression.elseBody, control)
+        return breaks
+    elif isinstance(expression, LambdaNode):
+        resolve_loop_control(expression.body)
+    elif is_function_declaration(expression):
+        resolve_loop_control(expression.right)
+    for e in children(expression):
+        resolve_loop_control(e)
+    return False
+
+def resolve_program(program: ProgramNode) -> ProgramNode:
+    """
+    Resolve the variables of all expressions in a program.
+    The program itself is evaluated in the global environment,
+    so its variables are accessed by name.
+    """
+    resolver = Resolver()
+    for e in program.expressions:
+        resolve_loop_control(e)
+        resolver.resolve(e)
+    return program
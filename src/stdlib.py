@@ -1,18 +1,14 @@
-import datetime
-import json
 import math
 import os
-import random
-import socket
-import subprocess
 import sys
 import time
+from collections import OrderedDict
 from typing import Callable
 
-from .evaluator import evaluate_call
+from .evaluator import check_map_key, evaluate_call
 
 from .environment import Environment
-from .atoms import Atom, BuiltinFunctionAtom, Atom, IntrinsicAtom, ValueAtom
+from .atoms import UNIT, Atom, BuiltinFunctionAtom, Atom, FunctionAtom, IntrinsicAtom, Range, StringBuilder, ValueAtom, bool_atom, bytes_buffer, bytes_slice, number_atom
 
 # Helper functions
 def addBuiltin(name, func: Callable[[list[Atom]], Atom], env: Environment):
@@ -26,6 +22,61 @@ def expect_args(args: list[Atom], expected: list[int], name: str):
                         else expected[0])
         raise Exception(f"Function '{name}' expected {expected_str} arguments but got {len(args)}!")
 
+def bytes_of(atom: Atom, name: str, encoding = "utf-8"):
+    """
+    Get the binary data of a bytes value, of a list of byte values or of an encoded string,
+    without copying bytes.
+    """
+    if atom.type == "bytes":
+        return atom.value
+    elif atom.type == "string":
+        return atom.value.encode(encoding)
+    elif atom.type == "list":
+        try:
+            return bytes(e.value for e in atom.value)
+        except (TypeError, ValueError):
+            raise Exception(f"Function '{name}' expected a list of numbers from 0 to 255!")
+    raise Exception(f"Function '{name}' expected bytes, a string or a list but got '{atom.type}'!")
+
+def json_atom(value) -> Atom:
+    """
+    Get the atom of a decoded JSON value.
+    """
+    if isinstance(value, dict):
+        return ValueAtom("map", {ValueAtom("string", k): json_atom(v) for k, v in value.items()})
+    elif isinstance(value, list):
+        return ValueAtom("list", [json_atom(e) for e in value])
+    elif isinstance(value, str):
+        return ValueAtom("string", value)
+    elif isinstance(value, bool):
+        return bool_atom(value)
+    elif isinstance(value, (int, float)):
+        return number_atom(value)
+    return UNIT
+
+def set_atom(elements) -> ValueAtom:
+    """
+    Create a set of the given atoms, which must be immutable.
+    """
+    try:
+        return ValueAtom("set", dict.fromkeys(elements))
+    except TypeError as error:
+        raise Exception(f"Only immutable values can be members of a set ({error})!")
+
+def set_has(members: dict, atom: Atom) -> bool:
+    """
+    Check if a set has a member, or a map a key, by its hash.
+    """
+    try:
+        return atom in members
+    except TypeError:
+        return False # Mutable values are never members
+
+def expect_set(args: list[Atom], index: int, name: str) -> dict:
+    if args[index].type != "set":
+        raise Exception(f"Function '{name}' expected a set as argument {index + 1} but got '{args[index].type}'!")
+    return args[index].value
+
 def init_util(env: Environment):
     """
     Initialize utility functions.
@@ -38,7 +89,7 @@ def init_util(env: Environment):
         expect_args(args, [1, 2], "assert")
         if not args[0].value:
             raise Exception(args[1].raw_str())
-        return ValueAtom("unit", None)
+        return UNIT
     addBuiltin("exit", _exit, env)
     addBuiltin("assert", _assert, env)
 
@@ -49,7 +100,7 @@ def init_io(env: Environment):
     def _print(args: list[Atom]) -> Atom:
         args = map(lambda a: a.raw_str(), args)
         print(*args)
-        return ValueAtom("unit", None)
+        return UNIT
     def _input(args: list[Atom]) -> Atom:
         expect_args(args, [0, 1], "input")
         prompt = args[0].raw_str() if len(args) == 1 else ""
@@ -61,12 +112,14 @@ def init_sys(env: Environment):
     """
     Initialize system OS functions.
     """
+    import datetime
+    import subprocess
     def _system_run(args: list[Atom]) -> Atom:
         expect_args(args, [1, 2], "system_run")
         cmd = args[0].raw_str()
         shell = args[1].value if len(args) == 2 else True
         subprocess.call(cmd, shell=shell)
-        return ValueAtom("unit", None)
+        return UNIT
     def _system_output(args: list[Atom]) -> Atom:
         expect_args(args, [1, 2], "system_output")
         cmd = args[0].raw_str()
@@ -74,31 +127,31 @@ def init_sys(env: Environment):
         return ValueAtom("string", subprocess.check_output(cmd, shell=shell).decode("utf-8"))
     def _system_get_envs(args: list[Atom]) -> Atom:
         expect_args(args, [0], "system_get_envs")
-        return ValueAtom("map", dict(os.environ))
+        return ValueAtom("map", {ValueAtom("string", k): ValueAtom("string", v) for k, v in os.environ.items()})
     def _system_get_env(args: list[Atom]) -> Atom:
         expect_args(args, [1], "system_get_env")
         return ValueAtom("string", os.environ[args[0].raw_str()])
     def _system_set_env(args: list[Atom]) -> Atom:
         expect_args(args, [2], "system_set_env")
         os.environ[args[0].raw_str()] = args[1].raw_str()
-        return ValueAtom("unit", None)
+        return UNIT
     def _system_get_cwd(args: list[Atom]) -> Atom:
         expect_args(args, [0], "system_get_cwd")
         return ValueAtom("string", os.getcwd())
     def _system_set_cwd(args: list[Atom]) -> Atom:
         expect_args(args, [1], "system_set_cwd")
         os.chdir(args[0].raw_str())
-        return ValueAtom("unit", None)
+        return UNIT
     def _system_args(args: list[Atom]) -> Atom:
         expect_args(args, [0], "system_args")
         if "--" in sys.argv: return ValueAtom("list", sys.argv[sys.argv.index("--") + 1:])
         return ValueAtom("list", [])
     def _system_pid(args: list[Atom]) -> Atom:
         expect_args(args, [0], "system_get_pid")
-        return ValueAtom("number", os.getpid())
+        return number_atom(os.getpid())
     def _system_ppid(args: list[Atom]) -> Atom:
         expect_args(args, [0], "system_get_ppid")
-        return ValueAtom("number", os.getppid())
+        return number_atom(os.getppid())
     def _system_platform(args: list[Atom]) -> Atom:
         expect_args(args, [0], "system_get_platform")
         return ValueAtom("string", os.name)
@@ -110,45 +163,45 @@ def init_sys(env: Environment):
         return ValueAtom("string", os.uname().nodename)
     def _system_time_s(args: list[Atom]) -> Atom:
         expect_args(args, [0], "system_get_time_sec")
-        return ValueAtom("number", time.time())
+        return number_atom(time.time())
     def _system_time_ms(args: list[Atom]) -> Atom:
         expect_args(args, [0], "system_get_time_ms")
-        return ValueAtom("number", time.time() * 1000)
+        return number_atom(time.time() * 1000)
     def _system_time_us(args: list[Atom]) -> Atom:
         expect_args(args, [0], "system_get_time_us")
-        return ValueAtom("number", time.time() * 1000000)
+        return number_atom(time.time() * 1000000)
     def _system_time_ns(args: list[Atom]) -> Atom:
         expect_args(args, [0], "system_get_time_ns")
-        return ValueAtom("number", time.time() * 1000000000)
+        return number_atom(time.time() * 1000000000)
     def _system_time_min(args: list[Atom]) -> Atom:
         expect_args(args, [0], "system_get_time_min")
-        return ValueAtom("number", time.time() / 60)
+        return number_atom(time.time() / 60)
     def _system_time_hour(args: list[Atom]) -> Atom:
         expect_args(args, [0], "system_get_time_hour")
-        return ValueAtom("number", time.time() / 3600)
+        return number_atom(time.time() / 3600)
     def _system_time_day(args: list[Atom]) -> Atom:
         expect_args(args, [0], "system_get_time_day")
-        return ValueAtom("number", datetime.datetime.now().day)
+        return number_atom(datetime.datetime.now().day)
     def _system_time_month(args: list[Atom]) -> Atom:
         expect_args(args, [0], "system_get_time_month")
-        return ValueAtom("number", datetime.datetime.now().month)
+        return number_atom(datetime.datetime.now().month)
     def _system_time_week(args: list[Atom]) -> Atom:
         expect_args(args, [0], "system_get_time_week")
-        return ValueAtom("number", datetime.datetime.now().isocalendar()[1])
+        return number_atom(datetime.datetime.now().isocalendar()[1])
     def _system_time_year(args: list[Atom]) -> Atom:
         expect_args(args, [0], "system_get_time_year")
-        return ValueAtom("number", datetime.datetime.now().year)
+        return number_atom(datetime.datetime.now().year)
     def _system_time_weekday(args: list[Atom]) -> Atom:
         expect_args(args, [0], "system_get_time_weekday")
-        return ValueAtom("number", datetime.datetime.now().weekday())
+        return number_atom(datetime.datetime.now().weekday())
     def _system_sleep_s(args: list[Atom]) -> Atom:
         expect_args(args, [1], "system_sleep")
         time.sleep(args[0].value)
-        return ValueAtom("unit", None)
+        return UNIT
     def _system_sleep_ms(args: list[Atom]) -> Atom:
         expect_args(args, [1], "system_sleep")
         time.sleep(args[0].value / 1000)
-        return ValueAtom("unit", None)
+        return UNIT
     
     addBuiltin("system_run", _system_run, env)
     addBuiltin("system_output", _system_output, env)
@@ -181,20 +234,22 @@ def init_fs(env: Environment):
     """
     Initialize file system functions.
     """
+    import mmap
+    from .lineindex import open_index
     def _dir_create(args: list[Atom]) -> Atom:
         expect_args(args, [1], "dir_create")
         path = args[0].raw_str()
         os.mkdir(path)
-        return ValueAtom("unit", None)
+        return UNIT
     def _dir_remove(args: list[Atom]) -> Atom:
         expect_args(args, [1], "dir_remove")
         path = args[0].raw_str()
         os.rmdir(path)
-        return ValueAtom("unit", None)
+        return UNIT
     def _dir_exists(args: list[Atom]) -> Atom:
         expect_args(args, [1], "dir_exists")
         path = args[0].raw_str()
-        return ValueAtom("bool", os.path.exists(path) and os.path.isdir(path))
+        return bool_atom(os.path.exists(path) and os.path.isdir(path))
     def _dir_files(args: list[Atom]) -> Atom:
         expect_args(args, [1], "dir_files")
         path = args[0].raw_str()
@@ -203,16 +258,16 @@ def init_fs(env: Environment):
         expect_args(args, [1], "file_create")
         path = args[0].raw_str()
         open(path, 'w').close()
-        return ValueAtom("unit", None)
+        return UNIT
     def _file_remove(args: list[Atom]) -> Atom:
         expect_args(args, [1], "file_remove")
         path = args[0].raw_str()
         os.remove(path)
-        return ValueAtom("unit", None)
+        return UNIT
     def _file_exists(args: list[Atom]) -> Atom:
         expect_args(args, [1], "file_exists")
         path = args[0].raw_str()
-        return ValueAtom("bool", os.path.exists(path) and os.path.isfile(path))
+        return bool_atom(os.path.exists(path) and os.path.isfile(path))
     def _file_read_all(args: list[Atom]) -> Atom:
         expect_args(args, [1], "file_read_all")
         path = args[0].raw_str()
@@ -221,26 +276,107 @@ def init_fs(env: Environment):
     def _file_read_lines(args: list[Atom]) -> Atom:
         expect_args(args, [1], "file_read_lines")
         path = args[0].raw_str()
-        with open(path, 'r') as f:
-            return ValueAtom("list", f.readlines())
+        return ValueAtom("list", list(lines(open(path, 'r'), True))) # Without line endings, like `file_lines`
+    def _file_read_bytes(args: list[Atom]) -> Atom:
+        expect_args(args, [1], "file_read_bytes")
+        path = args[0].raw_str()
+        with open(path, 'rb') as f:
+            return ValueAtom("bytes", f.read())
     def _file_write(args: list[Atom]) -> Atom:
         expect_args(args, [2], "file_write")
+        if args[0].type == "file":
+            # Writes to an open file are buffered until it is closed
+            f = args[0].value
+            f.write(bytes_of(args[1], "file_write") if "b" in f.mode else args[1].raw_str())
+            return UNIT
         path = args[0].raw_str()
+        if args[1].type == "bytes":
+            with open(path, 'wb') as f:
+                f.write(args[1].value)
+                return UNIT
         data = args[1].raw_str()
         with open(path, 'w') as f:
             f.write(data)
-            return ValueAtom("unit", None)
+            return UNIT
     def _file_append(args: list[Atom]) -> Atom:
         expect_args(args, [2], "file_append")
         path = args[0].raw_str()
+        if args[1].type == "bytes":
+            with open(path, 'ab') as f:
+                f.write(args[1].value)
+                return UNIT
         data = args[1].raw_str()
         with open(path, 'a') as f:
             f.write(data)
-            return ValueAtom("unit", None)
+            return UNIT
+    # Open files, read and written in parts
+    def expect_file(args: list[Atom], name: str):
+        if args[0].type != "file":
+            raise Exception(f"Function '{name}' expected an open file as first argument but got '{args[0].type}'!")
+        return args[0].value
+    def lines(f, close: bool):
+        """
+        Yield the lines of a file without their line endings, closing it at the end if it was opened for them.
+        """
+        try:
+            for line in f:
+                yield ValueAtom("string", line.rstrip("\r\n"))
+        finally:
+            if close: f.close()
+    def _file_open(args: list[Atom]) -> Atom:
+        expect_args(args, [1, 2], "file_open")
+        path = args[0].raw_str()
+        mode = args[1].raw_str() if len(args) == 2 else "r"
+        if mode not in ["r", "w", "a", "rb", "wb", "ab"]:
+            raise Exception(f"Function 'file_open' expected a mode of r, w, a, rb, wb or ab but got '{mode}'!")
+        return IntrinsicAtom("file", open(path, mode))
+    def _file_close(args: list[Atom]) -> Atom:
+        expect_args(args, [1], "file_close")
+        expect_file(args, "file_close").close()
+        return UNIT
+    def _file_lines(args: list[Atom]) -> Atom:
+        expect_args(args, [1], "file_lines")
+        if args[0].type == "file":
+            return ValueAtom("iterator", lines(args[0].value, False))
+        return ValueAtom("iterator", lines(open(args[0].raw_str(), 'r'), True))
+    def _file_read_chunk(args: list[Atom]) -> Atom:
+        expect_args(args, [2], "file_read_chunk")
+        f = expect_file(args, "file_read_chunk")
+        data = f.read(args[1].value)
+        return ValueAtom("bytes" if isinstance(data, bytes) else "string", data)
+    def _file_mmap(args: list[Atom]) -> Atom:
+        expect_args(args, [1], "file_mmap")
+        path = args[0].raw_str()
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return ValueAtom("bytes", b"") # Empty files can not be mapped
+            # The map stays valid after the file is closed, and is unmapped once no value views it
+            return ValueAtom("bytes", memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)))
+    # Line indexes, to read any line of a large file without scanning it
+    def expect_index(args: list[Atom], name: str):
+        if args[0].type != "line_index":
+            raise Exception(f"Function '{name}' expected a line index as first argument but got '{args[0].type}'!")
+        return args[0].value
+    def _file_index(args: list[Atom]) -> Atom:
+        expect_args(args, [1, 2], "file_index")
+        persist = len(args) == 2 and args[1].value == True
+        return IntrinsicAtom("line_index", open_index(args[0].raw_str(), persist))
+    def _file_line(args: list[Atom]) -> Atom:
+        expect_args(args, [2], "file_line")
+        return ValueAtom("string", expect_index(args, "file_line").line(args[1].value))
+    def _file_lines_range(args: list[Atom]) -> Atom:
+        expect_args(args, [3], "file_lines_range")
+        lines = expect_index(args, "file_lines_range").lines(args[1].value, args[2].value)
+        return ValueAtom("list", [ValueAtom("string", line) for line in lines])
+    def _file_line_count(args: list[Atom]) -> Atom:
+        expect_args(args, [1], "file_line_count")
+        index = expect_index(args, "file_line_count")
+        index.refresh()
+        return number_atom(len(index))
     def _file_size(args: list[Atom]) -> Atom:
         expect_args(args, [1], "file_size")
         path = args[0].raw_str()
-        return ValueAtom("number", os.path.getsize(path))
+        return number_atom(os.path.getsize(path))
     addBuiltin("dir_create", _dir_create, env)
     addBuiltin("dir_remove", _dir_remove, env)
     addBuiltin("dir_exists", _dir_exists, env)
@@ -250,18 +386,31 @@ def init_fs(env: Environment):
     addBuiltin("file_exists", _file_exists, env)
     addBuiltin("file_read_all", _file_read_all, env)
     addBuiltin("file_read_lines", _file_read_lines, env)
+    addBuiltin("file_read_bytes", _file_read_bytes, env)
     addBuiltin("file_write", _file_write, env)
     addBuiltin("file_append", _file_append, env)
     addBuiltin("file_size", _file_size, env)
+    addBuiltin("file_open", _file_open, env)
+    addBuiltin("file_close", _file_close, env)
+    addBuiltin("file_lines", _file_lines, env)
+    addBuiltin("file_read_chunk", _file_read_chunk, env)
+    addBuiltin("file_mmap", _file_mmap, env)
+    addBuiltin("file_index", _file_index, env)
+    addBuiltin("file_line", _file_line, env)
+    addBuiltin("file_lines_range", _file_lines_range, env)
+    addBuiltin("file_line_count", _file_line_count, env)
 
 def init_net(env: Environment):
     """
     Initialize network functions.
     """
+    import json
+    import socket
+    import subprocess
     def _net_ping(args: list[Atom]) -> Atom:
         expect_args(args, [1], "net_ping")
         host = args[0].raw_str()
-        return ValueAtom("bool", os.system(f"ping -c 1 {host}") == 0)
+        return bool_atom(os.system(f"ping -c 1 {host}") == 0)
     def _net_public_ip(args: list[Atom]) -> Atom:
         expect_args(args, [0], "net_get_public_ip")
         return ValueAtom("string", subprocess.check_output("curl -s https://ipinfo.io/ip", shell=True).decode("utf-8").strip())
@@ -270,9 +419,21 @@ def init_net(env: Environment):
         info_json = subprocess.check_output(f"curl -s https://ipinfo.io/{args[0].raw_str()}/json", shell=True).decode("utf-8").strip()
         info_result = json.loads(info_json)
         if isinstance(info_result, dict):
-            return ValueAtom("map", info_result)
-        return ValueAtom("unit", None)
+            return json_atom(info_result)
+        return UNIT
     # TCP Sockets
+    def recv_until(sock: socket.socket, delimiter: bytes) -> bytes:
+        """
+        Receive from a socket until the data ends with the delimiter or the connection is closed.
+        Reads one byte at a time so that no data after the delimiter is consumed.
+        """
+        data = bytearray()
+        while not data.endswith(delimiter):
+            byte = sock.recv(1)
+            if len(byte) == 0:
+                break
+            data += byte
+        return bytes(data)
     def _net_tcp_socket(args: list[Atom]) -> Atom:
         expect_args(args, [0], "net_tcp_socket")
         return IntrinsicAtom("socket_tcp", socket.socket(socket.AF_INET, socket.SOCK_STREAM))
@@ -284,69 +445,68 @@ def init_net(env: Environment):
         host = args[1].raw_str()
         port = args[2].value
         sock.connect((host, port))
-        return ValueAtom("unit", None)
+        return UNIT
     def _net_tcp_send(args: list[Atom]) -> Atom:
         expect_args(args, [2], "net_tcp_send")
         if args[0].type != "socket_tcp":
             raise Exception(f"Function 'net_tcp_send' expected a socket as first argument but got '{args[0].type}'!")
         sock = args[0].value
-        data = args[1]
-        if data.type == "string":
-            sock.send(data.value.encode("utf-8"))
-        elif data.type == "list":
-            sock.send(bytes(map(lambda a: a.value, data.value)))
-        else:
-            raise Exception(f"Function 'net_tcp_send' expected a string or list as second argument but got '{data.type}'!")
-        return ValueAtom("unit", None)
+        sock.sendall(bytes_of(args[1], "net_tcp_send"))
+        return UNIT
     def _net_tcp_recv(args: list[Atom]) -> Atom:
-        expect_args(args, [1], "net_tcp_recv")
+        expect_args(args, [2], "net_tcp_recv")
         if args[0].type != "socket_tcp":
             raise Exception(f"Function 'net_tcp_recv' expected a socket as first argument but got '{args[0].type}'!")
         sock: socket.socket = args[0].value
         size = args[1].value
-        data = list(sock.recv(size))
-        return ValueAtom("list", list(map(lambda b: ValueAtom("number", b), data)))
+        return ValueAtom("bytes", sock.recv(size))
     def _net_tcp_recv_all(args: list[Atom]) -> Atom:
-        expect_args(args, [1], "net_tcp_recv_all")
+        expect_args(args, [2], "net_tcp_recv_all")
         if args[0].type != "socket_tcp":
             raise Exception(f"Function 'net_tcp_recv_all' expected a socket as first argument but got '{args[0].type}'!")
-        sock = args[0].value
+        sock: socket.socket = args[0].value
         size = args[1].value
-        data = list(sock.recv(size))
-        while len(data) < size:
-            data += list(sock.recv(size - len(data)))
-        return ValueAtom("list", list(map(lambda b: ValueAtom("number", b), data)))
+        data = bytearray(size)
+        view = memoryview(data)
+        received = 0
+        while received < size:
+            n = sock.recv_into(view[received:])
+            if n == 0:
+                break # The connection was closed
+            received += n
+        return ValueAtom("bytes", bytes(view[:received]))
     def _net_tcp_recv_until(args: list[Atom]) -> Atom:
         expect_args(args, [2], "net_tcp_recv_until")
         if args[0].type != "socket_tcp":
             raise Exception(f"Function 'net_tcp_recv_until' expected a socket as first argument but got '{args[0].type}'!")
-        sock = args[0].value
-        delimiter = args[1].raw_str()
-        data = list(sock.recv_until(delimiter))
-        return ValueAtom("list", list(map(lambda b: ValueAtom("number", b), data)))
+        return ValueAtom("bytes", recv_until(args[0].value, bytes_of(args[1], "net_tcp_recv_until")))
     def _net_tcp_recv_line(args: list[Atom]) -> Atom:
         expect_args(args, [1], "net_tcp_recv_line")
         if args[0].type != "socket_tcp":
             raise Exception(f"Function 'net_tcp_recv_line' expected a socket as first argument but got '{args[0].type}'!")
-        sock = args[0].value
-        data = list(sock.recv_line())
-        return ValueAtom("list", list(map(lambda b: ValueAtom("number", b), data)))
+        return ValueAtom("bytes", recv_until(args[0].value, b"\n"))
     def _net_tcp_close(args: list[Atom]) -> Atom:
         expect_args(args, [1], "net_tcp_close")
         if args[0].type != "socket_tcp":
             raise Exception(f"Function 'net_tcp_close' expected a socket as first argument but got '{args[0].type}'!")
         sock = args[0].value
         sock.close()
-        return ValueAtom("unit", None)
+        return UNIT
     def _net_tcp_bind(args: list[Atom]) -> Atom:
-        expect_args(args, [2], "net_tcp_bind")
+        expect_args(args, [2, 3], "net_tcp_bind")
         if args[0].type != "socket_tcp":
-            raise Exception(f"Function 'net_tcp_accept' expected a socket as first argument but got '{args[0].type}'!")
+            raise Exception(f"Function 'net_tcp_bind' expected a socket as first argument but got '{args[0].type}'!")
         sock: socket.socket = args[0].value
         port = args[1].value
-        sock.bind((socket.gethostname(), port))
+        host = args[2].raw_str() if len(args) == 3 else socket.gethostname()
+        sock.bind((host, port))
         sock.listen()
-        return ValueAtom("unit", None)
+        return UNIT
+    def _net_tcp_port(args: list[Atom]) -> Atom:
+        expect_args(args, [1], "net_tcp_port")
+        if args[0].type != "socket_tcp":
+            raise Exception(f"Function 'net_tcp_port' expected a socket as first argument but got '{args[0].type}'!")
+        return number_atom(args[0].value.getsockname()[1])
     def _net_tcp_accept(args: list[Atom]) -> Atom:
         expect_args(args, [1], "net_tcp_accept")
         if args[0].type != "socket_tcp":
@@ -367,40 +527,35 @@ def init_net(env: Environment):
     addBuiltin("net_tcp_recv_line", _net_tcp_recv_line, env)
     addBuiltin("net_tcp_close", _net_tcp_close, env)
     addBuiltin("net_tcp_bind", _net_tcp_bind, env)
+    addBuiltin("net_tcp_port", _net_tcp_port, env)
     addBuiltin("net_tcp_accept", _net_tcp_accept, env)
 
 def init_encoding(env: Environment):
     """
     Initialize text encoding functions.
     """
+    import base64
+    import codecs
     def _enc_utf8(args: list[Atom]) -> Atom:
         expect_args(args, [1], "enc_utf8")
-        if args[0].type != "list":
-            raise Exception(f"Function 'enc_utf8' expected a list as first argument but got '{args[0].type}'!")
-        if args[0].value.any(lambda a: a.type != "number"):
-            raise Exception(f"Function 'enc_utf8' expected a list of numbers as first argument but got a list of '{args[0].value[0].type}'!")
-        data = bytes(map(lambda a: a.value, args[0].value))
-        return ValueAtom("string", data.decode("utf-8"))
+        if args[0].type not in ["bytes", "list"]:
+            raise Exception(f"Function 'enc_utf8' expected bytes or a list as first argument but got '{args[0].type}'!")
+        return ValueAtom("string", codecs.decode(bytes_of(args[0], "enc_utf8"), "utf-8"))
     def _dec_utf8(args: list[Atom]) -> Atom:
         expect_args(args, [1], "dec_utf8")
         if args[0].type != "string":
             raise Exception(f"Function 'dec_utf8' expected a string as first argument but got '{args[0].type}'!")
-        data = args[0].value.encode("utf-8")
-        return ValueAtom("list", list(map(lambda b: ValueAtom("number", b), data)))
+        return ValueAtom("bytes", args[0].value.encode("utf-8"))
     def _enc_base64(args: list[Atom]) -> Atom:
         expect_args(args, [1], "enc_base64")
-        if args[0].type != "list":
-            raise Exception(f"Function 'enc_base64' expected a list as first argument but got '{args[0].type}'!")
-        if args[0].value.any(lambda a: a.type != "number"):
-            raise Exception(f"Function 'enc_base64' expected a list of numbers as first argument but got a list of '{args[0].value[0].type}'!")
-        data = bytes(map(lambda a: a.value, args[0].value))
-        return ValueAtom("string", data.decode("base64"))
+        if args[0].type not in ["bytes", "list"]:
+            raise Exception(f"Function 'enc_base64' expected bytes or a list as first argument but got '{args[0].type}'!")
+        return ValueAtom("string", base64.b64encode(bytes_of(args[0], "enc_base64")).decode("ascii"))
     def _dec_base64(args: list[Atom]) -> Atom:
         expect_args(args, [1], "dec_base64")
         if args[0].type != "string":
             raise Exception(f"Function 'dec_base64' expected a string as first argument but got '{args[0].type}'!")
-        data = args[0].value.encode("base64")
-        return ValueAtom("list", list(map(lambda b: ValueAtom("number", b), data)))
+        return ValueAtom("bytes", base64.b64decode(args[0].value))
     addBuiltin("enc_utf8", _enc_utf8, env)
     addBuiltin("dec_utf8", _dec_utf8, env)
     addBuiltin("enc_base64", _enc_base64, env)
@@ -416,36 +571,44 @@ def init_conv(env: Environment):
     def _int(args: list[Atom]) -> Atom:
         expect_args(args, [1], "int")
         try:
-            return ValueAtom("number", int(args[0].raw_str()))
+            return number_atom(int(args[0].raw_str()))
         except ValueError:
-            return ValueAtom("unit", None)
+            return UNIT
     def _number(args: list[Atom]) -> Atom:
         expect_args(args, [1], "number")
         try:
-            return ValueAtom("number", float(args[0].raw_str()))
+            return number_atom(float(args[0].raw_str()))
         except ValueError:
-            return ValueAtom("unit", None)
+            return UNIT
     def _bool(args: list[Atom]) -> Atom:
         expect_args(args, [1], "bool")
-        return ValueAtom("bool", args[0].raw_str().lower() == "true")
+        return bool_atom(args[0].raw_str().lower() == "true")
     def _list(args: list[Atom]) -> Atom:
         expect_args(args, [1], "list")
         if args[0].type == "list":
             return args[0]
         elif args[0].type == "tuple":
-            return ValueAtom("list", args[0].value)
+            return ValueAtom("list", list(args[0].value)) # Copied, as tuples hash by their elements
+        elif args[0].type == "set":
+            return ValueAtom("list", list(args[0].value))
+        elif args[0].type == "bytes":
+            return ValueAtom("list", list(map(number_atom, args[0].value)))
+        elif args[0].type == "iterator":
+            return ValueAtom("list", list(args[0].value))
         elif args[0].type == "map":
             return ValueAtom("list", list(args[0].pairs.values()))
         elif args[0].type == "string":
             return ValueAtom("list", list(args[0].value))
-        return ValueAtom("unit", None)
+        return UNIT
     def _tuple(args: list[Atom]) -> Atom:
         expect_args(args, [1], "tuple")
         if args[0].type == "list":
-            return ValueAtom("tuple", args[0].value)
+            return ValueAtom("tuple", list(args[0].value)) # Copied, as tuples hash by their elements
         elif args[0].type == "tuple":
             return args[0]
-        return ValueAtom("unit", None)
+        elif args[0].type == "set":
+            return ValueAtom("tuple", list(args[0].value))
+        return UNIT
     def _map(args: list[Atom]) -> Atom:
         expect_args(args, [1], "map")
         if args[0].type == "map":
@@ -453,18 +616,32 @@ def init_conv(env: Environment):
         elif args[0].type == "list":
             # If it is a list of tuples, convert it to a map
             if all(e.type == "tuple" for e in args[0].value):
-                return ValueAtom("map", dict(map(lambda t: (t.value[0], t.value[1]), args[0].value)))
+                return ValueAtom("map", dict(map(lambda t: (check_map_key(t.value[0]), t.value[1]), args[0].value)))
             # If it is a list of values, convert it to a map with indices as keys
-            return ValueAtom("map", dict(map(lambda t: (ValueAtom("number", t[0]), t[1]), enumerate(args[0].value))))
+            return ValueAtom("map", dict(map(lambda t: (number_atom(t[0]), t[1]), enumerate(args[0].value))))
         elif args[0].type == "string":
             # Try to parse the string as JSON
+            import json
             try:
                 result = json.loads(args[0].value)
                 if isinstance(result, dict):
-                    return ValueAtom("map", result)
+                    return json_atom(result)
             except json.JSONDecodeError:
                 pass
-        return ValueAtom("unit", None)
+        return UNIT
+    def _bytes(args: list[Atom]) -> Atom:
+        expect_args(args, [1, 2], "bytes")
+        encoding = args[1].raw_str() if len(args) == 2 else "utf-8"
+        return ValueAtom("bytes", bytes(bytes_of(args[0], "bytes", encoding)))
+    def _set(args: list[Atom]) -> Atom:
+        expect_args(args, [0, 1], "set")
+        if len(args) == 0:
+            return set_atom([])
+        elif args[0].type in ["list", "tuple", "set"]:
+            return set_atom(list(args[0].value))
+        elif args[0].type == "string":
+            return set_atom([ValueAtom("string", c) for c in args[0].value])
+        return UNIT
     addBuiltin("str", _str, env)
     addBuiltin("int", _int, env)
     addBuiltin("number", _number, env)
@@ -472,6 +649,8 @@ def init_conv(env: Environment):
     addBuiltin("list", _list, env)
     addBuiltin("tuple", _tuple, env)
     addBuiltin("map", _map, env)
+    addBuiltin("set", _set, env)
+    addBuiltin("bytes", _bytes, env)
 
 def init_math(env: Environment):
     """
@@ -480,116 +659,116 @@ def init_math(env: Environment):
     def _range(args: list[Atom]) -> Atom:
         expect_args(args, [1, 2, 3], "range")
         if len(args) == 1:
-            return ValueAtom("list", list(range(args[0].value)))
+            return ValueAtom("list", Range(range(args[0].value)))
         elif len(args) == 2:
-            return ValueAtom("list", list(range(args[0].value, args[1].value)))
+            return ValueAtom("list", Range(range(args[0].value, args[1].value)))
         elif len(args) == 3:
-            return ValueAtom("list", list(range(args[0].value, args[1].value, args[2].value)))
-        return ValueAtom("unit", None)
+            return ValueAtom("list", Range(range(args[0].value, args[1].value, args[2].value)))
+        return UNIT
     def _abs(args: list[Atom]) -> Atom:
         expect_args(args, [1], "abs")
-        return ValueAtom("number", abs(args[0].value))
+        return number_atom(abs(args[0].value))
     def _ceil(args: list[Atom]) -> Atom:
         expect_args(args, [1], "ceil")
-        return ValueAtom("number", math.ceil(args[0].value))
+        return number_atom(math.ceil(args[0].value))
     def _floor(args: list[Atom]) -> Atom:
         expect_args(args, [1], "floor")
-        return ValueAtom("number", math.floor(args[0].value))
+        return number_atom(math.floor(args[0].value))
     def _round(args: list[Atom]) -> Atom:
         expect_args(args, [1], "round")
-        return ValueAtom("number", round(args[0].value))
+        return number_atom(round(args[0].value))
     def _min(args: list[Atom]) -> Atom:
         expect_args(args, [2], "min")
-        return ValueAtom("number", min(args[0].value, args[1].value))
+        return number_atom(min(args[0].value, args[1].value))
     def _max(args: list[Atom]) -> Atom:
         expect_args(args, [2], "max")
-        return ValueAtom("number", max(args[0].value, args[1].value))
+        return number_atom(max(args[0].value, args[1].value))
     def _sqrt(args: list[Atom]) -> Atom:
         expect_args(args, [1], "sqrt")
-        return ValueAtom("number", math.sqrt(args[0].value))
+        return number_atom(math.sqrt(args[0].value))
     def _pow(args: list[Atom]) -> Atom:
         expect_args(args, [2], "pow")
-        return ValueAtom("number", math.pow(args[0].value, args[1].value))
+        return number_atom(math.pow(args[0].value, args[1].value))
     def _sin(args: list[Atom]) -> Atom:
         expect_args(args, [1], "sin")
-        return ValueAtom("number", math.sin(args[0].value))
+        return number_atom(math.sin(args[0].value))
     def _cos(args: list[Atom]) -> Atom:
         expect_args(args, [1], "cos")
-        return ValueAtom("number", math.cos(args[0].value))
+        return number_atom(math.cos(args[0].value))
     def _tan(args: list[Atom]) -> Atom:
         expect_args(args, [1], "tan")
-        return ValueAtom("number", math.tan(args[0].value))
+        return number_atom(math.tan(args[0].value))
     def _asin(args: list[Atom]) -> Atom:
         expect_args(args, [1], "asin")
-        return ValueAtom("number", math.asin(args[0].value))
+        return number_atom(math.asin(args[0].value))
     def _acos(args: list[Atom]) -> Atom:
         expect_args(args, [1], "acos")
-        return ValueAtom("number", math.acos(args[0].value))
+        return number_atom(math.acos(args[0].value))
     def _atan(args: list[Atom]) -> Atom:
         expect_args(args, [1], "atan")
-        return ValueAtom("number", math.atan(args[0].value))
+        return number_atom(math.atan(args[0].value))
     def _atan2(args: list[Atom]) -> Atom:
         expect_args(args, [2], "atan2")
-        return ValueAtom("number", math.atan2(args[0].value, args[1].value))
+        return number_atom(math.atan2(args[0].value, args[1].value))
     def _log(args: list[Atom]) -> Atom:
         expect_args(args, [1], "log")
-        return ValueAtom("number", math.log(args[0].value))
+        return number_atom(math.log(args[0].value))
     def _log2(args: list[Atom]) -> Atom:
         expect_args(args, [1], "log2")
-        return ValueAtom("number", math.log2(args[0].value))
+        return number_atom(math.log2(args[0].value))
     def _log10(args: list[Atom]) -> Atom:
         expect_args(args, [1], "log10")
-        return ValueAtom("number", math.log10(args[0].value))
+        return number_atom(math.log10(args[0].value))
     def _exp(args: list[Atom]) -> Atom:
         expect_args(args, [1], "exp")
-        return ValueAtom("number", math.exp(args[0].value))
+        return number_atom(math.exp(args[0].value))
     def _exp2(args: list[Atom]) -> Atom:
         expect_args(args, [1], "exp2")
-        return ValueAtom("number", math.exp2(args[0].value))
+        return number_atom(math.exp2(args[0].value))
     def _exp10(args: list[Atom]) -> Atom:
         expect_args(args, [1], "exp10")
-        return ValueAtom("number", math.pow(10, args[0].value))
+        return number_atom(math.pow(10, args[0].value))
     def _expn(args: list[Atom]) -> Atom:
         expect_args(args, [2], "expn")
-        return ValueAtom("number", math.pow(args[0].value, args[1].value))
+        return number_atom(math.pow(args[0].value, args[1].value))
     def _deg2rad(args: list[Atom]) -> Atom:
         expect_args(args, [1], "rad")
-        return ValueAtom("number", math.radians(args[0].value))
+        return number_atom(math.radians(args[0].value))
     def _rad2deg(args: list[Atom]) -> Atom:
         expect_args(args, [1], "deg")
-        return ValueAtom("number", math.degrees(args[0].value))
+        return number_atom(math.degrees(args[0].value))
     def _hypot(args: list[Atom]) -> Atom:
         expect_args(args, [2], "hypot")
-        return ValueAtom("number", math.hypot(args[0].value, args[1].value))
+        return number_atom(math.hypot(args[0].value, args[1].value))
     def _gcd(args: list[Atom]) -> Atom:
         expect_args(args, [2], "gcd")
-        return ValueAtom("number", math.gcd(args[0].value, args[1].value))
+        return number_atom(math.gcd(args[0].value, args[1].value))
     def _lcm(args: list[Atom]) -> Atom:
         expect_args(args, [2], "lcm")
-        return ValueAtom("number", math.lcm(args[0].value, args[1].value))
+        return number_atom(math.lcm(args[0].value, args[1].value))
     def _factorial(args: list[Atom]) -> Atom:
         expect_args(args, [1], "factorial")
-        return ValueAtom("number", math.factorial(args[0].value))
+        return number_atom(math.factorial(args[0].value))
     def _is_nan(args: list[Atom]) -> Atom:
         expect_args(args, [1], "is_nan")
         if args[0].type == "number":
-            return ValueAtom("bool", math.isnan(args[0].value))
-        return ValueAtom("bool", False)
+            return bool_atom(math.isnan(args[0].value))
+        return bool_atom(False)
     def _is_inf(args: list[Atom]) -> Atom:
         expect_args(args, [1], "is_inf")
         if args[0].type == "number":
-            return ValueAtom("bool", math.isinf(args[0].value))
-        return ValueAtom("bool", False)
+            return bool_atom(math.isinf(args[0].value))
+        return bool_atom(False)
     def _is_finite(args: list[Atom]) -> Atom:
         expect_args(args, [1], "is_finite")
         if args[0].type == "number":
-            return ValueAtom("bool", math.isfinite(args[0].value))
-        return ValueAtom("bool", False)
+            return bool_atom(math.isfinite(args[0].value))
+        return bool_atom(False)
     def _is_integer(args: list[Atom]) -> Atom:
         expect_args(args, [1], "is_integer")
         if args[0].type == "number":
-            return ValueAtom("bool", args[0].value.is_integer())
-        return ValueAtom("bool", False)
+            return bool_atom(args[0].value.is_integer())
+        return bool_atom(False)
     addBuiltin("range", _range, env)
     addBuiltin("abs", _abs, env)
     addBuiltin("ceil", _ceil, env)
@@ -625,26 +804,30 @@ def init_math(env: Environment):
     addBuiltin("is_integer", _is_integer, env)
 
 def init_random(env: Environment):
+    """
+    Initialize random number functions.
+    """
+    import random
     def _random(args: list[Atom]) -> Atom:
         expect_args(args, [0], "random")
-        return ValueAtom("number", random.random())
+        return number_atom(random.random())
     def _random_int(args: list[Atom]) -> Atom:
         expect_args(args, [2], "random_int")
-        return ValueAtom("number", random.randint(args[0].value, args[1].value))
+        return number_atom(random.randint(args[0].value, args[1].value))
     def _random_range(args: list[Atom]) -> Atom:
         expect_args(args, [2], "random_range")
-        return ValueAtom("number", random.randint(args[0].value, args[1].value))
+        return number_atom(random.randint(args[0].value, args[1].value))
     def _random_choice(args: list[Atom]) -> Atom:
         expect_args(args, [1], "random_choice")
         return random.choice(args[0].value)
     def _random_shuffle(args: list[Atom]) -> Atom:
         expect_args(args, [1], "random_shuffle")
-        random.shuffle(args[0].value)
-        return ValueAtom("unit", None)
+        random.shuffle(args[0].mutable_list())
+        return UNIT
     def _random_seed(args: list[Atom]) -> Atom:
         expect_args(args, [1], "random_seed")
         random.seed(args[0].value)
-        return ValueAtom("unit", None)
+        return UNIT
     addBuiltin("random", _random, env)
     addBuiltin("random_int", _random_int, env)
     addBuiltin("random_range", _random_range, env)
@@ -661,7 +844,7 @@ def init_type(env: Environment):
         return ValueAtom("string", args[0].type)
     def _is_type(args: list[Atom]) -> Atom:
         expect_args(args, [2], "is_type")
-        return ValueAtom("bool", args[0].type == args[1].raw_str())
+        return bool_atom(args[0].type == args[1].raw_str())
     addBuiltin("typeof", _typeof, env)
     addBuiltin("is_type", _is_type, env)
 
@@ -692,22 +875,45 @@ def init_str(env: Environment):
         return ValueAtom("string", args[0].raw_str().lower())
     def _str_starts_with(args: list[Atom]) -> Atom:
         expect_args(args, [2], "str_starts_with")
-        return ValueAtom("bool", args[0].raw_str().startswith(args[1].raw_str()))
+        return bool_atom(args[0].raw_str().startswith(args[1].raw_str()))
     def _str_ends_with(args: list[Atom]) -> Atom:
         expect_args(args, [2], "str_ends_with")
-        return ValueAtom("bool", args[0].raw_str().endswith(args[1].raw_str()))
+        return bool_atom(args[0].raw_str().endswith(args[1].raw_str()))
     def _str_contains(args: list[Atom]) -> Atom:
         expect_args(args, [2], "str_contains")
-        return ValueAtom("bool", args[1].raw_str() in args[0].raw_str())
+        return bool_atom(args[1].raw_str() in args[0].raw_str())
     def _str_index_of(args: list[Atom]) -> Atom:
         expect_args(args, [2], "str_index_of")
-        return ValueAtom("number", args[0].raw_str().index(args[1].raw_str()))
+        return number_atom(args[0].raw_str().index(args[1].raw_str()))
     def _str_last_index_of(args: list[Atom]) -> Atom:
         expect_args(args, [2], "str_last_index_of")
-        return ValueAtom("number", args[0].raw_str().rindex(args[1].raw_str()))
+        return number_atom(args[0].raw_str().rindex(args[1].raw_str()))
     def _str_replace(args: list[Atom]) -> Atom:
         expect_args(args, [3], "str_replace")
         return ValueAtom("string", args[0].raw_str().replace(args[1].raw_str(), args[2].raw_str()))
+    def _str_join(args: list[Atom]) -> Atom:
+        expect_args(args, [1, 2], "str_join")
+        if args[0].type not in ["list", "tuple", "set"]:
+            raise Exception(f"Function 'str_join' expected a list as first argument but got '{args[0].type}'!")
+        separator = args[1].raw_str() if len(args) == 2 else ""
+        return ValueAtom("string", separator.join(e.raw_str() for e in args[0].value))
+    def _str_builder(args: list[Atom]) -> Atom:
+        expect_args(args, [0, 1], "str_builder")
+        builder = StringBuilder()
+        if len(args) == 1:
+            builder.append(args[0].raw_str())
+        return ValueAtom("builder", builder)
+    def _str_builder_append(args: list[Atom]) -> Atom:
+        if len(args) == 0 or args[0].type != "builder":
+            raise Exception(f"Function 'str_builder_append' expected a string builder as first argument!")
+        for value in args[1:]:
+            args[0].value.append(value.raw_str())
+        return args[0]
+    def _str_builder_size(args: list[Atom]) -> Atom:
+        expect_args(args, [1], "str_builder_size")
+        if args[0].type != "builder":
+            raise Exception(f"Function 'str_builder_size' expected a string builder but got '{args[0].type}'!")
+        return number_atom(len(args[0].value))
 
     addBuiltin("str_trim", _str_trim, env)
     addBuiltin("str_trim_start", _str_trim_start, env)
@@ -722,72 +928,103 @@ def init_str(env: Environment):
     addBuiltin("str_index_of", _str_index_of, env)
     addBuiltin("str_last_index_of", _str_last_index_of, env)
     addBuiltin("str_replace", _str_replace, env)
+    addBuiltin("str_join", _str_join, env)
+    addBuiltin("str_builder", _str_builder, env)
+    addBuiltin("str_builder_append", _str_builder_append, env)
+    addBuiltin("str_builder_size", _str_builder_size, env)
 
 def init_list(env: Environment):
     """
     Initialize list operations.
     """
+    from .parallel import parallel_map
+    def expect_not_iterator(args: list[Atom], name: str):
+        # Only functions reading their input once, such as mapping and filtering, take iterators
+        if args[0].type == "iterator":
+            raise Exception(f"Function '{name}' can not take an iterator, as it can only be read once. Use list(...) to read it into a list first!")
     def _list_append(args: list[Atom]) -> Atom:
         expect_args(args, [2], "list_append")
-        args[0].value.append(args[1])
-        return ValueAtom("unit", None)
+        expect_not_iterator(args, "list_append")
+        args[0].mutable_list().append(args[1])
+        return UNIT
     def _list_insert(args: list[Atom]) -> Atom:
         expect_args(args, [3], "list_insert")
-        args[0].value.insert(args[1].value, args[2])
-        return ValueAtom("unit", None)
+        expect_not_iterator(args, "list_insert")
+        args[0].mutable_list().insert(args[1].value, args[2])
+        return UNIT
     def _list_remove(args: list[Atom]) -> Atom:
         expect_args(args, [2], "list_remove")
-        args[0].value.remove(args[1])
-        return ValueAtom("unit", None)
+        expect_not_iterator(args, "list_remove")
+        args[0].mutable_list().remove(args[1])
+        return UNIT
     def _list_pop(args: list[Atom]) -> Atom:
         expect_args(args, [1], "list_pop")
-        return args[0].value.pop()
+        expect_not_iterator(args, "list_pop")
+        return args[0].mutable_list().pop()
     def _list_size(args: list[Atom]) -> Atom:
         expect_args(args, [1], "list_size")
-        return ValueAtom("number", len(args[0].value))
+        expect_not_iterator(args, "list_size")
+        return number_atom(len(args[0].value))
     def _list_contains(args: list[Atom]) -> Atom:
         expect_args(args, [2], "list_contains")
-        return ValueAtom("bool", args[1] in args[0].value)
+        expect_not_iterator(args, "list_contains")
+        if args[0].type == "set":
+            return bool_atom(set_has(args[0].value, args[1])) # Look up the member by its hash
+        return bool_atom(args[1] in args[0].value)
     def _list_index_of(args: list[Atom]) -> Atom:
         expect_args(args, [2], "list_index_of")
-        return ValueAtom("number", args[0].value.index(args[1]))
+        expect_not_iterator(args, "list_index_of")
+        return number_atom(args[0].value.index(args[1]))
     def _list_reverse(args: list[Atom]) -> Atom:
         expect_args(args, [1], "list_reverse")
-        args[0].value.reverse()
-        return ValueAtom("unit", None)
+        expect_not_iterator(args, "list_reverse")
+        args[0].mutable_list().reverse()
+        return UNIT
     def _list_split_at(args: list[Atom]) -> Atom:
         expect_args(args, [2], "list_split_at")
+        expect_not_iterator(args, "list_split_at")
         return ValueAtom("tuple", (args[0].value[:args[1].value], args[0].value[args[1].value:]))
     def _list_find(args: list[Atom]) -> Atom:
         expect_args(args, [2], "list_find")
-        return ValueAtom("number", args[0].value.index(args[1]))
+        expect_not_iterator(args, "list_find")
+        return number_atom(args[0].value.index(args[1]))
     def _list_find_last(args: list[Atom]) -> Atom:
         expect_args(args, [2], "list_find_last")
-        return ValueAtom("number", args[0].value[::-1].index(args[1]))
+        expect_not_iterator(args, "list_find_last")
+        return number_atom(args[0].value[::-1].index(args[1]))
     def _list_find_all(args: list[Atom]) -> Atom:
         expect_args(args, [2], "list_find_all")
         return ValueAtom("list", list(filter(lambda e: e == args[1], args[0].value)))
+    # Mapping and filtering an iterator gives an iterator, so that its elements are never all in memory
     def _list_map(args: list[Atom]) -> Atom:
         expect_args(args, [2], "list_map")
-        return ValueAtom("list", list(map(lambda e: evaluate_call(args[1], [e]), args[0].value)))
+        mapped = map(lambda e: evaluate_call(args[1], [e]), args[0].value)
+        return ValueAtom("iterator", mapped) if args[0].type == "iterator" else ValueAtom("list", list(mapped))
     def _list_filter(args: list[Atom]) -> Atom:
         expect_args(args, [2], "list_filter")
-        return ValueAtom("list", list(filter(lambda e: evaluate_call(args[1], [e]).value, args[0].value)))
+        filtered = filter(lambda e: evaluate_call(args[1], [e]).value, args[0].value)
+        return ValueAtom("iterator", filtered) if args[0].type == "iterator" else ValueAtom("list", list(filtered))
+    def parallel_args(args: list[Atom], name: str) -> tuple:
+        expect_args(args, [2, 3, 4], name)
+        elements = args[0].value if args[0].type != "iterator" else list(args[0].value)
+        workers = args[2].value if len(args) > 2 and args[2].type != "unit" else None
+        chunk_size = args[3].value if len(args) > 3 else None
+        return name, args[1], elements, workers, chunk_size
+    def _list_pmap(args: list[Atom]) -> Atom:
+        return ValueAtom("list", parallel_map(*parallel_args(args, "list_pmap")))
+    def _list_pfilter(args: list[Atom]) -> Atom:
+        return ValueAtom("list", parallel_map(*parallel_args(args, "list_pfilter"), filter=True))
     def _list_reduce(args: list[Atom]) -> Atom:
         expect_args(args, [2, 3], "list_reduce")
-        if len(args) == 2:
-            acc = args[0].value[0]
-            for e in args[0].value[1:]: acc = evaluate_call(args[1], [acc, e])
-            return acc
-        else: # len(args) == 3
-            acc = args[2]
-            for e in args[0].value: acc = evaluate_call(args[1], [acc, e])
-            return acc
+        elements = iter(args[0].value)
+        acc = next(elements) if len(args) == 2 else args[2]
+        for e in elements: acc = evaluate_call(args[1], [acc, e])
+        return acc
     def _list_group_by(args: list[Atom]) -> Atom:
         expect_args(args, [2], "list_group_by")
         groups = {}
         for e in args[0].value:
-            key = evaluate_call(args[1], [e]).raw_str()
+            key = check_map_key(evaluate_call(args[1], [e]))
             if key not in groups:
                 groups[key] = ValueAtom("list", [])
             groups[key].value.append(e)
@@ -807,6 +1044,8 @@ def init_list(env: Environment):
     addBuiltin("list_find_all", _list_find_all, env)
     addBuiltin("list_map", _list_map, env)
     addBuiltin("list_filter", _list_filter, env)
+    addBuiltin("list_pmap", _list_pmap, env)
+    addBuiltin("list_pfilter", _list_pfilter, env)
     addBuiltin("list_reduce", _list_reduce, env)
     addBuiltin("list_group_by", _list_group_by, env)
 
@@ -816,10 +1055,12 @@ def init_tuple(env: Environment):
     """
     def _tuple_size(args: list[Atom]) -> Atom:
         expect_args(args, [1], "tuple_size")
-        return ValueAtom("number", len(args[0].value))
+        return number_atom(len(args[0].value))
     def _tuple_contains(args: list[Atom]) -> Atom:
         expect_args(args, [2], "tuple_contains")
-        return ValueAtom("bool", args[1] in args[0].value)
+        if args[0].type == "set":
+            return bool_atom(set_has(args[0].value, args[1]))
+        return bool_atom(args[1] in args[0].value)
     def _tuple_slice(args: list[Atom]) -> Atom:
         expect_args(args, [3], "tuple_slice")
         return ValueAtom("tuple", args[0].value[args[1].value:args[2].value])
@@ -833,13 +1074,10 @@ def init_map(env: Environment):
     """
     def _map_size(args: list[Atom]) -> Atom:
         expect_args(args, [1], "map_size")
-        return ValueAtom("number", len(args[0].value))
+        return number_atom(len(args[0].value))
     def _map_contains(args: list[Atom]) -> Atom:
         expect_args(args, [2], "map_contains")
-        for key in args[0].value.keys():
-            if key == args[1].raw_str():
-                return ValueAtom("bool", True)
-        return ValueAtom("bool", False)
+        return bool_atom(set_has(args[0].value, args[1]))
     def _map_keys(args: list[Atom]) -> Atom:
         expect_args(args, [1], "map_keys")
         return ValueAtom("list", list(args[0].value.keys()))
@@ -854,8 +1092,8 @@ def init_map(env: Environment):
         return ValueAtom("list", tuple_pairs)
     def _map_remove(args: list[Atom]) -> Atom:
         expect_args(args, [2], "map_remove")
-        del args[0].value[args[1]]
-        return ValueAtom("unit", None)
+        args[0].value.pop(check_map_key(args[1]), None)
+        return UNIT
     addBuiltin("map_size", _map_size, env)
     addBuiltin("map_contains", _map_contains, env)
     addBuiltin("map_keys", _map_keys, env)
@@ -863,21 +1101,330 @@ def init_map(env: Environment):
     addBuiltin("map_items", _map_items, env)
     addBuiltin("map_remove", _map_remove, env)
 
-def init_stdlib(env: Environment):
+def init_set(env: Environment):
+    """
+    Initialize set operations.
+    """
+    def _set_add(args: list[Atom]) -> Atom:
+        expect_args(args, [2], "set_add")
+        members = expect_set(args, 0, "set_add")
+        members.update(set_atom([args[1]]).value)
+        return UNIT
+    def _set_remove(args: list[Atom]) -> Atom:
+        expect_args(args, [2], "set_remove")
+        members = expect_set(args, 0, "set_remove")
+        if set_has(members, args[1]):
+            del members[args[1]]
+        return UNIT
+    def _set_contains(args: list[Atom]) -> Atom:
+        expect_args(args, [2], "set_contains")
+        members = expect_set(args, 0, "set_contains")
+        return bool_atom(set_has(members, args[1]))
+    def _set_size(args: list[Atom]) -> Atom:
+        expect_args(args, [1], "set_size")
+        return number_atom(len(expect_set(args, 0, "set_size")))
+    def _set_union(args: list[Atom]) -> Atom:
+        expect_args(args, [2], "set_union")
+        return ValueAtom("set", expect_set(args, 0, "set_union") | expect_set(args, 1, "set_union"))
+    def _set_intersection(args: list[Atom]) -> Atom:
+        expect_args(args, [2], "set_intersection")
+        a, b = expect_set(args, 0, "set_intersection"), expect_set(args, 1, "set_intersection")
+        return ValueAtom("set", {e: None for e in a if e in b})
+    def _set_difference(args: list[Atom]) -> Atom:
+        expect_args(args, [2], "set_difference")
+        a, b = expect_set(args, 0, "set_difference"), expect_set(args, 1, "set_difference")
+        return ValueAtom("set", {e: None for e in a if e not in b})
+    addBuiltin("set_add", _set_add, env)
+    addBuiltin("set_remove", _set_remove, env)
+    addBuiltin("set_contains", _set_contains, env)
+    addBuiltin("set_size", _set_size, env)
+    addBuiltin("set_union", _set_union, env)
+    addBuiltin("set_intersection", _set_intersection, env)
+    addBuiltin("set_difference", _set_difference, env)
+
+def memo_key(atom: Atom):
+    """
+    Get a hashable key for an argument of a memoized call.
+    Immutable atoms are their own key, lists and maps are keyed by a snapshot of their structure
+    so that changing them after the call does not change the cached entry.
+    """
+    if isinstance(atom, ValueAtom):
+        if atom.type == "list":
+            return ("list", *map(memo_key, atom.value))
+        elif atom.type == "map":
+            return ("map", frozenset((k, memo_key(v)) for k, v in atom.value.items()))
+        elif atom.type == "set":
+            return ("set", frozenset(atom.value))
+        elif atom.type == "builder":
+            return ("builder", str(atom.value))
+        elif atom.type == "tuple":
+            try:
+                hash(atom)
+            except TypeError: # Some element is mutable
+                return ("tuple", *map(memo_key, atom.value))
+    return atom
+
+def memo_copy(atom: Atom) -> Atom:
+    """
+    Copy the mutable parts of a cached result, so that callers changing their result do not change the cache.
+    """
+    if isinstance(atom, ValueAtom):
+        if atom.type == "list":
+            return ValueAtom("list", list(map(memo_copy, atom.value)))
+        elif atom.type == "map":
+            return ValueAtom("map", {k: memo_copy(v) for k, v in atom.value.items()})
+        elif atom.type == "set":
+            return ValueAtom("set", dict(atom.value))
+        elif atom.type == "builder":
+            builder = StringBuilder()
+            builder.append(str(atom.value))
+            return ValueAtom("builder", builder)
+        elif atom.type == "tuple":
+            try:
+                hash(atom)
+            except TypeError:
+                return ValueAtom("tuple", list(map(memo_copy, atom.value)))
+    return atom
+
+class Memo():
+    """
+    A function wrapped in a cache of its results by the structure of its arguments,
+    evicting the least recently used result once it holds more than `capacity` results.
+    """
+    def __init__(self, function: Atom, capacity: int):
+        self.function = function
+        self.capacity = capacity
+        self.cache: OrderedDict[tuple, Atom] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, args: list[Atom]) -> Atom:
+        key = tuple(map(memo_key, args))
+        try:
+            result = self.cache.get(key)
+        except TypeError: # Iterators can only be read once, so calls with them are not cached
+            self.misses += 1
+            return evaluate_call(self.function, args)
+        if result is not None:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return memo_copy(result)
+        self.misses += 1
+        result = evaluate_call(self.function, args)
+        if isinstance(result, ValueAtom) and result.type == "iterator":
+            return result
+        self.cache[key] = memo_copy(result)
+        if len(self.cache) > self.capacity:
+            self.cache.popitem(last=False)
+        return result
+
+def init_bytes(env: Environment):
+    """
+    Initialize operations on bytes.
+    """
+    import codecs
+    def _bytes_size(args: list[Atom]) -> Atom:
+        expect_args(args, [1], "bytes_size")
+        return number_atom(len(bytes_of(args[0], "bytes_size")))
+    def _bytes_to_str(args: list[Atom]) -> Atom:
+        expect_args(args, [1, 2], "bytes_to_str")
+        if args[0].type != "bytes":
+            raise Exception(f"Function 'bytes_to_str' expected bytes as first argument but got '{args[0].type}'!")
+        encoding = args[1].raw_str() if len(args) == 2 else "utf-8"
+        return ValueAtom("string", codecs.decode(args[0].value, encoding))
+    def search_args(args: list[Atom], name: str) -> tuple:
+        expect_args(args, [2, 3, 4], name)
+        if args[0].type != "bytes":
+            raise Exception(f"Function '{name}' expected bytes as first argument but got '{args[0].type}'!")
+        size = len(args[0].value)
+        start = args[2].value if len(args) >= 3 else 0
+        end = args[3].value if len(args) == 4 else size
+        # Offsets are relative to the value, and may count from its end like in slices
+        start = max(start + size, 0) if start < 0 else start
+        end = min(max(end + size, 0) if end < 0 else end, size)
+        return bytes_of(args[1], name), start, end
+    def search(data: Atom, find, start: int, end: int) -> int:
+        """
+        Search the buffer holding bytes between offsets in the bytes, without copying a slice of a mapped file.
+        """
+        if start > end:
+            return -1 # Mapped files would still find an empty string at their end
+        buffer, offset = bytes_buffer(data)
+        found = find(buffer, start + offset, end + offset)
+        return found - offset if found != -1 else -1
+    def _bytes_find(args: list[Atom]) -> Atom:
+        sub, start, end = search_args(args, "bytes_find")
+        return number_atom(search(args[0], lambda b, s, e: b.find(sub, s, e), start, end))
+    def _bytes_rfind(args: list[Atom]) -> Atom:
+        sub, start, end = search_args(args, "bytes_rfind")
+        return number_atom(search(args[0], lambda b, s, e: b.rfind(sub, s, e), start, end))
+    def _bytes_line_at(args: list[Atom]) -> Atom:
+        expect_args(args, [2], "bytes_line_at")
+        if args[0].type != "bytes":
+            raise Exception(f"Function 'bytes_line_at' expected bytes as first argument but got '{args[0].type}'!")
+        size = len(args[0].value)
+        offset = args[1].value + size if args[1].value < 0 else args[1].value
+        if not (0 <= offset <= size):
+            raise Exception(f"Function 'bytes_line_at' expected an offset within the {size} bytes but got {args[1].value}!")
+        start = search(args[0], lambda b, s, e: b.rfind(b"\n", s, e), 0, offset) + 1
+        end = search(args[0], lambda b, s, e: b.find(b"\n", s, e), offset, size)
+        if end == -1: end = size
+        return bytes_slice(args[0], start, end)
+    addBuiltin("bytes_size", _bytes_size, env)
+    addBuiltin("bytes_to_str", _bytes_to_str, env)
+    addBuiltin("bytes_find", _bytes_find, env)
+    addBuiltin("bytes_rfind", _bytes_rfind, env)
+    addBuiltin("bytes_line_at", _bytes_line_at, env)
+
+def init_memo(env: Environment):
+    """
+    Initialize function memoization.
+    """
+    def _memoize(args: list[Atom]) -> Atom:
+        expect_args(args, [1, 2], "memoize")
+        if not isinstance(args[0], (FunctionAtom, BuiltinFunctionAtom)):
+            raise Exception(f"Function 'memoize' expected a function as first argument but got '{args[0].type}'!")
+        capacity = args[1].value if len(args) == 2 else 1024
+        if args[1:] and (args[1].type != "number" or capacity < 1):
+            raise Exception(f"Function 'memoize' expected a positive capacity but got {args[1].formatted_str()}!")
+        name = args[0].name if isinstance(args[0], FunctionAtom) else args[0].functionName
+        return BuiltinFunctionAtom(f"memoize({name})", Memo(args[0], capacity))
+    def _memoize_stats(args: list[Atom]) -> Atom:
+        expect_args(args, [1], "memoize_stats")
+        memo = args[0].func if isinstance(args[0], BuiltinFunctionAtom) else None
+        if not isinstance(memo, Memo):
+            raise Exception(f"Function 'memoize_stats' expected a memoized function but got {args[0]}!")
+        return ValueAtom("map", {
+            ValueAtom("string", "hits"): number_atom(memo.hits),
+            ValueAtom("string", "misses"): number_atom(memo.misses),
+            ValueAtom("string", "size"): number_atom(len(memo.cache)),
+            ValueAtom("string", "capacity"): number_atom(memo.capacity),
+        })
+    addBuiltin("memoize", _memoize, env)
+    addBuiltin("memoize_stats", _memoize_stats, env)
+
+def init_event(env: Environment):
+    """
+    Initialize the event loop, with timers and non-blocking TCP connections calling back into mini.
+    """
+    from .events import Server, Timer, connect, event_loop
+    def expect_callback(args: list[Atom], index: int, name: str) -> Atom:
+        if args[index].type != "function":
+            raise Exception(f"Function '{name}' expected a function as argument {index + 1} but got '{args[index].type}'!")
+        return args[index]
+    def expect_intrinsic(args: list[Atom], types: list[str], name: str):
+        if args[0].type not in types:
+            raise Exception(f"Function '{name}' expected a {' or '.join(types)} as first argument but got '{args[0].type}'!")
+        return args[0].value
+    def _event_loop_run(args: list[Atom]) -> Atom:
+        expect_args(args, [0], "event_loop_run")
+        event_loop().run()
+        return UNIT
+    def _event_loop_stop(args: list[Atom]) -> Atom:
+        expect_args(args, [0], "event_loop_stop")
+        event_loop().stop()
+        return UNIT
+    def timer(args: list[Atom], name: str, repeat: bool) -> Atom:
+        expect_args(args, [2], name)
+        if args[0].type != "number" or args[0].value < 0:
+            raise Exception(f"Function '{name}' expected a delay in milliseconds as first argument but got {args[0].formatted_str()}!")
+        return IntrinsicAtom("timer", Timer(event_loop(), args[0].value / 1000, expect_callback(args, 1, name), repeat))
+    def _event_timer(args: list[Atom]) -> Atom:
+        return timer(args, "event_timer", False)
+    def _event_interval(args: list[Atom]) -> Atom:
+        return timer(args, "event_interval", True)
+    def _event_cancel(args: list[Atom]) -> Atom:
+        expect_args(args, [1], "event_cancel")
+        expect_intrinsic(args, ["timer"], "event_cancel").cancel()
+        return UNIT
+    def _event_tcp_listen(args: list[Atom]) -> Atom:
+        expect_args(args, [3], "event_tcp_listen")
+        on_connect = expect_callback(args, 2, "event_tcp_listen")
+        return IntrinsicAtom("server", Server(event_loop(), args[0].raw_str(), args[1].value, on_connect))
+    def _event_tcp_port(args: list[Atom]) -> Atom:
+        expect_args(args, [1], "event_tcp_port")
+        return number_atom(expect_intrinsic(args, ["server"], "event_tcp_port").port)
+    def _event_tcp_connect(args: list[Atom]) -> Atom:
+        expect_args(args, [3, 4], "event_tcp_connect")
+        on_error = expect_callback(args, 3, "event_tcp_connect") if len(args) == 4 else None
+        connect(event_loop(), args[0].raw_str(), args[1].value, expect_callback(args, 2, "event_tcp_connect"), on_error)
+        return UNIT
+    def _event_tcp_on_data(args: list[Atom]) -> Atom:
+        expect_args(args, [2], "event_tcp_on_data")
+        expect_intrinsic(args, ["connection"], "event_tcp_on_data").set_on_data(expect_callback(args, 1, "event_tcp_on_data"))
+        return UNIT
+    def _event_tcp_on_close(args: list[Atom]) -> Atom:
+        expect_args(args, [2], "event_tcp_on_close")
+        expect_intrinsic(args, ["connection"], "event_tcp_on_close").on_close = expect_callback(args, 1, "event_tcp_on_close")
+        return UNIT
+    def _event_tcp_send(args: list[Atom]) -> Atom:
+        expect_args(args, [2], "event_tcp_send")
+        expect_intrinsic(args, ["connection"], "event_tcp_send").send(bytes_of(args[1], "event_tcp_send"))
+        return UNIT
+    def _event_tcp_close(args: list[Atom]) -> Atom:
+        expect_args(args, [1], "event_tcp_close")
+        expect_intrinsic(args, ["connection", "server"], "event_tcp_close").close()
+        return UNIT
+    addBuiltin("event_loop_run", _event_loop_run, env)
+    addBuiltin("event_loop_stop", _event_loop_stop, env)
+    addBuiltin("event_timer", _event_timer, env)
+    addBuiltin("event_interval", _event_interval, env)
+    addBuiltin("event_cancel", _event_cancel, env)
+    addBuiltin("event_tcp_listen", _event_tcp_listen, env)
+    addBuiltin("event_tcp_port", _event_tcp_port, env)
+    addBuiltin("event_tcp_connect", _event_tcp_connect, env)
+    addBuiltin("event_tcp_on_data", _event_tcp_on_data, env)
+    addBuiltin("event_tcp_on_close", _event_tcp_on_close, env)
+    addBuiltin("event_tcp_send", _event_tcp_send, env)
+    addBuiltin("event_tcp_close", _event_tcp_close, env)
+
+# Groups of builtins that are only initialized when one of them is first looked up,
+# by the prefix of their names
+lazy_modules = {
+    "system_": init_sys,
+    "dir_": init_fs,
+    "file_": init_fs,
+    "net_": init_net,
+    "enc_": init_encoding,
+    "dec_": init_encoding,
+    "random": init_random,
+    "str_": init_str,
+    "list_": init_list,
+    "tuple_": init_tuple,
+    "map_": init_map,
+    "set_": init_set,
+    "bytes_": init_bytes,
+    "memoize": init_memo,
+    "event_": init_event,
+}
+
+def load_lazy_module(env: Environment, name: str) -> Atom | None:
+    """
+    Initialize the group of builtins a global variable name belongs to, and return its value.
+    Builtins never replace variables of the same name that the program has already defined.
+    """
+    for prefix, init in lazy_modules.items():
+        if name.startswith(prefix) and init not in env.loaded:
+            env.loaded.add(init)
+            module = Environment("builtins", None)
+            init(module)
+            for builtin, value in module.values.items():
+                env.values.setdefault(builtin, value)
+    return env.values.get(name)
+
+def init_stdlib(env: Environment, lazy = True):
     """
     Initialize the standard library.
+    Groups of builtins with heavy imports or many functions are initialized lazily,
+    unless `lazy` is false.
     """
     init_util(env)
     init_io(env)
-    init_sys(env)
-    init_fs(env)
-    init_net(env)
-    init_encoding(env)
     init_conv(env)
     init_math(env)
-    init_random(env)
     init_type(env)
-    init_str(env)
-    init_list(env)
-    init_tuple(env)
-    init_map(env)
+    if lazy:
+        env.loader = load_lazy_module
+        return
+    for init in dict.fromkeys(lazy_modules.values()):
+        init(env)
@@ -0,0 +1,75 @@
+import sys
+from typing import Callable
+
+# The parts of the interpreter that can be traced
+CATEGORIES = ["lex", "parse", "eval"]
+
+class TraceEvent():
+    """
+    Something that happened while running a program, such as a token being read
+    or a binary operator being evaluated.
+    Events only hold references to the nodes, atoms and tokens involved,
+    they are formatted when a sink prints them, never before.
+    """
+    __slots__ = ("category", "kind", "node", "op", "operands")
+
+    def __init__(self, category: str, kind: str, node = None, op: str | None = None, operands: tuple = ()):
+        self.category = category
+        self.kind = kind
+        self.node = node
+        self.op = op
+        self.operands = operands
+
+    def __str__(self):
+        parts = [f"[{self.category}] {self.kind}"]
+        if self.op is not None:
+            parts.append(self.op)
+        if self.node is not None:
+            parts.append(str(self.node))
+        if len(self.operands) > 0:
+            parts.append(", ".join(map(format_operand, self.operands)))
+        return " ".join(parts)
+
+def format_operand(operand) -> str:
+    return operand.formatted_str() if hasattr(operand, "formatted_str") else str(operand)
+
+def print_event(event: TraceEvent):
+    """
+    The default sink, printing each event on a line of its own.
+    """
+    print(f"  {event}", file=sys.stdout)
+
+categories: set[str] = set() # Categories being traced
+sink: Callable[[TraceEvent], None] = print_event
+
+def enable(enabled: list[str], to: Callable[[TraceEvent], None] | None = None):
+    """
+    Start tracing the given categories, sending events to a sink instead of printing them.
+    Tracing takes effect for lexers, parsers and programs started after this call.
+    """
+    global sink
+    for category in enabled:
+        if category not in CATEGORIES:
+            raise Exception(f"Unknown trace category '{category}', expected one of {', '.join(CATEGORIES)}")
+    categories.update(enabled)
+    if to is not None:
+        sink = to
+
+def disable():
+    """
+    Stop tracing all categories and restore the default sink.
+    """
+    global sink
+    categories.clear()
+    sink = print_event
+
+def is_enabled(category: str) -> bool:
+    return category in categories
+
+def emit(event: TraceEvent):
+    """
+    Send an event to the sink.
+    Trace points check that their category is enabled before building the event,
+    so that nothing is done for categories that are not traced.
+    """
+    sink(event)
@@ -0,0 +1,192 @@
+from functools import partial
+
+from .atoms import UNIT as UNIT_VALUE, Atom, FunctionAtom, ValueAtom, bool_atom, number_atom
+from .bytecode import (ADD, AND, BINARY, BUILD_LIST, BUILD_MAP, BUILD_TUPLE, CALL, CALL_SPREAD, CONST, DIV, ENTER_BLOCK, EQUAL,
+                       EVAL, EXIT_BLOCK, FOR_ITER, GET_ITER, GREATER, GREATER_EQUAL, INDEX, JUMP, JUMP_IF_FALSE, LESS, LESS_EQUAL, LOAD_GLOBAL,
+                       LOAD_LOCAL, LOAD_OUTER, MAKE_FUNCTION, MEMBER, MOD, MUL, NEGATE, NOT, NOT_EQUAL, OR, POP, POW, RETURN,
+                       SLICE, STORE_LOCAL, STORE_NAME, SUB, TAIL_CALL, TAIL_CALL_SPREAD, UNIT, UNPACK, CodeObject)
+from .compiler import lookup_unassigned
+from .environment import Environment
+from .evaluator import (bind_arguments, evaluate_binary_atom_expression, evaluate_call, evaluate_expression, iterate,
+                        evaluate_member_atom_expression, evaluate_slice_atom_expression, evaluate_unary_atom_expression)
+
+# Operations with a fast path for two numbers, and the constructor of their result
+number_operations = {
+    ADD: (lambda a, b: a + b, number_atom, "PLUS"),
+    SUB: (lambda a, b: a - b, number_atom, "MINUS"),
+    MUL: (lambda a, b: a * b, number_atom, "MULTIPLY"),
+    DIV: (lambda a, b: a / b, number_atom, "DIVIDE"),
+    MOD: (lambda a, b: a % b, number_atom, "MODULO"),
+    POW: (lambda a, b: a ** b, number_atom, "POWER"),
+    LESS: (lambda a, b: a < b, bool_atom, "LESS"),
+    GREATER: (lambda a, b: a > b, bool_atom, "GREATER"),
+    LESS_EQUAL: (lambda a, b: a <= b, bool_atom, "LESSEQUAL"),
+    GREATER_EQUAL: (lambda a, b: a >= b, bool_atom, "GREATEREQUAL"),
+}
+
+primitive_types = ["number", "string", "bool"]
+
+def binary(op: str, lhs: Atom, rhs: Atom, env: Environment) -> Atom:
+    result = evaluate_binary_atom_expression(op, lhs, rhs, env)
+    if result is None:
+        raise Exception(f"Unknown binary operator '{op}'")
+    return result
+
+def make_function(code: CodeObject, env: Environment) -> FunctionAtom:
+    """
+    Create a function running the given code object in a closure over the environment.
+    """
+    if code.entry is None:
+        code.entry = partial(run, code)
+    return FunctionAtom(code.params, code.body, env, code.name, code.entry, code, code.scope)
+
+def run(code: CodeObject, env: Environment) -> Atom:
+    """
+    Run a code object in the given environment and return its result.
+    Calls to functions with bytecode push a new frame instead of recursing,
+    so deeply recursive mini programs are not limited by the Python stack.
+    Tail calls replace the current frame, so tail recursion runs in constant space.
+    """
+    stack: list[Atom] = []
+    frames: list[tuple[CodeObject, int, Environment]] = [] # Saved callers
+    instructions, consts, names = code.instructions, code.consts, code.names
+    ip = 0
+    while True:
+        op = instructions[ip]
+        arg = instructions[ip + 1]
+        ip += 2
+        if op == LOAD_LOCAL:
+            val = env.slots[arg]
+            if val is None:
+                val = lookup_unassigned(env, env.scope.names[arg])
+            stack.append(val)
+        elif op == LOAD_OUTER:
+            depth, slot = consts[arg]
+            scope_env = env
+            for _ in range(depth):
+                scope_env = scope_env.parent
+            val = scope_env.slots[slot]
+            if val is None:
+                val = lookup_unassigned(scope_env, scope_env.scope.names[slot])
+            stack.append(val)
+        elif op == LOAD_GLOBAL:
+            val = env.globals.values.get(names[arg])
+            if val is None:
+                val = env.globals.load(names[arg])
+            if val is None:
+                raise Exception(f"identifier '{names[arg]}' is not defined")
+            stack.append(val)
+        elif op == CONST:
+            stack.append(consts[arg])
+        elif op in number_operations:
+            rhs = stack.pop()
+            lhs = stack.pop()
+            fn, result, name = number_operations[op]
+            if lhs.type == "number" and rhs.type == "number":
+                stack.append(result(fn(lhs.value, rhs.value)))
+            else:
+                stack.append(binary(name, lhs, rhs, env))
+        elif op == JUMP_IF_FALSE:
+            cond = stack.pop()
+            if not isinstance(cond, ValueAtom) or not cond.type == "bool":
+                raise Exception(f"Condition does not evaluate to a bool")
+            if not cond.value:
+                ip = arg
+        elif op == JUMP:
+            ip = arg
+        elif op == CALL or op == CALL_SPREAD or op == TAIL_CALL or op == TAIL_CALL_SPREAD:
+            if op == CALL or op == TAIL_CALL:
+                args = stack[len(stack) - arg:]
+                del stack[len(stack) - arg:]
+            else:
+                value = stack.pop()
+                if isinstance(value, ValueAtom) and value.type == "tuple":
+                    args = value.value
+                elif isinstance(value, ValueAtom) and value.type == "unit":
+                    args = []
+                else:
+                    args = [value]
+            function = stack.pop()
+            if type(function) is FunctionAtom and function.code is not None:
+                if op == CALL or op == CALL_SPREAD:
+                    frames.append((code, ip, env))
+                env = bind_arguments(function, args)
+                code = function.code
+                instructions, consts, names = code.instructions, code.consts, code.names
+                ip = 0
+            else:
+                stack.append(evaluate_call(function, args))
+        elif op == RETURN:
+            if len(frames) == 0:
+                return stack.pop()
+            code, ip, env = frames.pop()
+            instructions, consts, names = code.instructions, code.consts, code.names
+        elif op == FOR_ITER:
+            value = next(stack[-1], None)
+            if value is None:
+                stack.pop()
+                ip = arg
+            else:
+                stack.append(value)
+        elif op == STORE_LOCAL:
+            env.slots[arg] = stack[-1]
+        elif op == STORE_NAME:
+            env.set(names[arg], stack[-1])
+        elif op == POP:
+            stack.pop()
+        elif op == EQUAL or op == NOT_EQUAL:
+            rhs = stack.pop()
+            lhs = stack.pop()
+            if lhs.type == rhs.type and lhs.type in primitive_types:
+                equal = lhs.value == rhs.value
+                stack.append(bool_atom(equal if op == EQUAL else not equal))
+            else:
+                stack.append(binary("EQUAL" if op == EQUAL else "NOTEQUAL", lhs, rhs, env))
+        elif op == AND or op == OR:
+            rhs = stack.pop()
+            lhs = stack.pop()
+            stack.append(binary("AND" if op == AND else "OR", lhs, rhs, env))
+        elif op == INDEX:
+            rhs = stack.pop()
+            lhs = stack.pop()
+            stack.append(binary("INDEX", lhs, rhs, env))
+        elif op == BINARY:
+            rhs = stack.pop()
+            lhs = stack.pop()
+            stack.append(binary(consts[arg], lhs, rhs, env))
+        elif op == NEGATE:
+            stack.append(evaluate_unary_atom_expression("MINUS", stack.pop()))
+        elif op == NOT:
+            stack.append(evaluate_unary_atom_expression("NOT", stack.pop()))
+        elif op == UNIT:
+            stack.append(UNIT_VALUE)
+        elif op == ENTER_BLOCK:
+            env = Environment("<block>", env, consts[arg])
+        elif op == EXIT_BLOCK:
+            env = env.parent
+        elif op == MAKE_FUNCTION:
+            stack.append(make_function(consts[arg], env))
+        elif op == MEMBER:
+            stack.append(evaluate_member_atom_expression(stack.pop(), consts[arg]))
+        elif op == BUILD_LIST or op == BUILD_TUPLE:
+            elements = stack[len(stack) - arg:]
+            del stack[len(stack) - arg:]
+            stack.append(ValueAtom("list" if op == BUILD_LIST else "tuple", elements))
+        elif op == BUILD_MAP:
+            keys = consts[arg]
+            values = stack[len(stack) - len(keys):]
+            del stack[len(stack) - len(keys):]
+            stack.append(ValueAtom("map", dict(zip(keys, values))))
+        elif op == SLICE:
+            step = stack.pop()
+            end = stack.pop()
+            start = stack.pop()
+            stack.append(evaluate_slice_atom_expression(stack.pop(), start, end, step))
+        elif op == GET_ITER:
+            stack.append(iterate(stack.pop(), arg))
+        elif op == UNPACK:
+            stack.extend(reversed(stack.pop()))
+        elif op == EVAL:
+            stack.append(evaluate_expression(consts[arg], env))
+        else:
+            raise Exception(f"Unknown opcode {op}")
@@ -1,7 +1,17 @@
 from tests.util import done, set_crash_on_error
+from tests.lexer import run_all as run_all_lexer_tests
 from tests.map import run_all as run_all_map_tests
 from tests.lists import run_all as run_all_list_tests
+from tests.sets import run_all as run_all_set_tests
 from tests.std import run_all as run_all_std_tests
+from tests.engines import run_all as run_all_engine_tests
+from tests.values import run_all as run_all_value_tests
+from tests.loops import run_all as run_all_loop_tests
+from tests.cache import run_all as run_all_cache_tests
+from tests.optimizer import run_all as run_all_optimizer_tests
+from tests.trace import run_all as run_all_trace_tests
+from tests.profiler import run_all as run_all_profiler_tests
+from tests.heatmap import run_all as run_all_heatmap_tests
 from tests.examples import run_all as run_all_examples
 
 def main():
@@ -10,9 +20,19 @@ def main():
     passed = True
     print("\nRunning all tests:")
     print("==================")
+    passed &= run_all_lexer_tests()
     passed &= run_all_map_tests()
     passed &= run_all_list_tests()
+    passed &= run_all_set_tests()
     passed &= run_all_std_tests()
+    passed &= run_all_engine_tests()
+    passed &= run_all_value_tests()
+    passed &= run_all_loop_tests()
+    passed &= run_all_cache_tests()
+    passed &= run_all_optimizer_tests()
+    passed &= run_all_trace_tests()
+    passed &= run_all_profiler_tests()
+    passed &= run_all_heatmap_tests()
     passed &= run_all_examples()
     done(passed)
 
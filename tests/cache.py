@@ -0,0 +1,39 @@
+import os
+import tempfile
+
+from src.cache import cache_key, cache_path, load
+from src.interpreter import execute_file, globalEnvironment
+from .util import assert_eval, assert_true, done, get_all_asserts_passed, new_test_suite, ValueAtom
+
+def run_file(filepath: str):
+    res, _ = execute_file(filepath, globalEnvironment())
+    return res
+
+def write(filepath: str, source: str):
+    with open(filepath, "w") as f:
+        f.write(source)
+
+def test_cache():
+    print("- Testing parsed program cache...")
+    with tempfile.TemporaryDirectory() as directory:
+        filepath = os.path.join(directory, "main.m")
+        write(filepath, "f(x) = x * 2 f(21)")
+        assert_eval(filepath, ValueAtom("number", 42), run_file)
+        assert_true(os.path.exists(cache_path(filepath)), "the parsed program is cached")
+        assert_true(load(cache_path(filepath), cache_key("f(x) = x * 2 f(21)")) is not None, "the cached program loads")
+        assert_eval(filepath, ValueAtom("number", 42), run_file)
+        # A changed source is parsed again
+        write(filepath, "f(x) = x * 3 f(21)")
+        assert_eval(filepath, ValueAtom("number", 63), run_file)
+        # A corrupt cache file is ignored and replaced
+        write(cache_path(filepath), "corrupt")
+        assert_eval(filepath, ValueAtom("number", 63), run_file)
+        assert_true(load(cache_path(filepath), cache_key("f(x) = x * 3 f(21)")) is not None, "a corrupt cache is replaced")
+
+def run_all() -> bool:
+    new_test_suite("cache")
+    test_cache()
+    return get_all_asserts_passed()
+
+if __name__ == "__main__":
+    done(run_all())
@@ -0,0 +1,68 @@
+from io import StringIO
+from src.interpreter import execute, globalEnvironment
+from .util import assert_eval, done, get_all_asserts_passed, new_test_suite, ValueAtom
+
+engines = ["tree", "closure", "vm"]
+
+programs = [
+    "1 + 2 * 3 - 4 / 2",
+    "-(2 ^ 3) % 5",
+    "!(1 < 2) || 3 >= 3 && 'a' == 'a'",
+    "(1, 'two', true)",
+    "[1, 2, 3][1:3]",
+    "#{a: 1, 2: 'b', 'c': [3]}",
+    "m = #{a: #{b: 5}} m.a.b",
+    "f(x) = x * 2 f(21)",
+    "add = (a, b) => a + b add(1, 2)",
+    "t = (1, 2) ((a, b) => a - b)(t)",
+    "fib(n) = if n < 2 n else fib(n - 1) + fib(n - 2) fib(10)",
+    "x = 1 { x = x + 1 x }",
+    "if false 1 else if true 2 else 3",
+    "if false 1",
+    "s = 'a' s += 1 s",
+    "list_map([1, 2, 3], (x) => x * x)",
+    "x = 1 f() = { y = x x = 2 (x, y) } (f(), x)",
+    "g(n) = { h(k) = if k == 0 0 else k + h(k - 1) h(n) } g(10)",
+    "mk(a) = b => c => a + b + c mk(1)(2)(3)",
+    "z = 5 { z += 1 z } + z",
+    "m = #{a: 1} s() = { m.a = 7 m.a } (s(), m.a)",
+    "f(n) = if n == 0 'done' else { m = n - 1 f(m) } f(5)",
+    "g(s) = str_upper(s) h(s) = g(s + '!') h('hi')",
+    "c(f, x) = f(x) c((y) => (y, y), 3)",
+]
+
+def evaluate_with(input: str, engine: str):
+    res, _ = execute(StringIO(input), globalEnvironment(), False, engine)
+    return res
+
+def test_engines_agree():
+    print("- Testing engines agree...")
+    for program in programs:
+        expected = evaluate_with(program, engines[0])
+        for engine in engines[1:]:
+            assert_eval(program, expected, lambda input: evaluate_with(input, engine))
+
+def test_vm_deep_recursion():
+    print("- Testing deep recursion on the VM...")
+    program = "sum(n) = if n == 0 0 else n + sum(n - 1) sum(5000)"
+    assert_eval(program, ValueAtom("number", 12502500), lambda input: evaluate_with(input, "vm"))
+
+def test_tail_calls():
+    print("- Testing tail calls run in constant stack...")
+    count = "count(n, acc) = if n == 0 acc else count(n - 1, acc + 1) count(100000, 0)"
+    even = "even(n) = if n == 0 true else odd(n - 1) odd(n) = if n == 0 false else even(n - 1) even(100001)"
+    loop = "loop = (n) => { if n > 0 loop(n - 1) else 'end' } loop(100000)"
+    for engine in engines:
+        assert_eval(count, ValueAtom("number", 100000), lambda input: evaluate_with(input, engine))
+        assert_eval(even, ValueAtom("bool", False), lambda input: evaluate_with(input, engine))
+        assert_eval(loop, ValueAtom("string", "end"), lambda input: evaluate_with(input, engine))
+
+def run_all() -> bool:
+    new_test_suite("engines")
+    test_engines_agree()
+    test_vm_deep_recursion()
+    test_tail_calls()
+    return get_all_asserts_passed()
+
+if __name__ == "__main__":
+    done(run_all())
@@ -0,0 +1,45 @@
+from io import StringIO
+
+from src import heatmap
+from src.interpreter import execute, globalEnvironment
+from .util import assert_true, done, get_all_asserts_passed, new_test_suite
+
+PROGRAM = """s = 0
+for i in range(10) {
+    s = s + i * 2
+}
+m = #{a: [1, 2, 3]}
+m.a[1] + s
+"""
+
+def count(engine: str) -> heatmap.Heatmap:
+    heatmap.start()
+    try:
+        execute(StringIO(PROGRAM), globalEnvironment(), engine=engine)
+    finally:
+        counters = heatmap.stop()
+    return counters
+
+def test_heatmap():
+    print("- Testing node counters and heatmap...")
+    for engine in ["closure", "vm", "tree"]:
+        counters = count(engine)
+        nodes = {(s.position, s.kind): s for s in counters.stats.values()}
+        assert_true(nodes[((3, 16), "MULTIPLY")].count == 10, f"loop body nodes are counted ({engine})")
+        assert_true(nodes[((6, 5), "INDEX")].count == 1, f"index chains are counted ({engine})")
+        assert_true(counters.lines()[3][0] == 10, f"lines count their most evaluated node ({engine})")
+        assert_true(all(s.own <= s.total for s in counters.stats.values()), f"own time is part of the total time ({engine})")
+    out = StringIO()
+    counters.print_report(PROGRAM.split("\n"), out)
+    assert_true("    3 " in out.getvalue() and "| for i in range(10) {" in out.getvalue(), "the report annotates the source")
+    json = counters.to_json()
+    assert_true(any(n["kind"] == "PLUS" and n["line"] == 3 for n in json["nodes"]), "nodes are exported")
+    assert_true(heatmap.active is None, "counting stops")
+
+def run_all() -> bool:
+    new_test_suite("heatmap")
+    test_heatmap()
+    return get_all_asserts_passed()
+
+if __name__ == "__main__":
+    done(run_all())
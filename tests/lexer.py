@@ -0,0 +1,52 @@
+import glob
+from io import StringIO
+
+from bench.baseline_lexer import Lexer as BaselineLexer
+from src.lexer import Lexer
+from .util import assert_true, done, get_all_asserts_passed, new_test_suite
+
+# Tokens of every kind, some longer than the smallest chunks so that they span chunk boundaries
+SOURCE = """// comment
+long_identifier_name = 12345.6789 + 0.5 * values[1:4]
+text = "escaped \\"quotes\\" and \\t tabs\\n" + 'single'
+/* multi line
+   comment */
+table = #{name: 'mini', "version": 1, 3: [4, 5]}
+print(table.name, 0..10, a >= 42 && b <= 7 || c != d, x += 1, !done)
+f(x) = (y) => x ^ y % 3 - -1
+"""
+
+def tokens(lexer) -> list[tuple]:
+    """
+    Read all tokens with their positions, ending with the syntax error if there is one.
+    """
+    result = []
+    try:
+        while True:
+            token = lexer.next_token(True)
+            result.append((token.name, token.value, token.line, token.column))
+            if token.name == "EOF":
+                return result
+    except Exception as e:
+        return result + [str(e)]
+
+def test_chunked_reads():
+    print("- Testing chunked lexer reads...")
+    sources = {"generated": SOURCE}
+    for path in sorted(glob.glob("examples/*.m") + glob.glob("bench/programs/*.m")):
+        with open(path, encoding="utf-8") as f:
+            sources[path] = f.read()
+    for name, source in sources.items():
+        expected = tokens(BaselineLexer(StringIO(source)))
+        assert_true(tokens(Lexer(source)) == expected, f"a whole source string gives the tokens of the previous lexer ({name})")
+        for chunk_size in range(1, 17):
+            actual = tokens(Lexer(StringIO(source), chunk_size=chunk_size))
+            assert_true(actual == expected, f"chunks of {chunk_size} give the tokens of the previous lexer ({name})")
+
+def run_all() -> bool:
+    new_test_suite("lexer")
+    test_chunked_reads()
+    return get_all_asserts_passed()
+
+if __name__ == "__main__":
+    done(run_all())
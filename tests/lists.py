@@ -25,12 +25,40 @@ def test_range_index():
     assert_eval("[1, 2, 3][1:3]", ValueAtom("list", [ValueAtom("number", 2), ValueAtom("number", 3)]))
     # assert_eval("[1, 2, 3][1:4]", ValueAtom("list", [ValueAtom("number", 2), ValueAtom("number", 3), ValueAtom("number", 4)]))
 
+def numbers(*values: int) -> ValueAtom:
+    return ValueAtom("list", [ValueAtom("number", v) for v in values])
+
+def test_lazy_range():
+    print("- Testing lazy range...")
+    assert_eval("0..4", numbers(0, 1, 2, 3))
+    assert_eval("range(1, 10, 3)", numbers(1, 4, 7))
+    assert_eval("(0..10000000)[9999999]", ValueAtom("number", 9999999))
+    assert_eval("(0..10000000)[-1]", ValueAtom("number", 9999999))
+    assert_eval("(0..10000000)[5:8]", numbers(5, 6, 7))
+    assert_eval("list_size(0..10000000)", ValueAtom("number", 10000000))
+    assert_eval("list_contains(0..10000000, 9999999)", ValueAtom("bool", True))
+    assert_eval("list_contains(range(0, 10000000, 2), 7)", ValueAtom("bool", False))
+    assert_eval("list_contains(0..10, 'a')", ValueAtom("bool", False))
+    assert_eval("0..10000000 == 0..10000000", ValueAtom("bool", True))
+    assert_eval("0..3 == [0, 1, 2]", ValueAtom("bool", True))
+    assert_eval("[0, 1, 2] == 0..3", ValueAtom("bool", True))
+    assert_eval("list_reduce(list_filter(list_map(0..10, (x) => x * 2), (x) => x > 10), (a, b) => a + b, 0)", ValueAtom("number", 60))
+    assert_eval("(0..2) + [5]", numbers(0, 1, 5))
+
+def test_lazy_range_mutation():
+    print("- Testing lazy range mutation...")
+    assert_eval("r = 0..3 list_append(r, 7) r", numbers(0, 1, 2, 7))
+    assert_eval("r = 0..3 r[1] = 5 r", numbers(0, 5, 2))
+    assert_eval("r = 0..3 list_reverse(r) r", numbers(2, 1, 0))
+
 def run_all() -> bool:
     new_test_suite("list")
     test_create_list()
     test_index_access()
     test_index_assignment()
     test_range_index()
+    test_lazy_range()
+    test_lazy_range_mutation()
     return get_all_asserts_passed()
 
 if __name__ == "__main__":
@@ -0,0 +1,52 @@
+from io import StringIO
+from src.interpreter import execute, globalEnvironment
+from .util import assert_eval, done, get_all_asserts_passed, new_test_suite, ValueAtom
+
+engines = ["tree", "closure", "vm"]
+
+def evaluate_with(input: str, engine: str):
+    res, _ = execute(StringIO(input), globalEnvironment(), False, engine)
+    return res
+
+def assert_engines(input: str, expected: ValueAtom):
+    for engine in engines:
+        assert_eval(input, expected, lambda input: evaluate_with(input, engine))
+
+def numbers(*values: int) -> ValueAtom:
+    return ValueAtom("list", [ValueAtom("number", v) for v in values])
+
+def test_while():
+    print("- Testing while loops...")
+    assert_engines("i = 0 while i < 5 i += 1 i", ValueAtom("number", 5))
+    assert_engines("i = 0 while i < 5 { i += 1 } i", ValueAtom("number", 5))
+    assert_engines("while false 1", ValueAtom("unit", None))
+    assert_engines("f(n) = { i = 0 t = 0 while i < n { i += 1 t += i } t } f(100)", ValueAtom("number", 5050))
+
+def test_for():
+    print("- Testing for loops...")
+    assert_engines("s = 0 for x in [1, 2, 3] s += x s", ValueAtom("number", 6))
+    assert_engines("s = 0 for x in (4, 5) s += x s", ValueAtom("number", 9))
+    assert_engines("s = 0 for x in 0..100000 s += x s", ValueAtom("number", 4999950000))
+    assert_engines("s = '' for c in 'abc' s = c + s s", ValueAtom("string", "cba"))
+    assert_engines("s = '' for k in #{a: 1, b: 2} s += k s", ValueAtom("string", "ab"))
+    assert_engines("s = 0 for (k, v) in #{a: 1, b: 2} s += v s", ValueAtom("number", 3))
+    assert_engines("s = 0 for (a, b) in [(1, 2), (3, 4)] s += a * b s", ValueAtom("number", 14))
+    assert_engines("r = [] for x in 0..3 { f = () => x * 10 list_append(r, f()) } r", numbers(0, 10, 20))
+
+def test_break_continue():
+    print("- Testing break and continue...")
+    assert_engines("s = 0 for x in 0..10 { if x == 7 break if x % 2 == 0 continue s += x } s", ValueAtom("number", 9))
+    assert_engines("i = 0 while true { i += 1 if i == 10 break } i", ValueAtom("number", 10))
+    assert_engines("r = [] for x in 0..5 { { if x == 3 break } list_append(r, x) } r", numbers(0, 1, 2))
+    assert_engines("r = [] for x in 0..3 for y in 0..3 { if y > x continue list_append(r, y) } r", numbers(0, 0, 1, 0, 1, 2))
+    assert_engines("f(xs) = { for x in xs if x > 1 break 'done' } f(0..10000000)", ValueAtom("string", "done"))
+
+def run_all() -> bool:
+    new_test_suite("loops")
+    test_while()
+    test_for()
+    test_break_continue()
+    return get_all_asserts_passed()
+
+if __name__ == "__main__":
+    done(run_all())
@@ -1,10 +1,27 @@
 from .util import assert_eval, done, get_all_asserts_passed, new_test_suite, ValueAtom
 
+def key(name) -> ValueAtom:
+    return ValueAtom("string" if isinstance(name, str) else "number", name)
+
 def test_create_map():
     print("- Testing create map...")
     assert_eval("#{}", ValueAtom("map", {}))
-    assert_eval("#{a: 5}", ValueAtom("map", {"a": ValueAtom("number", 5)}))
-    assert_eval("#{a: 5, b: 6}", ValueAtom("map", {"a": ValueAtom("number", 5), "b": ValueAtom("number", 6)}))
+    assert_eval("#{a: 5}", ValueAtom("map", {key("a"): ValueAtom("number", 5)}))
+    assert_eval("#{a: 5, b: 6}", ValueAtom("map", {key("a"): ValueAtom("number", 5), key("b"): ValueAtom("number", 6)}))
+    assert_eval("#{1: 'a', '1': 'b'}", ValueAtom("map", {key(1): key("a"), key("1"): key("b")}))
+
+def test_key_types():
+    print("- Testing key types...")
+    assert_eval("m = #{1: 'number', '1': 'string', true: 'bool'} m[1] + m['1'] + m[true]", key("numberstringbool"))
+    assert_eval("#{2: 'a'}[2.0]", key("a"))
+    assert_eval("m = #{} m[(1, 2)] = 3 m[()] = 4 m[(1, 2)] + m[()]", key(7))
+    assert_eval("m = #{} for i in 0..5 { m[i * 10] = i } m[40]", key(4))
+    assert_eval("map_keys(#{1: 'a', b: 'c'})", ValueAtom("list", [key(1), key("b")]))
+    assert_eval("m = #{1: 2} map_contains(m, 1) and map_contains(m, '1') == false", ValueAtom("bool", True))
+    assert_eval("m = #{1: 2, 3: 4} map_remove(m, 1) map_keys(m)", ValueAtom("list", [key(3)]))
+    assert_eval("str(#{1: 2, a: 'b', 'c d': ()})", key("#{1: 2, a: 'b', 'c d': ()}"))
+    # Tuple keys made from a list do not change with it
+    assert_eval("l = [1, 2] t = tuple(l) m = #{} m[t] = 'a' list_append(l, 3) m[(1, 2)]", key("a"))
 
 def test_member_access():
     print("- Testing member access...")
@@ -18,10 +35,13 @@ def test_member_access():
 def test_member_assignment():
     print("- Testing member assignment...")
     assert_eval("m = #{a: 5} m.a = 6 m.a", ValueAtom("number", 6))
+    assert_eval("m = #{a: 5} k = 'b' m[k] = 6 m.b", ValueAtom("number", 6))
+    assert_eval("m = #{a: #{}} m['a'][1] = 2 m.a[1]", ValueAtom("number", 2))
 
 def run_all() -> bool:
     new_test_suite("map")
     test_create_map()
+    test_key_types()
     test_member_access()
     test_member_assignment()
     return get_all_asserts_passed()
@@ -0,0 +1,77 @@
+from io import StringIO
+
+from src.ast import AtomicNode, IfNode, TupleNode
+from src.interpreter import execute, globalEnvironment
+from src.lexer import Lexer
+from src.optimizer import FOLDING, LITERALS, NONE, optimize_program
+from src.parser import Parser
+from .util import assert_eval, assert_true, done, get_all_asserts_passed, new_test_suite, ValueAtom
+
+def parse(input: str, level: int):
+    return optimize_program(Parser(Lexer(StringIO(input))).parse(), level)
+
+def evaluate_at(level: int):
+    def evaluator(input: str):
+        res, _ = execute(StringIO(input), globalEnvironment(), level=level)
+        return res
+    return evaluator
+
+def test_folding():
+    print("- Testing constant folding...")
+    [e] = parse("1 + 2 * 3", FOLDING).expressions
+    assert_true(isinstance(e, AtomicNode) and e.value == 7, "arithmetic is folded")
+    [e] = parse("\"a\" + 1 + \"b\"", FOLDING).expressions
+    assert_true(isinstance(e, AtomicNode) and e.value == "a1b", "string concatenation is folded")
+    [e] = parse("1 + 2 * 3", LITERALS).expressions
+    assert_true(not isinstance(e, AtomicNode), "nothing is folded below -O2")
+    [e] = parse("1 / 0", FOLDING).expressions
+    assert_true(not isinstance(e, AtomicNode), "expressions raising errors are kept")
+    [e] = parse("2 ^ 4096", FOLDING).expressions
+    assert_true(isinstance(e, AtomicNode), "powers with small results are folded")
+    [e] = parse("10 ^ 10000000", FOLDING).expressions
+    assert_true(not isinstance(e, AtomicNode), "powers with huge results are not computed while optimizing")
+    for level in [NONE, LITERALS, FOLDING]:
+        evaluator = evaluate_at(level)
+        assert_eval("2 ^ 10 - 24 / 4", ValueAtom("number", 1018), evaluator)
+        assert_eval("not (1 < 2) or 3 == 3", ValueAtom("bool", True), evaluator)
+        assert_eval("-(2 + 3)", ValueAtom("number", -5), evaluator)
+        assert_eval("x = 1 x + 2 * 3", ValueAtom("number", 7), evaluator)
+
+def test_dead_branches():
+    print("- Testing dead branch elimination...")
+    [e] = parse("if true { 1 } else { 2 }", FOLDING).expressions
+    assert_true(not isinstance(e, IfNode), "if with a true condition is replaced by its body")
+    [e] = parse("if false { 1 }", FOLDING).expressions
+    assert_true(isinstance(e, TupleNode) and len(e.elements) == 0, "if without a taken branch is unit")
+    [e] = parse("if x { 1 } else if false { 2 } else if 1 > 0 { 3 } else { 4 }", FOLDING).expressions
+    assert_true(isinstance(e, IfNode) and len(e.elseIfs) == 0 and e.elseBody is not None, "branches after a true condition are dropped")
+    for level in [NONE, FOLDING]:
+        evaluator = evaluate_at(level)
+        assert_eval("if 1 > 2 { 1 } else if 2 > 1 { 2 } else { 3 }", ValueAtom("number", 2), evaluator)
+        assert_eval("x = 0 if false { x = 1 } x", ValueAtom("number", 0), evaluator)
+        assert_eval("if false 10 ^ 10000000 else 0", ValueAtom("number", 0), evaluator)
+        assert_eval("i = 0 while false { i += 1 } i", ValueAtom("number", 0), evaluator)
+        assert_eval("f(n) = if n == 0 { 0 } else if false { 1 } else { f(n - 1) } f(10000)", ValueAtom("number", 0), evaluator)
+
+def test_literals():
+    print("- Testing shared literals and map keys...")
+    a, b = parse("\"s\" \"s\"", LITERALS).expressions
+    assert_true(a.atom is b.atom, "equal literals share an atom")
+    a, b = parse("1 \"1\"", LITERALS).expressions
+    assert_true(a.atom.type == "number" and b.atom.type == "string", "literals of different types are kept apart")
+    [e] = parse("#{a: 1, 2: 3}", LITERALS).expressions
+    assert_true([(k.type, k.atom is not None) for k in e.pairs] == [("string", True), ("number", True)], "map keys are normalized to constants")
+    evaluator = evaluate_at(LITERALS)
+    assert_eval("m = #{a: 1, 2: 3} m[2] + m.a", ValueAtom("number", 4), evaluator)
+    assert_eval("m = #{1: 1, \"1\": 2} m[1]", ValueAtom("number", 1), evaluator)
+    assert_eval("f() = [1, 2] a = f() a[0] = 5 f()[0]", ValueAtom("number", 1), evaluator)
+
+def run_all() -> bool:
+    new_test_suite("optimizer")
+    test_folding()
+    test_dead_branches()
+    test_literals()
+    return get_all_asserts_passed()
+
+if __name__ == "__main__":
+    done(run_all())
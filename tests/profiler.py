@@ -0,0 +1,44 @@
+from io import StringIO
+
+from src import profiler
+from src.interpreter import execute, globalEnvironment
+from .util import assert_true, done, get_all_asserts_passed, new_test_suite
+
+PROGRAM = """fib(n) = if n < 2 n else fib(n - 1) + fib(n - 2)
+loop(n) = if n == 0 0 else loop(n - 1)
+fib(10)
+loop(100)
+list_map([1, 2, 3], (x) => x * 2)
+"""
+
+def profile(engine: str) -> profiler.Profiler:
+    profiler.start()
+    try:
+        execute(StringIO(PROGRAM), globalEnvironment(), engine=engine)
+    finally:
+        p = profiler.stop()
+    return p
+
+def test_profiler():
+    print("- Testing function profiler...")
+    for engine in ["closure", "vm", "tree"]:
+        p = profile(engine)
+        stats = {s.label: s for s in p.stats.values()}
+        assert_true(stats["fib (1:5)"].calls == 177, f"recursive calls are counted ({engine})")
+        assert_true(stats["fib (1:5)"].sites == {(1, 30): 88, (1, 43): 88, (3, 5): 1}, f"call sites are recorded ({engine})")
+        assert_true(stats["loop (2:6)"].calls == 101, f"tail calls are counted ({engine})")
+        assert_true(stats["lambda (5:27)"].sites == {None: 3}, f"calls from builtins are counted ({engine})")
+        assert_true(stats["list_map"].inclusive >= stats["lambda (5:27)"].inclusive, f"inclusive time contains callees ({engine})")
+        assert_true(len(p.frames) == 0, f"all calls have returned ({engine})")
+    stacks = profile("closure").collapsed_stacks()
+    assert_true(all(line.startswith("<program>;") for line in stacks), "stacks start at the program")
+    assert_true(any(line.startswith("<program>;list_map;lambda (5:27) ") for line in stacks), "stacks contain nested calls")
+    assert_true(profiler.active is None, "profiling stops")
+
+def run_all() -> bool:
+    new_test_suite("profiler")
+    test_profiler()
+    return get_all_asserts_passed()
+
+if __name__ == "__main__":
+    done(run_all())
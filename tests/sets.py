@@ -0,0 +1,38 @@
+from .util import assert_eval, done, get_all_asserts_passed, new_test_suite, ValueAtom
+
+def numbers(*values: int) -> ValueAtom:
+    return ValueAtom("set", dict.fromkeys(ValueAtom("number", v) for v in values))
+
+def test_create_set():
+    print("- Testing create set...")
+    assert_eval("set()", numbers())
+    assert_eval("set([3, 1, 3, 2, 1])", numbers(3, 1, 2))
+    assert_eval("list(set([3, 1, 3]))", ValueAtom("list", [ValueAtom("number", 3), ValueAtom("number", 1)]))
+    assert_eval("set_size(set(\"abca\"))", ValueAtom("number", 3))
+    assert_eval("set([1, 2]) == set([2, 1])", ValueAtom("bool", True))
+
+def test_set_members():
+    print("- Testing set members...")
+    assert_eval("s = set([1, 2]) set_add(s, 3) set_add(s, 1) s", numbers(1, 2, 3))
+    assert_eval("s = set([1, 2]) set_remove(s, 1) set_remove(s, 5) s", numbers(2))
+    assert_eval("set_contains(set([(1, 'a'), 2]), (1, 'a'))", ValueAtom("bool", True))
+    assert_eval("set_contains(set([1]), [1])", ValueAtom("bool", False))
+    assert_eval("list_contains(set(1..1000), 999)", ValueAtom("bool", True))
+    assert_eval("tuple_contains(set([1]), 2)", ValueAtom("bool", False))
+    assert_eval("n = 0 for x in set([1, 2, 2, 3]) { n += x } n", ValueAtom("number", 6))
+
+def test_set_operations():
+    print("- Testing set operations...")
+    assert_eval("set_union(set([1, 2]), set([2, 3]))", numbers(1, 2, 3))
+    assert_eval("set_intersection(set([1, 2]), set([2, 3]))", numbers(2))
+    assert_eval("set_difference(set([1, 2]), set([2, 3]))", numbers(1))
+
+def run_all() -> bool:
+    new_test_suite("set")
+    test_create_set()
+    test_set_members()
+    test_set_operations()
+    return get_all_asserts_passed()
+
+if __name__ == "__main__":
+    done(run_all())
@@ -1,5 +1,214 @@
-from .util import assert_eval, done, get_all_asserts_passed, new_test_suite, ValueAtom
+import os
+import tempfile
+from contextlib import redirect_stdout
+from io import StringIO
+from src.interpreter import execute, globalEnvironment
+from src.lineindex import open_index
+from .util import assert_eval, assert_true, done, get_all_asserts_passed, new_test_suite, ValueAtom
 
+def test_lazy_modules():
+    print("- Testing lazily loaded builtins")
+    env = globalEnvironment()
+    assert_true("list_size" not in env.values, "list functions should not be loaded before use")
+    for engine in ["closure", "vm", "tree"]:
+        result, _ = execute(StringIO("list_size([1, 2, 3])"), globalEnvironment(), engine=engine)
+        assert_true(result.structural_eq(ValueAtom("number", 3)), f"list_size should load on first use ({engine})")
+    assert_eval("list_find = 5\nlist_size([1]) + list_find", ValueAtom("number", 6))
+    assert_eval("str_chars = 1\nstr_upper(\"a\") == \"A\" and str_chars == 1", ValueAtom("bool", True))
+    assert_eval("typeof(random_int)", ValueAtom("string", "function"))
+
+def test_memoize():
+    print("- Testing memoized functions")
+    fib = "fib(n) = if n < 2 n else fib(n - 1) + fib(n - 2)\nfib = memoize(fib)\n"
+    assert_eval(fib + "fib(60)", ValueAtom("number", 1548008755920))
+    assert_eval(fib + "fib(30)\nfib(30)\ns = memoize_stats(fib)\ns.hits", ValueAtom("number", 29))
+    assert_eval("f = memoize((l) => list_size(l))\nl = [1]\nf(l)\nlist_append(l, 2)\nf(l)", ValueAtom("number", 2))
+    assert_eval("f = memoize((x) => x, 2)\nf(1)\nf(2)\nf(3)\nf(1)\ns = memoize_stats(f)\ns.misses", ValueAtom("number", 4))
+    assert_eval("f = memoize((k, t) => t)\nl = [1, 2]\nf(0, tuple(l))\nlist_append(l, 3)\nf(0, (1, 2))\ns = memoize_stats(f)\ns.hits", ValueAtom("number", 1))
+    assert_eval("f = memoize((x) => x, 2)\nf(1)\nf(2)\nf(1)\nf(3)\nf(1)\ns = memoize_stats(f)\ns.hits", ValueAtom("number", 2))
+    assert_eval("f(x) = [x]\nf = memoize(f)\na = f(1)\nlist_append(a, 2)\nb = f(1)\nlist_append(b, 3)\nf(1)", ValueAtom("list", [ValueAtom("number", 1)]))
+    assert_eval("f = memoize((b) => str(b))\nb = str_builder('x')\nf(b)\nb += 'y'\nf(b)", ValueAtom("string", "xy"))
+
+def test_string_builder():
+    print("- Testing string builders")
+    assert_eval("str_join([1, 'a', true], ', ')", ValueAtom("string", "1, a, true"))
+    assert_eval("str_join([])", ValueAtom("string", ""))
+    assert_eval("b = str_builder('a') b += 1 str_builder_append(b, 'b', 'c') str(b)", ValueAtom("string", "a1bc"))
+    assert_eval("b = str_builder() for i in 0..4 { b += i } '<' + b + '>'", ValueAtom("string", "<0123>"))
+    assert_eval("b = str_builder('xy') b += 'z' str_builder_size(b)", ValueAtom("number", 3))
+    program = "s = 'a'\ns += str_builder('b')\nb = str_builder('x')\nb += 'y'\n(s, b == 'xy', 'xy' == b, b == str_builder('xy'), b != 'x', b == 1)"
+    expected = ValueAtom("tuple", [ValueAtom("string", "ab"), ValueAtom("bool", True), ValueAtom("bool", True), ValueAtom("bool", True), ValueAtom("bool", True), ValueAtom("bool", False)])
+    for engine in ["closure", "vm", "tree"]:
+        result, _ = execute(StringIO(program), globalEnvironment(), engine=engine)
+        assert_true(result is not None and result.structural_eq(expected), f"builders can be appended to strings and compared to them ({engine})")
+
+def test_bytes():
+    print("- Testing bytes")
+    data = lambda *values: ValueAtom("bytes", bytes(values))
+    assert_eval("bytes('hé')", data(104, 195, 169))
+    assert_eval("bytes([1, 2, 3])[1:3]", data(2, 3))
+    assert_eval("bytes([1, 2, 3])[2] + bytes_size(bytes('abc'))", ValueAtom("number", 6))
+    assert_eval("bytes([1]) + bytes([2, 3])[1:2]", data(1, 3))
+    assert_eval("list(bytes('ab'))", ValueAtom("list", [ValueAtom("number", 97), ValueAtom("number", 98)]))
+    assert_eval("bytes_to_str(bytes('héllo')[3:6])", ValueAtom("string", "llo"))
+    assert_eval("enc_utf8(dec_utf8('héllo'))", ValueAtom("string", "héllo"))
+    assert_eval("enc_base64(bytes('mini'))", ValueAtom("string", "bWluaQ=="))
+    assert_eval("dec_base64('bWluaQ==') == bytes('mini')", ValueAtom("bool", True))
+    assert_eval("str(bytes('hi')) + ' ' + bytes_to_str(bytes('hi')) + 'x'", ValueAtom("string", "<bytes of 2> hix"))
+    for program in ["bytes('hi') + 'x'", "'x' + bytes('hi')", "s = 'x' s += bytes('hi')", "b = str_builder() b += bytes('hi')"]:
+        out = StringIO()
+        with redirect_stdout(out):
+            result = execute(StringIO(program), globalEnvironment())
+        assert_true(result is None and "bytes" in out.getvalue(), f"bytes are not added to text without decoding them: {program}")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "data.bin").replace("\\", "/")
+        assert_eval(f"file_write('{path}', bytes([0, 255])) file_append('{path}', bytes([7])) file_read_bytes('{path}')", data(0, 255, 7))
+
+def test_streaming_files():
+    print("- Testing streaming file functions")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "log.txt").replace("\\", "/")
+        with open(path, "w") as f:
+            f.write("".join(f"{i} {'ERROR' if i % 3 == 0 else 'INFO'}\n" for i in range(10)))
+        assert_eval(f"typeof(file_lines('{path}'))", ValueAtom("string", "iterator"))
+        assert_eval(f"n = 0 for l in file_lines('{path}') {{ n = n + 1 }} n", ValueAtom("number", 10))
+        errors = f"list_filter(file_lines('{path}'), (l) => str_contains(l, 'ERROR'))"
+        assert_eval(f"list(list_map({errors}, (l) => int(str_split(l, ' ')[0])))",
+                    ValueAtom("list", [ValueAtom("number", i) for i in [0, 3, 6, 9]]))
+        assert_eval(f"list_reduce(list_map({errors}, (l) => 1), (a, b) => a + b, 0)", ValueAtom("number", 4))
+        assert_eval(f"file_read_lines('{path}')[1] == list(file_lines('{path}'))[1]", ValueAtom("bool", True))
+        assert_eval(f"file_read_lines('{path}')[1]", ValueAtom("string", "1 INFO"))
+        assert_eval(f"list_size(list(file_lines('{path}')))", ValueAtom("number", 10))
+        assert_eval(f"f = memoize((l) => list_size(list(l)))\nf(file_lines('{path}'))\nf(file_lines('{path}'))", ValueAtom("number", 10))
+        for function in ["list_size(l)", "list_contains(l, '1 INFO')", "list_append(l, 1)"]:
+            out = StringIO()
+            with redirect_stdout(out):
+                result = execute(StringIO(f"l = file_lines('{path}') {function}"), globalEnvironment())
+            assert_true(result is None and "can not take an iterator" in out.getvalue(), f"iterators are rejected: {function}")
+        assert_eval(f"h = file_open('{path}') a = file_read_chunk(h, 2) b = file_read_chunk(h, 5) file_close(h) a + '|' + b",
+                    ValueAtom("string", "0 |ERROR"))
+        out = os.path.join(directory, "out.txt").replace("\\", "/")
+        assert_eval(f"h = file_open('{out}', 'w') for i in 0..3 {{ file_write(h, i) }} file_close(h) file_read_all('{out}')",
+                    ValueAtom("string", "012"))
+
+def test_mmap():
+    print("- Testing memory mapped files")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "table.txt").replace("\\", "/")
+        with open(path, "w") as f:
+            f.write("apple 1\nbanana 2\ncherry 3\n")
+        mapped = f"m = file_mmap('{path}') "
+        assert_eval(mapped + "bytes_size(m)", ValueAtom("number", 26))
+        assert_eval(mapped + "bytes_to_str(m[8:14])", ValueAtom("string", "banana"))
+        assert_eval(mapped + "m[0] == 97 and m == bytes(file_read_all('" + path + "'))", ValueAtom("bool", True))
+        assert_eval(mapped + "bytes_find(m, 'cherry')", ValueAtom("number", 17))
+        assert_eval(mapped + "bytes_find(m, 'a', 1, 5) + bytes_rfind(m, 'a') + bytes_find(m, 'kiwi')", ValueAtom("number", -1 + 13 - 1))
+        assert_eval(mapped + "bytes_to_str(bytes_line_at(m, bytes_find(m, 'nan')))", ValueAtom("string", "banana 2"))
+        assert_eval(mapped + "bytes_find(m[8:26], '2')", ValueAtom("number", 7))
+        assert_eval(mapped + "s = m[8:26] bytes_rfind(s, 'a') + bytes_find(s, 'a', -3) + bytes_find(s[9:18], '3', 20)", ValueAtom("number", 5 - 1 - 1))
+        assert_eval(mapped + "bytes_to_str(bytes_line_at(m[3:26], 9))", ValueAtom("string", "banana 2"))
+        assert_eval(mapped + "bytes_to_str(bytes_line_at(m, -3)) + bytes_to_str(bytes_line_at(m, 26))", ValueAtom("string", "cherry 3"))
+        for offset in ["27", "-27"]:
+            out = StringIO()
+            with redirect_stdout(out):
+                result = execute(StringIO(mapped + f"bytes_line_at(m, {offset})"), globalEnvironment())
+            assert_true(result is None and "expected an offset within the 26 bytes" in out.getvalue(), f"offsets outside the bytes are rejected: {offset}")
+        assert_eval(mapped + "bytes_find(m[3:10], '', 8) + bytes_find(m[3:10], '', 7)", ValueAtom("number", -1 + 7))
+        empty = os.path.join(directory, "empty.txt").replace("\\", "/")
+        open(empty, "w").close()
+        assert_eval(f"bytes_size(file_mmap('{empty}'))", ValueAtom("number", 0))
+
+def test_line_index():
+    print("- Testing line indexes")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "app.log").replace("\\", "/")
+        with open(path, "w", newline="") as f:
+            f.write("".join(f"line {i}\r\n" for i in range(1000)) + "last")
+        indexed = f"idx = file_index('{path}') "
+        assert_eval(indexed + "file_line_count(idx)", ValueAtom("number", 1001))
+        assert_eval(indexed + "file_line(idx, 0) + file_line(idx, 999) + file_line(idx, 1000)", ValueAtom("string", "line 0line 999last"))
+        assert_eval(indexed + "file_lines_range(idx, 998, 1001)", ValueAtom("list", [ValueAtom("string", s) for s in ["line 998", "line 999", "last"]]))
+        assert_eval(indexed + "file_lines_range(idx, 5, 5)", ValueAtom("list", []))
+        breaks = os.path.join(directory, "breaks.txt").replace("\\", "/")
+        with open(breaks, "w", newline="") as f:
+            f.write("a\fb\nc\rd\x1ce\r\nf")
+        assert_eval(f"file_lines_range(file_index('{breaks}'), 0, 3)", ValueAtom("list", [ValueAtom("string", s) for s in ["a\fb", "c\rd\x1ce", "f"]]))
+        try:
+            open_index(path).line(1001)
+            assert_true(False, "lines past the end are rejected")
+        except Exception:
+            pass
+        cached = os.path.join(directory, "__minicache__", "app.log.lidx")
+        assert_true(not os.path.exists(cached), "indexes are only saved on request")
+        assert_eval(f"idx = file_index('{path}', true) file_line(idx, 500)", ValueAtom("string", "line 500"))
+        assert_true(os.path.exists(cached), "indexes can be saved next to the file")
+        assert_eval(f"idx = file_index('{path}', true) file_line(idx, 501)", ValueAtom("string", "line 501"))
+        assert_eval(indexed + f"file_write('{path}', 'changed\\nlines') file_line_count(idx) + file_line_count(file_index('{path}', true))", ValueAtom("number", 4))
+        assert_eval(indexed + "file_line(idx, 1)", ValueAtom("string", "lines"))
+
+def test_parallel_map():
+    print("- Testing parallel map and filter")
+    program = "factor = 3\nscale(x) = x * factor\nfib(n) = if n < 2 n else fib(n - 1) + fib(n - 2)\n"
+    for engine in ["closure", "vm", "tree"]:
+        result, _ = execute(StringIO(program + "list_pmap(range(10), (x) => scale(fib(x)), 2, 3)"), globalEnvironment(), engine=engine)
+        expected = [3 * n for n in [0, 1, 1, 2, 3, 5, 8, 13, 21, 34]]
+        assert_true(result.structural_eq(ValueAtom("list", [ValueAtom("number", n) for n in expected])), f"functions and the globals they use are sent to workers ({engine})")
+    assert_eval("list_pfilter(list_map(range(20), (x) => (x, x % 3)), (t) => t[1] == 0, 2)",
+                ValueAtom("list", [ValueAtom("tuple", [ValueAtom("number", n), ValueAtom("number", 0)]) for n in range(0, 20, 3)]))
+    assert_eval("list_pmap(['a', 'b', 'c'], str_upper, 2, 1)", ValueAtom("list", [ValueAtom("string", s) for s in "ABC"]))
+    assert_eval("make(k) = (x) => x + k\nlist_map(list_pmap([1, 2], make, 2), (f) => f(10))", ValueAtom("list", [ValueAtom("number", 11), ValueAtom("number", 12)]))
+    assert_eval("list_pmap([#{a: set([1])}], (m) => set_contains(m.a, 1))", ValueAtom("list", [ValueAtom("bool", True)]))
+    assert_eval("list_pmap([], (x) => x)", ValueAtom("list", []))
+    for program in ["list_pmap([1, 2], (x) => x / 'a')", "list_pmap([1], (x) => x, 0)", "h = file_open('README.md') list_pmap([1], (x) => h)"]:
+        out = StringIO()
+        with redirect_stdout(out):
+            result = execute(StringIO(program), globalEnvironment())
+        assert_true(result is None and "Error" in out.getvalue(), f"errors are raised to the caller: {program}")
+
+def test_event_loop():
+    print("- Testing event loop")
+    timers = """log = []
+ticks = [0]
+event_timer(20, () => list_append(log, "later"))
+event_timer(5, () => list_append(log, "sooner"))
+t = event_interval(1, () => {
+    ticks[0] = ticks[0] + 1
+    if ticks[0] == 3 event_cancel(t)
+})
+event_loop_run()
+(log, ticks[0])
+"""
+    assert_eval(timers, ValueAtom("tuple", [ValueAtom("list", [ValueAtom("string", "sooner"), ValueAtom("string", "later")]), ValueAtom("number", 3)]))
+    echo = """replies = []
+closed = [0]
+server = event_tcp_listen("127.0.0.1", 0, (conn) => {
+    event_tcp_on_data(conn, (data) => event_tcp_send(conn, bytes("echo ") + data))
+    event_tcp_on_close(conn, () => {
+        closed[0] = closed[0] + 1
+        if closed[0] == 3 event_tcp_close(server)
+    })
+})
+for i in range(3) {
+    event_tcp_connect("127.0.0.1", event_tcp_port(server), (conn) => {
+        event_tcp_send(conn, "hi")
+        event_tcp_on_data(conn, (data) => {
+            list_append(replies, bytes_to_str(data))
+            event_tcp_close(conn)
+        })
+    })
+}
+event_loop_run()
+(replies, closed[0])
+"""
+    for engine in ["closure", "vm", "tree"]:
+        result, _ = execute(StringIO(echo), globalEnvironment(), engine=engine)
+        expected = ValueAtom("tuple", [ValueAtom("list", [ValueAtom("string", "echo hi")] * 3), ValueAtom("number", 3)])
+        assert_true(result is not None and result.structural_eq(expected), f"connections are served concurrently ({engine})")
+    assert_eval("errors = []\nevent_tcp_connect('127.0.0.1', 1, (c) => (), (e) => list_append(errors, e))\nevent_loop_run()\nlist_size(errors)", ValueAtom("number", 1))
+    out = StringIO()
+    with redirect_stdout(out):
+        result = execute(StringIO("event_timer(1, () => 1 / 'a')\nevent_loop_run()\n1"), globalEnvironment())
+    assert_true(result is None and "Incompatible types" in out.getvalue(), "errors in callbacks stop the loop and are raised by event_loop_run")
 
 def run_all() -> bool:
     new_test_suite("standard library")
@@ -16,6 +225,15 @@ def run_all() -> bool:
     print("- Testing system output function")
     assert_eval("str_trim(system_output(\"echo Hello World\", true))", ValueAtom("string", "Hello World"))
     print("- Testing file read function")
+    test_lazy_modules()
+    test_memoize()
+    test_string_builder()
+    test_bytes()
+    test_streaming_files()
+    test_mmap()
+    test_line_index()
+    test_parallel_map()
+    test_event_loop()
 
     return get_all_asserts_passed()
 
@@ -0,0 +1,39 @@
+from io import StringIO
+
+from src import trace
+from src.interpreter import execute, globalEnvironment
+from .util import assert_true, done, get_all_asserts_passed, new_test_suite
+
+def run_traced(input: str, categories: list[str]) -> list[trace.TraceEvent]:
+    events = []
+    trace.enable(categories, events.append)
+    try:
+        execute(StringIO(input), globalEnvironment())
+    finally:
+        trace.disable()
+    return events
+
+def test_trace():
+    print("- Testing trace events...")
+    events = run_traced("l = [1, 2, 3] l[1] + 2", ["eval"])
+    assert_true(len(events) > 0 and all(e.category == "eval" for e in events), "only evaluation is traced")
+    index = [e for e in events if e.kind == "index"]
+    assert_true(len(index) == 1 and index[0].operands[2].value == 2, "index events hold the indexed element")
+    assert_true(str(index[0]) == "[eval] index INDEX [1, 2, 3], 1, 2", "events are formatted by the sink")
+    events = run_traced("x = 1", ["lex", "parse"])
+    assert_true({e.category for e in events} == {"lex", "parse"}, "lexing and parsing are traced")
+    assert_true(run_traced("x = 1", []) == [], "nothing is traced unless enabled")
+    try:
+        trace.enable(["everything"])
+        assert_true(False, "unknown categories are rejected")
+    except Exception:
+        pass
+    assert_true(not trace.is_enabled("eval"), "tracing is disabled again")
+
+def run_all() -> bool:
+    new_test_suite("trace")
+    test_trace()
+    return get_all_asserts_passed()
+
+if __name__ == "__main__":
+    done(run_all())
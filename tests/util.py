@@ -20,10 +20,10 @@ def eval(input: str) -> Atom:
     res, _ = execute(StringIO(input), globalEnvironment())
     return res
 
-def assert_eval(input: str, expected: Atom) -> None:
+def assert_eval(input: str, expected: Atom, evaluator = eval) -> None:
     global all_asserts_passed
     try:
-        actual = eval(input)
+        actual = evaluator(input)
         if not actual.structural_eq(expected):
             all_asserts_passed = False
             print(colored(red, f"  - FAILED AT: {input}"))
@@ -35,6 +35,12 @@ def assert_eval(input: str, expected: Atom) -> None:
         if crash_on_error:
             raise e
 
+def assert_true(condition: bool, message: str) -> None:
+    global all_asserts_passed
+    if not condition:
+        all_asserts_passed = False
+        print(colored(red, f"  - FAILED: {message}"))
+
 def get_all_asserts_passed() -> bool:
     return all_asserts_passed
 
@@ -0,0 +1,49 @@
+from src.atoms import FALSE, TRUE, UNIT, bool_atom, number_atom
+from .util import assert_eval, assert_true, done, get_all_asserts_passed, new_test_suite, ValueAtom
+
+def test_shared_atoms():
+    print("- Testing shared primitive atoms...")
+    assert_true(bool_atom(1 < 2) is TRUE, "true is shared")
+    assert_true(bool_atom(2 < 1) is FALSE, "false is shared")
+    assert_true(number_atom(42) is number_atom(42), "small integers are shared")
+    assert_true(number_atom(10 ** 6) is not number_atom(10 ** 6), "large integers are not shared")
+    assert_true(number_atom(2.0).value == 2.0 and isinstance(number_atom(2.0).value, float), "floats keep their type")
+    assert_true(not hasattr(UNIT, "__dict__"), "value atoms have no instance dictionary")
+
+def test_primitive_results():
+    print("- Testing primitive results...")
+    assert_eval("x = 5 x == 5", ValueAtom("bool", True))
+    assert_eval("x = 5 x += 1 x", ValueAtom("number", 6))
+    assert_eval("(1..4)[2] * 1000", ValueAtom("number", 3000))
+    assert_eval("list_map([1, 2], (x) => x / 2)", ValueAtom("list", [ValueAtom("number", 0.5), ValueAtom("number", 1.0)]))
+
+def test_unique_ids():
+    print("- Testing unique ids...")
+    a, b = ValueAtom("string", "a"), ValueAtom("string", "a")
+    assert_true(a.uid != b.uid, "atoms get distinct ids")
+    assert_true(a.uid == a.uid, "ids are stable")
+
+def test_hashing():
+    print("- Testing structural hashing...")
+    pair = lambda: ValueAtom("tuple", (number_atom(1), ValueAtom("string", "a")))
+    assert_true(hash(pair()) == hash(pair()), "equal tuples hash equally")
+    assert_true(hash(number_atom(10 ** 6)) == hash(ValueAtom("number", 10.0 ** 6)), "equal numbers hash equally")
+    assert_true(len({ValueAtom("string", "a"), ValueAtom("string", "a"), UNIT}) == 2, "atoms can be set members")
+    assert_eval("l = [1, 2]\nt = tuple(l)\nlist_append(l, 3)\nt", ValueAtom("tuple", [number_atom(1), number_atom(2)]))
+    for value in [ValueAtom("list", []), ValueAtom("tuple", (ValueAtom("map", {}),))]:
+        try:
+            hash(value)
+            assert_true(False, f"mutable values are not hashable: {value}")
+        except TypeError:
+            pass
+
+def run_all() -> bool:
+    new_test_suite("values")
+    test_shared_atoms()
+    test_primitive_results()
+    test_unique_ids()
+    test_hashing()
+    return get_all_asserts_passed()
+
+if __name__ == "__main__":
+    done(run_all())